@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Admin API endpoints
+"""
+
+import asyncio
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+import logging
+
+from quadcode.app.core.profiling import ProfileStore, get_profile_store, is_admin
+from quadcode.app.services.snapshot import export_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Reject requests without a valid X-Admin-Token header"""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles")
+async def list_profiles(store: ProfileStore = Depends(get_profile_store)) -> List[Dict]:
+    """
+    List captured request profiles, newest first
+
+    Returns:
+        Request parameters, latency and trigger of each stored profile
+    """
+    return store.list()
+
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: str = "folded",
+    store: ProfileStore = Depends(get_profile_store)
+):
+    """
+    Download a captured profile
+
+    Args:
+        profile_id: Identifier from the profile list or the X-Profile-Id header
+        format: "folded" for folded stacks (flamegraph.pl, speedscope) or "json"
+            for the full record with request parameters
+
+    Raises:
+        HTTPException: 404 if the profile does not exist
+    """
+    record = store.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+
+    if format == "json":
+        return record
+    return PlainTextResponse(
+        record["folded"],
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+    )
+
+
+@router.get("/snapshot")
+async def download_snapshot(max_mib: int = Query(256, ge=1, le=4096)):
+    """
+    Download a warm-cache snapshot of this instance: its most recently used
+    point series, harvested tiles, climatology tiles and granule searches,
+    to bake into the image or mount as SNAPSHOT_PATH
+
+    Args:
+        max_mib: Size budget of the bundled entries in MiB
+    """
+    fd, path = tempfile.mkstemp(suffix=".qcs")
+    os.close(fd)
+    try:
+        summary = await asyncio.to_thread(export_snapshot, path, max_mib * 1024 ** 2)
+    except Exception as e:
+        os.unlink(path)
+        logger.error(f"Error exporting snapshot: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Snapshot export failed")
+
+    logger.info(f"Exported snapshot: {summary}")
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename="warm-cache.qcs",
+        background=BackgroundTask(os.unlink, path)
+    )
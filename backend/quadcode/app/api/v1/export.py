@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Streamed export endpoints: CSV, NDJSON, Parquet and Arrow IPC written one row group at a time
+"""
+
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+import logging
+
+from quadcode.app.models.weather import CalendarRequest, DayOfYear, WeatherVariable
+from quadcode.app.models.export import SeriesExportRequest, BatchExportRequest
+from quadcode.app.services.earthdata_service import EarthdataService, get_earthdata_service
+from quadcode.app.services.export_service import (
+    series_schema,
+    series_batches,
+    BATCH_SCHEMA,
+    batch_batches,
+    calendar_schema,
+    calendar_batches,
+    climatology_table
+)
+from quadcode.app.services.point_store import PointStore, get_point_store
+from quadcode.app.services.climatology import ClimatologyStore, get_climatology_store
+from quadcode.app.services.fetch_policy import CircuitOpenError
+from quadcode.app.core.cache import TTLCache, get_query_cache, get_distribution_cache
+from quadcode.app.core.export import (
+    ExportFormat,
+    MEDIA_TYPES,
+    Schema,
+    check_format,
+    content_disposition,
+    prime,
+    stream_table
+)
+from quadcode.app.core.grid import day_of_year_index
+from quadcode.app.core.registry import get_variable
+from quadcode.app.core.serialization import Columns
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+async def _stream(
+    batches: AsyncIterator[Columns],
+    schema: Schema,
+    fmt: ExportFormat,
+    name: str,
+    what: str
+) -> StreamingResponse:
+    """
+    Start a streamed export once its first row group is computed.
+
+    Errors before the first row group get a status code like the other
+    endpoints; later ones end the stream early (see stream_table).
+    """
+    try:
+        check_format(fmt)
+        primed = await prime(batches)
+    except CircuitOpenError as e:
+        logger.warning(f"Upstream unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        logger.warning(f"Invalid request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error exporting {what}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    return StreamingResponse(
+        stream_table(primed, schema, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": content_disposition(name, fmt)}
+    )
+
+
+@router.post("/series")
+async def export_series(
+    request: SeriesExportRequest,
+    format: ExportFormat = Query(ExportFormat.CSV, description="csv, ndjson, parquet or arrow"),
+    service: EarthdataService = Depends(get_earthdata_service),
+    store: PointStore = Depends(get_point_store)
+):
+    """
+    Export the daily series of a location: one row per day, one column per variable
+
+    Streams one row group per year, so memory stays flat however long the
+    year range. The year range is exported as given, without smart year
+    selection.
+
+    Args:
+        request: Location, years and variables
+        format: Output format
+        service: EarthdataService instance (injected)
+        store: Point store of extracted daily series (injected)
+
+    Returns:
+        Streamed CSV, NDJSON, Parquet or Arrow IPC file
+
+    Raises:
+        HTTPException: 400 for invalid parameters, 503 if upstream is unavailable, 500 for server errors
+    """
+    years = request.historical_years
+    logger.info(f"Exporting daily series for ({request.location.lat}, {request.location.lon}), "
+                f"{years.start_year}-{years.end_year}")
+    return await _stream(
+        series_batches(request, service, store), series_schema(request), format,
+        f"series-{years.start_year}-{years.end_year}", "series"
+    )
+
+
+@router.post("/batch")
+async def export_batch(
+    request: BatchExportRequest,
+    format: ExportFormat = Query(ExportFormat.CSV, description="csv, ndjson, parquet or arrow"),
+    service: EarthdataService = Depends(get_earthdata_service),
+    cache: TTLCache = Depends(get_query_cache),
+    distributions: TTLCache = Depends(get_distribution_cache)
+):
+    """
+    Export the per-year values of one day of the year at many locations
+
+    Each location is answered like /query, through the query cache, and
+    streamed as one row group while the next locations are read.
+
+    Args:
+        request: Locations, day of year, years and variables
+        format: Output format
+        service: EarthdataService instance (injected)
+        cache: Query result cache (injected)
+        distributions: Cache of sorted samples for /probabilities (injected)
+
+    Returns:
+        Streamed CSV, NDJSON, Parquet or Arrow IPC file with one row per location, variable and year
+
+    Raises:
+        HTTPException: 400 for invalid parameters, 503 if upstream is unavailable, 500 for server errors
+    """
+    logger.info(f"Exporting {len(request.locations)} locations on "
+                f"{request.day_of_year.month}/{request.day_of_year.day}")
+    return await _stream(
+        batch_batches(request, service, cache, distributions), BATCH_SCHEMA, format,
+        f"batch-{request.day_of_year.month:02d}-{request.day_of_year.day:02d}", "batch"
+    )
+
+
+@router.post("/calendar")
+async def export_calendar(
+    request: CalendarRequest,
+    format: ExportFormat = Query(ExportFormat.CSV, description="csv, ndjson, parquet or arrow"),
+    service: EarthdataService = Depends(get_earthdata_service),
+    store: PointStore = Depends(get_point_store)
+):
+    """
+    Export the full-year calendar of a location: one row per variable and calendar day
+
+    Args:
+        request: Calendar request with location, years, variables, thresholds
+        format: Output format
+        service: EarthdataService instance (injected)
+        store: Point store of extracted daily series (injected)
+
+    Returns:
+        Streamed CSV, NDJSON, Parquet or Arrow IPC file, one row group per variable
+
+    Raises:
+        HTTPException: 400 for invalid parameters, 503 if upstream is unavailable, 500 for server errors
+    """
+    return await _stream(
+        calendar_batches(request, service, store), calendar_schema(request), format,
+        f"calendar-{request.historical_years.start_year}-{request.historical_years.end_year}", "calendar"
+    )
+
+
+@router.get("/climatology")
+async def export_climatology(
+    variable: WeatherVariable = Query(..., description="Variable"),
+    start_year: int = Query(..., description="First year of the precomputed range"),
+    end_year: int = Query(..., description="Last year of the precomputed range"),
+    month: int = Query(..., description="Month (1-12)"),
+    day: int = Query(..., description="Day of month"),
+    south: float = Query(-90.0, ge=-90, le=90, description="Southern bound"),
+    north: float = Query(90.0, ge=-90, le=90, description="Northern bound"),
+    west: float = Query(-180.0, ge=-180, le=180, description="Western bound"),
+    east: float = Query(180.0, ge=-180, le=180, description="Eastern bound"),
+    format: ExportFormat = Query(ExportFormat.CSV, description="csv, ndjson, parquet or arrow"),
+    climatology: Optional[ClimatologyStore] = Depends(get_climatology_store)
+):
+    """
+    Export precomputed day-of-year statistics for every grid cell of a bounding box
+
+    Streams one row group per band of grid rows from the climatology
+    tiles, so a global grid never sits in memory.
+
+    Returns:
+        Streamed CSV, NDJSON, Parquet or Arrow IPC file with one row per grid cell
+
+    Raises:
+        HTTPException: 400 for invalid parameters, 404 if the day is not precomputed, 500 for server errors
+    """
+    try:
+        check_format(format)
+        if climatology is None:
+            raise LookupError("Climatology tiles are disabled")
+        DayOfYear(month=month, day=day)
+        table = await climatology_table(
+            climatology, get_variable(variable).name, start_year, end_year,
+            day_of_year_index(month, day), (south, north), (west, east)
+        )
+        if table is None:
+            raise LookupError(f"No precomputed {variable.value} climatology for {month}/{day}, {start_year}-{end_year}")
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        logger.warning(f"Invalid request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error exporting climatology: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    schema, batches = table
+    return await _stream(
+        batches, schema, format,
+        f"climatology-{variable.value}-{month:02d}-{day:02d}-{start_year}-{end_year}", "climatology"
+    )
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Background job API endpoints
+"""
+
+from fastapi import APIRouter, HTTPException, Depends
+import logging
+
+from quadcode.app.models.weather import WeatherQueryRequest
+from quadcode.app.models.jobs import JobResponse
+from quadcode.app.services.job_service import JobManager, get_job_manager
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("", response_model=JobResponse, status_code=202)
+async def submit_job(
+    request: WeatherQueryRequest,
+    manager: JobManager = Depends(get_job_manager)
+):
+    """
+    Submit a weather query to run in the background
+
+    Use this for long year ranges (e.g. the full 1980-present record) that
+    cannot finish inside an HTTP timeout. Poll GET /jobs/{job_id} for progress.
+
+    Args:
+        request: Weather query request with location, date, variables, thresholds
+        manager: JobManager instance (injected)
+
+    Returns:
+        JobResponse with the job id and initial status
+    """
+    try:
+        job = manager.submit(request)
+        logger.info(f"Submitted job {job.job_id}")
+        return job
+    except Exception as e:
+        logger.error(f"Unexpected error submitting job: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    manager: JobManager = Depends(get_job_manager)
+):
+    """
+    Get the status, progress and (once completed) result of a job
+
+    Args:
+        job_id: Job identifier returned by POST /jobs
+        manager: JobManager instance (injected)
+
+    Returns:
+        JobResponse with status, progress and result
+
+    Raises:
+        HTTPException: 404 if the job does not exist
+    """
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
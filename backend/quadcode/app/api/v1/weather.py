@@ -3,25 +3,63 @@
 Weather API endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict
-from calendar import month_name
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 import logging
 
 from quadcode.app.models.weather import (
+    Location,
+    DayOfYear,
+    ExtremeMethod,
+    HistoricalYears,
     WeatherQueryRequest,
+    SeasonalQueryRequest,
     WeatherQueryResponse,
-    QueryInfo,
-    VariableData,
-    Statistics,
-    TrendAnalysis,
-    GridPoint,
-    DataSource,
-    Metadata,
-    Location
+    ProbabilityRequest,
+    ProbabilityResponse,
+    CalendarRequest,
+    CalendarResponse
 )
+from quadcode.app.models.timeseries import TimeSeriesRequest
 from quadcode.app.services.earthdata_service import EarthdataService, get_earthdata_service
-from quadcode.app.core.utils import compute_statistics, compute_probabilities, compute_grid_offset, compute_trend_analysis
+from quadcode.app.services.query_service import (
+    resolve_year_range,
+    seasonal_cache_key,
+    run_seasonal_query,
+    answer_query,
+    store_distributions,
+    parse_thresholds,
+    canonical_query,
+    year_range_closed,
+    query_etag
+)
+from quadcode.app.services.calendar_service import build_calendar
+from quadcode.app.services.timeseries_service import (
+    parse_window,
+    plan_timeseries,
+    timeseries_schema,
+    timeseries_batches,
+    canonical_timeseries,
+    date_range_closed,
+    timeseries_etag
+)
+from quadcode.app.services.point_store import PointStore, get_point_store
+from quadcode.app.services.climatology import ClimatologyStore, get_climatology_store
+from quadcode.app.services.fetch_policy import CircuitOpenError
+from quadcode.app.core.cache import TTLCache, get_query_cache, get_distribution_cache
+from quadcode.app.core.utils import compute_probabilities_sorted
+from quadcode.app.core.serialization import (
+    render,
+    negotiate_format,
+    negotiate_encoding,
+    weather_columns,
+    calendar_columns
+)
+from quadcode.app.core.http_cache import cache_control, etag_matches
+from quadcode.app.core.export import ExportFormat, MEDIA_TYPES, check_format, prime, stream_table
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +69,11 @@ router = APIRouter()
 @router.post("/query", response_model=WeatherQueryResponse)
 async def query_weather(
     request: WeatherQueryRequest,
-    service: EarthdataService = Depends(get_earthdata_service)
+    http_request: Request,
+    service: EarthdataService = Depends(get_earthdata_service),
+    cache: TTLCache = Depends(get_query_cache),
+    distributions: TTLCache = Depends(get_distribution_cache),
+    climatology: Optional[ClimatologyStore] = Depends(get_climatology_store)
 ):
     """
     Query historical weather data for a given location and day-of-year
@@ -39,245 +81,352 @@ async def query_weather(
     Args:
         request: Weather query request with location, date, variables, thresholds
         service: EarthdataService instance (injected)
+        http_request: Incoming HTTP request, used for content negotiation
+        cache: Query result cache (injected)
+        distributions: Cache of sorted samples for /probabilities (injected)
+        climatology: Precomputed climatology tiles (injected)
 
     Returns:
-        WeatherQueryResponse with historical data, statistics, and probabilities
+        WeatherQueryResponse with historical data, statistics, and probabilities,
+        as JSON, MessagePack or Arrow IPC depending on the Accept header
 
     Raises:
         HTTPException: 400 for invalid parameters, 500 for server errors
     """
     try:
-        from datetime import datetime
+        # Smart year selection: Adjust year range based on number of variables
+        start_year, end_year = resolve_year_range(request)
+
+        response = await answer_query(request, start_year, end_year, service, cache, distributions, climatology)
+
+    except CircuitOpenError as e:
+        # Upstream unhealthy: fail fast instead of degrading the statistics
+        logger.warning(f"Upstream unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        # Client errors (bad input)
+        logger.warning(f"Invalid request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        # Unexpected errors
+        logger.error(f"Unexpected error processing weather query: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        # Extract request parameters
-        lat = request.location.lat
-        lon = request.location.lon
-        month = request.day_of_year.month
-        day = request.day_of_year.day
-        start_year = request.historical_years.start_year
-        end_year = request.historical_years.end_year
+    return render(http_request, response, weather_columns)
+
+
+@router.get("/query", response_model=WeatherQueryResponse)
+async def get_weather_query(
+    http_request: Request,
+    lat: float = Query(..., description="Latitude"),
+    lon: float = Query(..., description="Longitude"),
+    month: int = Query(..., description="Month (1-12)"),
+    day: int = Query(..., description="Day of month"),
+    start_year: int = Query(..., description="Start year"),
+    end_year: int = Query(..., description="End year"),
+    variables: str = Query(..., description="Comma-separated variables, e.g. temperature,precipitation"),
+    thresholds: Optional[str] = Query(
+        None,
+        description="Comma-separated variable:label:value thresholds, e.g. temperature:hot:35,temperature:cold:5"
+    ),
+    include_distribution: bool = Query(False, description="Include the sorted empirical distribution"),
+    confidence_intervals: bool = Query(False, description="Include bootstrap confidence intervals"),
+    extremes: Optional[ExtremeMethod] = Query(None, description="Fit an extreme-value model: gev or pot"),
+    service: EarthdataService = Depends(get_earthdata_service),
+    cache: TTLCache = Depends(get_query_cache),
+    distributions: TTLCache = Depends(get_distribution_cache),
+    climatology: Optional[ClimatologyStore] = Depends(get_climatology_store)
+):
+    """
+    Cacheable form of POST /query, for browsers, CDNs and reverse proxies
+
+    Each result has one canonical URL: the location snapped to the grid
+    cells read, the effective year range, sorted variables and thresholds.
+    Other spellings are redirected to it with 308. Responses carry a strong
+    ETag known before the query runs, so If-None-Match is answered with 304
+    without data I/O, and a year range whose data is final is served as
+    immutable for a year. Responses with missing years are not cached.
+
+    Returns:
+        WeatherQueryResponse as for POST /query, with ETag and Cache-Control headers
+
+    Raises:
+        HTTPException: 400 for invalid parameters, 503 if upstream is unavailable, 500 for server errors
+    """
+    try:
+        request = WeatherQueryRequest(
+            location=Location(lat=lat, lon=lon),
+            day_of_year=DayOfYear(month=month, day=day),
+            historical_years=HistoricalYears(start_year=start_year, end_year=end_year),
+            variables=variables.split(","),
+            thresholds=parse_thresholds(thresholds),
+            include_distribution=include_distribution,
+            confidence_intervals=confidence_intervals,
+            extremes=extremes
+        )
 
         # Smart year selection: Adjust year range based on number of variables
-        # Single variable: use 5 years; Multiple variables: use 3 years
-        current_year = datetime.now().year
-        num_variables = len(request.variables)
-
-        # If user didn't specify custom years, apply smart defaults
-        # Check if using default years (1980 is the model default) or requesting too many years
-        if start_year == 1980 or (current_year - end_year <= 1 and end_year - start_year + 1 > 5):
-            if num_variables == 1:
-                # Single variable: fetch 5 years of data
-                max_years = 5
-                end_year = current_year - 1
-                start_year = end_year - (max_years - 1)
-                logger.info(f"Smart year selection: Single variable, using {max_years} years ({start_year}-{end_year})")
-            else:
-                # Multiple variables: fetch 3 years of data for faster response
-                max_years = 3
-                end_year = current_year - 1
-                start_year = end_year - (max_years - 1)
-                logger.info(f"Smart year selection: {num_variables} variables, using {max_years} years ({start_year}-{end_year}) for faster performance")
-
-        logger.info(f"Processing query for {request.location.name or f'({lat}, {lon})'} on {month}/{day}")
-
-        # Fetch data for each requested variable
-        historical_data = {}
-        actual_grid_points = {}
-        missing_data = {}
-
-        for variable in request.variables:
-            logger.info(f"Fetching {variable} data")
-
-            if variable == "temperature":
-                data = await service.fetch_temperature_data(lat, lon, month, day, start_year, end_year)
-
-                if data["values"]:
-                    # Compute statistics
-                    stats = compute_statistics(data["values"])
-
-                    # Compute trend analysis
-                    trend_data = compute_trend_analysis(data["values"], data["years"])
-                    stats["trend"] = TrendAnalysis(**trend_data)
-
-                    # Compute probabilities if thresholds provided
-                    probs = {}
-                    if request.thresholds and variable in request.thresholds:
-                        probs = compute_probabilities(data["values"], request.thresholds[variable])
-
-                    # Store variable data
-                    historical_data[variable] = VariableData(
-                        values=data["values"],
-                        years=data["years"],
-                        statistics=Statistics(**stats),
-                        probabilities=probs
-                    )
-
-                    # Store grid point info
-                    if data["actual_lat"] is not None and data["actual_lon"] is not None:
-                        actual_grid_points[variable] = GridPoint(
-                            lat=data["actual_lat"],
-                            lon=data["actual_lon"],
-                            dataset="MERRA-2 M2SDNXSLV"
-                        )
-
-                    # Store missing years
-                    if data["missing_years"]:
-                        missing_data[variable] = data["missing_years"]
-                        logger.warning(f"Missing {variable} data for years: {data['missing_years']}")
-                else:
-                    logger.warning(f"No {variable} data available")
-
-            elif variable == "precipitation":
-                data = await service.fetch_precipitation_data(lat, lon, month, day, start_year, end_year)
-
-                if data["values"]:
-                    stats = compute_statistics(data["values"])
-
-                    # Compute trend analysis
-                    trend_data = compute_trend_analysis(data["values"], data["years"])
-                    stats["trend"] = TrendAnalysis(**trend_data)
-
-                    probs = {}
-                    if request.thresholds and variable in request.thresholds:
-                        probs = compute_probabilities(data["values"], request.thresholds[variable])
-
-                    historical_data[variable] = VariableData(
-                        values=data["values"],
-                        years=data["years"],
-                        statistics=Statistics(**stats),
-                        probabilities=probs
-                    )
-
-                    if data["actual_lat"] is not None and data["actual_lon"] is not None:
-                        actual_grid_points[variable] = GridPoint(
-                            lat=data["actual_lat"],
-                            lon=data["actual_lon"],
-                            dataset="GPM IMERG v07"
-                        )
-
-                    if data["missing_years"]:
-                        missing_data[variable] = data["missing_years"]
-                        logger.warning(f"Missing {variable} data for years: {data['missing_years']}")
-                else:
-                    logger.warning(f"No {variable} data available")
-
-            elif variable == "wind_speed":
-                data = await service.fetch_wind_data(lat, lon, month, day, start_year, end_year)
-
-                if data["values"]:
-                    stats = compute_statistics(data["values"])
-
-                    # Compute trend analysis
-                    trend_data = compute_trend_analysis(data["values"], data["years"])
-                    stats["trend"] = TrendAnalysis(**trend_data)
-
-                    probs = {}
-                    if request.thresholds and variable in request.thresholds:
-                        probs = compute_probabilities(data["values"], request.thresholds[variable])
-
-                    historical_data[variable] = VariableData(
-                        values=data["values"],
-                        years=data["years"],
-                        statistics=Statistics(**stats),
-                        probabilities=probs
-                    )
-
-                    if data["actual_lat"] is not None and data["actual_lon"] is not None:
-                        actual_grid_points[variable] = GridPoint(
-                            lat=data["actual_lat"],
-                            lon=data["actual_lon"],
-                            dataset="MERRA-2 M2T1NXSLV"
-                        )
-
-                    if data["missing_years"]:
-                        missing_data[variable] = data["missing_years"]
-                        logger.warning(f"Missing {variable} data for years: {data['missing_years']}")
-                else:
-                    logger.warning(f"No {variable} data available")
-
-            elif variable == "humidity":
-                data = await service.fetch_humidity_data(lat, lon, month, day, start_year, end_year)
-
-                if data["values"]:
-                    stats = compute_statistics(data["values"])
-
-                    # Compute trend analysis
-                    trend_data = compute_trend_analysis(data["values"], data["years"])
-                    stats["trend"] = TrendAnalysis(**trend_data)
-
-                    probs = {}
-                    if request.thresholds and variable in request.thresholds:
-                        probs = compute_probabilities(data["values"], request.thresholds[variable])
-
-                    historical_data[variable] = VariableData(
-                        values=data["values"],
-                        years=data["years"],
-                        statistics=Statistics(**stats),
-                        probabilities=probs
-                    )
-
-                    if data["actual_lat"] is not None and data["actual_lon"] is not None:
-                        actual_grid_points[variable] = GridPoint(
-                            lat=data["actual_lat"],
-                            lon=data["actual_lon"],
-                            dataset="MERRA-2 M2T1NXSLV"
-                        )
-
-                    if data["missing_years"]:
-                        missing_data[variable] = data["missing_years"]
-                        logger.warning(f"Missing {variable} data for years: {data['missing_years']}")
-                else:
-                    logger.warning(f"No {variable} data available")
-
-            else:
-                logger.warning(f"Unknown variable: {variable}")
-
-        # Build query info
-        day_of_year_str = f"{month_name[month]} {day}"
-
-        query_info = QueryInfo(
-            requested_location=request.location,
-            actual_grid_points=actual_grid_points,
-            day_of_year=day_of_year_str,
-            years_analyzed=end_year - start_year + 1,
-            data_period=f"{start_year}-{end_year}",
-            missing_data=missing_data if missing_data else None
+        effective_start, effective_end = resolve_year_range(request)
+        closed = year_range_closed(effective_end)
+
+        canonical = canonical_query(request, effective_start, effective_end)
+        if http_request.url.query != canonical:
+            # Smart year selection moves with the calendar, so only explicit years redirect for good
+            explicit = (effective_start, effective_end) == (start_year, end_year)
+            return RedirectResponse(
+                f"{http_request.url.path}?{canonical}",
+                status_code=308,
+                headers={"Cache-Control": cache_control(closed and explicit)}
+            )
+
+        etag = query_etag(
+            request, canonical, climatology, effective_start, effective_end,
+            negotiate_format(http_request.headers.get("accept")),
+            negotiate_encoding(http_request.headers.get("accept-encoding"))
         )
+        headers = {"ETag": etag, "Cache-Control": cache_control(closed)}
+        if etag_matches(http_request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"Vary": "Accept, Accept-Encoding", **headers})
 
-        # Build metadata
-        metadata = Metadata(
-            data_sources={
-                "temperature": DataSource(
-                    name="MERRA-2 M2SDNXSLV v5.12.4",
-                    url="https://disc.gsfc.nasa.gov/datasets/M2SDNXSLV_5.12.4/summary"
-                ),
-                "precipitation": DataSource(
-                    name="GPM IMERG Final v07",
-                    url="https://gpm.nasa.gov/data/imerg"
-                )
-            },
-            units={
-                "temperature": "celsius",
-                "precipitation": "mm/day",
-                "wind_speed": "m/s",
-                "humidity": "percent"
-            }
+        response = await answer_query(
+            request, effective_start, effective_end, service, cache, distributions, climatology
         )
 
-        response = WeatherQueryResponse(
-            query_info=query_info,
-            historical_data=historical_data,
-            metadata=metadata
+    except CircuitOpenError as e:
+        logger.warning(f"Upstream unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        logger.warning(f"Invalid request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error processing weather query: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    if response.query_info.missing_data:
+        # A later request may find the missing years, so this result is not the final one
+        headers = {"Cache-Control": "no-store"}
+    return render(http_request, response, weather_columns, headers=headers)
+
+
+@router.post("/seasonal", response_model=WeatherQueryResponse)
+async def query_seasonal(
+    request: SeasonalQueryRequest,
+    http_request: Request,
+    service: EarthdataService = Depends(get_earthdata_service),
+    cache: TTLCache = Depends(get_query_cache),
+    distributions: TTLCache = Depends(get_distribution_cache)
+):
+    """
+    Query the seasonal mean of weather variables for each year
+
+    Reads the monthly-mean products, so long year ranges stay cheap; the
+    product used for each variable is reported in actual_grid_points.
+
+    Args:
+        request: Seasonal query request with location, months, years, variables, thresholds
+        http_request: Incoming HTTP request, used for content negotiation
+        service: EarthdataService instance (injected)
+        cache: Query result cache (injected)
+        distributions: Cache of sorted samples for /probabilities (injected)
+
+    Returns:
+        WeatherQueryResponse with one seasonal mean per year, statistics, and probabilities
+
+    Raises:
+        HTTPException: 400 for invalid parameters, 503 if upstream is unavailable, 500 for server errors
+    """
+    try:
+        cache_key = seasonal_cache_key(request)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("Serving seasonal query from cache")
+            store_distributions(distributions, cached)
+            query_info = cached.query_info.model_copy(update={"requested_location": request.location})
+            response = cached.model_copy(update={"query_info": query_info})
+        else:
+            logger.info(f"Processing seasonal query for months {request.months}")
+
+            response = await run_seasonal_query(request, service)
+            cache.set(cache_key, response)
+            store_distributions(distributions, response)
+
+    except CircuitOpenError as e:
+        logger.warning(f"Upstream unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        logger.warning(f"Invalid request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error processing seasonal query: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    return render(http_request, response, weather_columns)
+
+
+@router.post("/probabilities", response_model=ProbabilityResponse)
+async def evaluate_probabilities(
+    request: ProbabilityRequest,
+    distributions: TTLCache = Depends(get_distribution_cache)
+):
+    """
+    Evaluate new thresholds against the distributions of a previous query
+
+    Uses binary search over the cached sorted samples, so threshold changes
+    on the dashboard never trigger data I/O.
+
+    Args:
+        request: Distribution key from a query response and thresholds per variable
+        distributions: Cache of sorted samples (injected)
+
+    Returns:
+        ProbabilityResponse with probabilities per variable
+
+    Raises:
+        HTTPException: 404 if the distributions have expired or never existed
+    """
+    cached = distributions.get(request.distribution_key)
+    if cached is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Distribution not found or expired; rerun /query"
         )
 
-        logger.info(f"Successfully processed query")
-        return response
+    probabilities = {
+        variable: compute_probabilities_sorted(cached[variable], thresholds)
+        for variable, thresholds in request.thresholds.items()
+        if variable in cached
+    }
 
+    return ProbabilityResponse(
+        distribution_key=request.distribution_key,
+        probabilities=probabilities
+    )
+
+
+@router.post("/calendar", response_model=CalendarResponse)
+async def query_calendar(
+    request: CalendarRequest,
+    http_request: Request,
+    service: EarthdataService = Depends(get_earthdata_service),
+    store: PointStore = Depends(get_point_store)
+):
+    """
+    Query per-day statistics and probabilities for every day of the year at one location
+
+    Replaces 366 separate /query calls when picking the best week for an event.
+
+    Args:
+        request: Calendar request with location, years, variables, thresholds
+        http_request: Incoming HTTP request, used for content negotiation
+        service: EarthdataService instance (injected)
+        store: Point store of extracted daily series (injected)
+
+    Returns:
+        CalendarResponse with one entry per calendar day and variable
+
+    Raises:
+        HTTPException: 400 for invalid parameters, 500 for server errors
+    """
+    try:
+        # Smart year selection: Adjust year range based on number of variables
+        start_year, end_year = resolve_year_range(request)
+
+        logger.info(f"Processing calendar for ({request.location.lat}, {request.location.lon}), {start_year}-{end_year}")
+        response = await build_calendar(request, service, store, start_year, end_year)
+
+    except CircuitOpenError as e:
+        logger.warning(f"Upstream unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
-        # Client errors (bad input)
         logger.warning(f"Invalid request: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        # Unexpected errors
-        logger.error(f"Unexpected error processing weather query: {e}", exc_info=True)
+        logger.error(f"Unexpected error processing calendar query: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
+
+    return render(http_request, response, calendar_columns)
+
+
+@router.get("/timeseries")
+async def get_timeseries(
+    http_request: Request,
+    lat: float = Query(..., description="Latitude"),
+    lon: float = Query(..., description="Longitude"),
+    start_date: date = Query(..., description="First day, YYYY-MM-DD"),
+    end_date: date = Query(..., description="Last day, YYYY-MM-DD"),
+    variables: str = Query(..., description="Comma-separated variables, e.g. temperature,precipitation"),
+    window: Optional[str] = Query(
+        None,
+        description="Calendar window kept in each year as MM-DD..MM-DD, e.g. 03-01..05-31; may wrap the new year"
+    ),
+    format: ExportFormat = Query(ExportFormat.NDJSON, description="ndjson, csv, parquet or arrow"),
+    service: EarthdataService = Depends(get_earthdata_service),
+    store: PointStore = Depends(get_point_store)
+):
+    """
+    Continuous daily series at one location over a date range, streamed in date order
+
+    One row per day with, for each variable, its value and a missing flag.
+    Days missing from the point store are read as contiguous date ranges
+    per collection, one search each with its granules read concurrently,
+    and stored back. Caching follows GET /query: one canonical URL (others
+    are redirected with 308), a strong ETag answered with 304 before any
+    data I/O, and immutable responses once the range is final. A response
+    that has to read from Earthdata may end with missing days and is not
+    cached; once stored, the same series is.
+
+    Returns:
+        Streamed NDJSON, CSV, Parquet or Arrow IPC table, one row group per year
+
+    Raises:
+        HTTPException: 400 for invalid parameters, 503 if upstream is unavailable, 500 for server errors
+    """
+    try:
+        window_start, window_end = parse_window(window)
+        request = TimeSeriesRequest(
+            location=Location(lat=lat, lon=lon),
+            start_date=start_date,
+            end_date=end_date,
+            window_start=window_start,
+            window_end=window_end,
+            variables=variables.split(",")
+        )
+        check_format(format)
+
+        closed = date_range_closed(request.end_date)
+        canonical = canonical_timeseries(request, format)
+        if http_request.url.query != canonical:
+            return RedirectResponse(
+                f"{http_request.url.path}?{canonical}",
+                status_code=308,
+                headers={"Cache-Control": cache_control(closed)}
+            )
+
+        etag = timeseries_etag(request, canonical)
+        headers = {"ETag": etag, "Cache-Control": cache_control(closed)}
+        if etag_matches(http_request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        plan = plan_timeseries(request, store)
+        if not plan.complete:
+            # Reads that fail leave days missing, so this series may not be the final one
+            headers = {"Cache-Control": "no-store"}
+        logger.info(f"Streaming {plan.day_count} days for ({lat}, {lon}), {start_date} to {end_date}, "
+                    f"{sum(len(runs) for runs in plan.runs.values())} reads")
+        batches = await prime(timeseries_batches(request, plan, service, store))
+
+    except CircuitOpenError as e:
+        logger.warning(f"Upstream unavailable: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        logger.warning(f"Invalid request: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error processing time series: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    return StreamingResponse(
+        stream_table(batches, timeseries_schema(request), format),
+        media_type=MEDIA_TYPES[format],
+        headers=headers
+    )
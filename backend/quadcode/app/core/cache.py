@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+In-memory caching helpers for weather query results
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 86400.0):
+        """
+        Args:
+            max_entries: Maximum number of entries kept before LRU eviction
+            ttl_seconds: Lifetime of an entry in seconds
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store value under key, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def query_cache_key(
+    lat: float,
+    lon: float,
+    month: int,
+    day: int,
+    start_year: int,
+    end_year: int,
+    variables: Iterable[str],
+    thresholds: Optional[Dict[str, Dict[str, float]]] = None,
+    options: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Build a canonical cache key for a weather query.
+
+    The key is independent of variable ordering and of the optional
+    location name, so equivalent requests share a cache entry.
+
+    Args:
+        lat: Latitude
+        lon: Longitude
+        month: Month (1-12)
+        day: Day of month (1-31)
+        start_year: Effective start year
+        end_year: Effective end year
+        variables: Requested variable names
+        thresholds: Optional thresholds per variable
+        options: Optional response options that change the payload
+
+    Returns:
+        Hex digest identifying the query
+    """
+    payload = {
+        "lat": round(float(lat), 4),
+        "lon": round(float(lon), 4),
+        "month": month,
+        "day": day,
+        "start_year": start_year,
+        "end_year": end_year,
+        "variables": sorted(getattr(v, "value", v) for v in variables),
+        "thresholds": thresholds or {},
+        "options": options or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def get_query_cache() -> TTLCache:
+    """
+    Get singleton query result cache.
+    Size and lifetime are configurable through QUERY_CACHE_MAX_ENTRIES
+    and QUERY_CACHE_TTL_SECONDS.
+    """
+    return TTLCache(
+        max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512")),
+        ttl_seconds=float(os.getenv("QUERY_CACHE_TTL_SECONDS", "86400")),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_distribution_cache() -> TTLCache:
+    """
+    Get singleton cache of sorted per-variable samples used for threshold evaluation.
+    Size and lifetime are configurable through DISTRIBUTION_CACHE_MAX_ENTRIES
+    and DISTRIBUTION_CACHE_TTL_SECONDS.
+    """
+    return TTLCache(
+        max_entries=int(os.getenv("DISTRIBUTION_CACHE_MAX_ENTRIES", "4096")),
+        ttl_seconds=float(os.getenv("DISTRIBUTION_CACHE_TTL_SECONDS", "86400")),
+    )
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Streaming table writers: CSV, NDJSON, Parquet and Arrow IPC written one row group at a time
+"""
+
+import csv
+import io
+from enum import Enum
+from typing import AsyncIterator, Dict, List, Tuple
+
+import logging
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+from quadcode.app.core.serialization import ARROW, Columns, dumps_json
+
+logger = logging.getLogger(__name__)
+
+
+class ExportFormat(str, Enum):
+    """Formats of streamed exports"""
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+    ARROW = "arrow"
+
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv; charset=utf-8",
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+    ExportFormat.ARROW: ARROW,
+}
+
+FILE_EXTENSIONS = {
+    ExportFormat.CSV: "csv",
+    ExportFormat.NDJSON: "ndjson",
+    ExportFormat.PARQUET: "parquet",
+    ExportFormat.ARROW: "arrows",
+}
+
+# Table layout: (column name, type) pairs with types "string", "int", "float" or "bool"
+Schema = List[Tuple[str, str]]
+
+_ARROW_TYPES = {"string": "string", "int": "int32", "float": "float64", "bool": "bool_"}
+
+
+def check_format(fmt: ExportFormat) -> None:
+    """
+    Raise if a format cannot be written in this installation
+
+    Raises:
+        ValueError: If pyarrow is missing for Parquet or Arrow IPC
+    """
+    if fmt == ExportFormat.PARQUET and pq is None:
+        raise ValueError("Parquet export requires pyarrow")
+    if fmt == ExportFormat.ARROW and pa is None:
+        raise ValueError("Arrow export requires pyarrow")
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file collecting bytes until they are drained.
+    Keeps the total position, since the Parquet footer records absolute offsets.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _CsvWriter:
+    def __init__(self, schema: Schema):
+        self._names = [name for name, _ in schema]
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._writer.writerow(self._names)
+
+    def write(self, columns: Columns) -> bytes:
+        self._writer.writerows(zip(*[
+            ["" if value is None else value for value in columns[name]] for name in self._names
+        ]))
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _NdjsonWriter:
+    """One JSON object per row and line"""
+
+    def __init__(self, schema: Schema):
+        self._names = [name for name, _ in schema]
+
+    def write(self, columns: Columns) -> bytes:
+        return b"".join(
+            dumps_json(dict(zip(self._names, row))) + b"\n"
+            for row in zip(*[columns[name] for name in self._names])
+        )
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _ArrowWriter:
+    def __init__(self, schema: Schema, fmt: ExportFormat):
+        self._schema = pa.schema([(name, getattr(pa, _ARROW_TYPES[kind])()) for name, kind in schema])
+        self._sink = _ChunkSink()
+        if fmt == ExportFormat.PARQUET:
+            self._writer = pq.ParquetWriter(self._sink, self._schema, compression="zstd")
+        else:
+            self._writer = pa.ipc.new_stream(self._sink, self._schema)
+
+    def write(self, columns: Columns) -> bytes:
+        # One call per batch: a Parquet row group or an IPC record batch message
+        self._writer.write(pa.record_batch(columns, schema=self._schema))
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+async def stream_table(
+    batches: AsyncIterator[Columns],
+    schema: Schema,
+    fmt: ExportFormat
+) -> AsyncIterator[bytes]:
+    """
+    Encode a table one row group at a time
+
+    Only the current batch and its encoded bytes are held, so memory does
+    not grow with the number of rows. The response has already started
+    when a batch fails, so errors end the stream early (CSV is then
+    truncated, Parquet lacks its footer) and are logged.
+
+    Args:
+        batches: Column batches following the schema; empty batches are skipped
+        schema: Column names and types
+        fmt: Output format
+
+    Yields:
+        Encoded bytes, one chunk per row group plus the header and footer
+    """
+    if fmt == ExportFormat.CSV:
+        writer = _CsvWriter(schema)
+    elif fmt == ExportFormat.NDJSON:
+        writer = _NdjsonWriter(schema)
+    else:
+        writer = _ArrowWriter(schema, fmt)
+    rows = 0
+    groups = 0
+    try:
+        async for columns in batches:
+            size = len(next(iter(columns.values()), []))
+            if not size:
+                continue
+            data = writer.write(columns)
+            rows += size
+            groups += 1
+            if data:
+                yield data
+        data = writer.close()
+        if data:
+            yield data
+    except Exception as e:
+        logger.error("Export failed after %d rows: %s", rows, e, exc_info=True)
+        return
+    logger.info("Exported %d rows in %d row groups as %s", rows, groups, fmt.value)
+
+
+async def _first_then_rest(first: Columns, batches: AsyncIterator[Columns]) -> AsyncIterator[Columns]:
+    yield first
+    async for columns in batches:
+        yield columns
+
+
+async def prime(batches: AsyncIterator[Columns]) -> AsyncIterator[Columns]:
+    """
+    Compute the first batch before the response starts, so errors up to
+    there are raised here and can still get a status code
+
+    Returns:
+        The same batches, the first one included
+    """
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        return batches
+    return _first_then_rest(first, batches)
+
+
+def empty_columns(schema: Schema) -> Dict[str, List]:
+    """Empty column lists for a schema"""
+    return {name: [] for name, _ in schema}
+
+
+def content_disposition(name: str, fmt: ExportFormat) -> str:
+    """Content-Disposition header of an export download"""
+    return f'attachment; filename="{name}.{FILE_EXTENSIONS[fmt]}"'
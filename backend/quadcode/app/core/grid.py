@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Grid definitions and day-of-year helpers for the gridded datasets
+"""
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Iterable, Tuple
+
+import numpy as np
+
+# Number of day slots in a (leap-year) calendar, including February 29
+DAYS_PER_YEAR = 366
+
+
+@dataclass(frozen=True)
+class Grid:
+    """Regular latitude/longitude grid"""
+    name: str
+    lat_origin: float
+    lat_step: float
+    lat_count: int
+    lon_origin: float
+    lon_step: float
+    lon_count: int
+
+    def snap(self, lat: float, lon: float) -> Tuple[int, int, float, float]:
+        """
+        Find the nearest grid cell to a location. Ties halfway between two
+        cells go to the even index (Python's round), which is not always the
+        cell .sel(method='nearest') picks, so every read selects cells by
+        these indices rather than by coordinate.
+
+        Args:
+            lat: Latitude
+            lon: Longitude
+
+        Returns:
+            Tuple of (lat_index, lon_index, grid_lat, grid_lon)
+        """
+        lat_idx = int(np.clip(round((lat - self.lat_origin) / self.lat_step), 0, self.lat_count - 1))
+        lon_idx = int(np.clip(round((lon - self.lon_origin) / self.lon_step), 0, self.lon_count - 1))
+        return (
+            lat_idx,
+            lon_idx,
+            round(self.lat_origin + lat_idx * self.lat_step, 6),
+            round(self.lon_origin + lon_idx * self.lon_step, 6),
+        )
+
+    def cell_bounds(self, lat_idx: int, lon_idx: int) -> Tuple[float, float, float, float]:
+        """
+        Area of locations that snap to a cell, as (lat_min, lat_max, lon_min, lon_max).
+        Edge cells extend to the poles and the antimeridian, as snap clips to them.
+        """
+        lat = self.lat_origin + lat_idx * self.lat_step
+        lon = self.lon_origin + lon_idx * self.lon_step
+        return (
+            lat - self.lat_step / 2 if lat_idx > 0 else -90.0,
+            lat + self.lat_step / 2 if lat_idx < self.lat_count - 1 else 90.0,
+            lon - self.lon_step / 2 if lon_idx > 0 else -180.0,
+            lon + self.lon_step / 2 if lon_idx < self.lon_count - 1 else 180.0,
+        )
+
+
+# MERRA-2 native 0.5° x 0.625° grid
+MERRA2_GRID = Grid("MERRA-2", -90.0, 0.5, 361, -180.0, 0.625, 576)
+
+# GPM IMERG 0.1° x 0.1° grid (cell centers)
+IMERG_GRID = Grid("IMERG", -89.95, 0.1, 1800, -179.95, 0.1, 3600)
+
+
+def canonical_location(grids: Iterable[Grid], lat: float, lon: float) -> Tuple[float, float]:
+    """
+    Representative location of the grid cells a location snaps to.
+
+    Every location snapping to the same cell on each grid maps to the
+    center of the intersection of those cells, so equivalent queries share
+    one location; it snaps back to the same cells.
+
+    Args:
+        grids: Grids of the datasets read
+        lat: Latitude
+        lon: Longitude
+
+    Returns:
+        Tuple of (lat, lon), rounded to 6 decimals
+    """
+    lat_min, lat_max, lon_min, lon_max = -90.0, 90.0, -180.0, 180.0
+    for grid in set(grids):
+        lat_idx, lon_idx, _, _ = grid.snap(lat, lon)
+        cell = grid.cell_bounds(lat_idx, lon_idx)
+        lat_min, lat_max = max(lat_min, cell[0]), min(lat_max, cell[1])
+        lon_min, lon_max = max(lon_min, cell[2]), min(lon_max, cell[3])
+    return round((lat_min + lat_max) / 2, 6), round((lon_min + lon_max) / 2, 6)
+
+
+def day_of_year_index(month: int, day: int) -> int:
+    """
+    Zero-based index of a calendar day in a 366-day year.
+    February 29 always has its own slot so every year shares one layout.
+    """
+    return date(2000, month, day).timetuple().tm_yday - 1
+
+
+# Zero-based index of the first day of each month in a 366-day year
+_MONTH_OFFSETS = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+
+def day_of_year_indices(months: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """Vectorized day_of_year_index for arrays of months and days"""
+    return _MONTH_OFFSETS[np.asarray(months, dtype=int) - 1] + np.asarray(days, dtype=int) - 1
+
+
+def day_from_index(index: int) -> Tuple[int, int]:
+    """Inverse of day_of_year_index, returning (month, day)"""
+    d = date.fromordinal(date(2000, 1, 1).toordinal() + index)
+    return d.month, d.day
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+HTTP caching helpers: strong entity tags, conditional requests and Cache-Control policies
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lifetime of responses that can still change, e.g. over a year range reaching recent data
+OPEN_MAX_AGE_SECONDS = int(os.getenv("HTTP_OPEN_MAX_AGE_SECONDS", "3600"))
+
+# Lifetime of immutable responses
+IMMUTABLE_MAX_AGE_SECONDS = 365 * 24 * 3600
+
+
+def strong_etag(*parts: Any) -> str:
+    """
+    Strong entity tag of a representation, derived from everything that determines its bytes
+
+    Args:
+        *parts: JSON-serializable inputs of the representation
+
+    Returns:
+        Quoted entity tag
+    """
+    encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches an entity tag.
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_control(immutable: bool) -> str:
+    """Cache-Control of a shareable response: a year for immutable ones, OPEN_MAX_AGE_SECONDS otherwise"""
+    if immutable:
+        return f"public, max-age={IMMUTABLE_MAX_AGE_SECONDS}, immutable"
+    return f"public, max-age={OPEN_MAX_AGE_SECONDS}"
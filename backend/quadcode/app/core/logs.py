@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Logging pipeline: queue-based handler, structured JSON output, correlation IDs and hot-path sampling
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+# Correlation ID of the request being handled, if any
+correlation_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("correlation_id", default=None)
+
+# Pass as extra= on messages logged once per year or granule, so they are sampled and rate limited
+PER_YEAR = {"per_year": True}
+
+# LogRecord attributes that are not user-supplied extra fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "correlation_id", "per_year"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class CorrelationIdFilter(logging.Filter):
+    """Attach the current request's correlation ID to every record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class HotPathFilter(logging.Filter):
+    """
+    Sample and rate limit records marked with PER_YEAR.
+
+    Keeps one in every sample_every marked INFO/DEBUG records, and at most
+    max_per_second of them per message template; warnings and errors always
+    pass. Suppressed counts are reported, as the suppressed field, on the next
+    record of the same template that passes.
+    """
+
+    def __init__(self, sample_every: int = 1, max_per_second: float = 0):
+        """
+        Args:
+            sample_every: Keep one in this many marked records (1 keeps all)
+            max_per_second: Limit per message template; 0 disables the limit
+        """
+        super().__init__()
+        self.sample_every = max(1, sample_every)
+        self.max_per_second = max_per_second
+        self._counts: Dict[str, int] = {}
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "per_year", False) or record.levelno >= logging.WARNING:
+            return True
+
+        key = str(record.msg)
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+            keep = count % self.sample_every == 0
+
+            if keep and self.max_per_second > 0:
+                now = time.monotonic()
+                start, emitted = self._windows.get(key, (now, 0))
+                if now - start >= 1.0:
+                    start, emitted = now, 0
+                keep = emitted < self.max_per_second
+                self._windows[key] = (start, emitted + keep)
+
+            if not keep:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return False
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with timestamp, level, logger, message, correlation ID and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "correlation_id", None):
+            entry["correlation_id"] = record.correlation_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler renders the message in the calling thread to make the
+    record picklable; records only cross threads here, so the caller just
+    enqueues and message interpolation, JSON encoding and I/O happen in the
+    background.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(stream=None) -> None:
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Configured through LOG_LEVEL, LOG_FORMAT ("json" or "text"),
+    LOG_PER_YEAR_SAMPLE (keep one in N per-year messages) and
+    LOG_PER_YEAR_MAX_PER_SECOND (per message template, 0 for no limit).
+
+    Args:
+        stream: Output stream, stderr by default
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    writer = logging.StreamHandler(stream or sys.stderr)
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        writer.setFormatter(JsonFormatter())
+    else:
+        writer.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s'
+        ))
+
+    handler = _DeferredQueueHandler(queue.SimpleQueue())
+    handler.addFilter(CorrelationIdFilter())
+    handler.addFilter(HotPathFilter(
+        sample_every=int(os.getenv("LOG_PER_YEAR_SAMPLE", "1")),
+        max_per_second=float(os.getenv("LOG_PER_YEAR_MAX_PER_SECOND", "20")),
+    ))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    _listener = logging.handlers.QueueListener(handler.queue, writer, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class CorrelationIdMiddleware:
+    """
+    ASGI middleware giving each request a correlation ID, taken from the
+    X-Request-ID header when present, and echoing it in the response
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope["headers"]:
+            if key.lower() == b"x-request-id":
+                request_id = value.decode(errors="replace")[:128]
+        request_id = request_id or uuid.uuid4().hex
+
+        async def sending(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-request-id", request_id.encode())
+                ])
+            await send(message)
+
+        token = correlation_id.set(request_id)
+        try:
+            await self.app(scope, receive, sending)
+        finally:
+            correlation_id.reset(token)
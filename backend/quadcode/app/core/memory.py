@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Process memory sampling and per-request peak RSS reporting
+"""
+
+import os
+import resource
+import sys
+import threading
+import time
+from typing import Optional, Set
+import logging
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """Resident set size of the process in bytes"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # No procfs: fall back to the high-water mark, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakTracker:
+    """Peak RSS observed between start and stop"""
+
+    def __init__(self):
+        self.start_rss = current_rss()
+        self.peak_rss = self.start_rss
+
+    def observe(self, rss: int) -> None:
+        if rss > self.peak_rss:
+            self.peak_rss = rss
+
+
+class RssSampler:
+    """
+    Background thread sampling RSS for the active peak trackers.
+
+    One thread serves every concurrent request and only runs while at least
+    one tracker is active. RSS is process-wide, so the peak of a request
+    includes the memory of requests overlapping with it.
+    """
+
+    def __init__(self, interval_seconds: float = 0.01):
+        """
+        Args:
+            interval_seconds: Time between samples
+        """
+        self.interval_seconds = interval_seconds
+        self._trackers: Set[PeakTracker] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> PeakTracker:
+        """Start tracking the peak RSS from now on"""
+        tracker = PeakTracker()
+        with self._lock:
+            self._trackers.add(tracker)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quadcode-rss", daemon=True)
+                self._thread.start()
+        return tracker
+
+    def stop(self, tracker: PeakTracker) -> PeakTracker:
+        """Stop tracking, taking a last sample"""
+        tracker.observe(current_rss())
+        with self._lock:
+            self._trackers.discard(tracker)
+        return tracker
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval_seconds)
+            rss = current_rss()
+            with self._lock:
+                if not self._trackers:
+                    self._thread = None
+                    return
+                for tracker in self._trackers:
+                    tracker.observe(rss)
+
+
+_sampler = RssSampler(float(os.getenv("RSS_SAMPLE_INTERVAL_SECONDS", "0.01")))
+
+
+class MemoryReportMiddleware:
+    """
+    ASGI middleware reporting the peak RSS of each request in the
+    X-Peak-RSS-Bytes response header and in the request log line
+    """
+
+    def __init__(self, app, path_prefix: str = "/api/v1/weather"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        tracker = _sampler.start()
+
+        async def sending(message):
+            if message["type"] == "http.response.start":
+                # The response is computed once it starts for these endpoints
+                _sampler.stop(tracker)
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"x-peak-rss-bytes", str(tracker.peak_rss).encode())
+                ])
+                logger.info(
+                    "%s peak RSS %.1f MiB (%+.1f MiB)", scope["path"],
+                    tracker.peak_rss / 2 ** 20, (tracker.peak_rss - tracker.start_rss) / 2 ** 20
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, sending)
+        finally:
+            _sampler.stop(tracker)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Opt-in request profiling with a stack-sampling profiler and a bounded on-disk ring of slow profiles
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Largest request body kept with a profile
+_MAX_BODY_BYTES = 64 * 1024
+
+
+class StackSampler:
+    """
+    Sampling profiler covering every thread of the process.
+
+    A background thread snapshots the stacks of all other threads at a fixed
+    interval and counts them as folded stacks ("thread;module:function:line;...
+    count"), the input format of flame graph tools such as flamegraph.pl and
+    speedscope. Sampling all threads captures the blocking Earthdata reads
+    running in executor threads, not just the event loop; concurrent
+    requests show up in the same profile.
+    """
+
+    def __init__(self, interval_seconds: float = 0.005):
+        """
+        Args:
+            interval_seconds: Time between samples
+        """
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="quadcode-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        """Collected samples as folded stacks, heaviest first"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """
+    Bounded ring of captured profiles on disk.
+
+    Each profile is one JSON file holding the request parameters, its
+    latency and the folded stacks; the oldest files are removed once the
+    ring is full.
+    """
+
+    def __init__(self, root_dir: str, max_profiles: int):
+        """
+        Args:
+            root_dir: Directory holding profiles
+            max_profiles: Number of profiles kept
+        """
+        self.root_dir = root_dir
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.root_dir, f"{profile_id}.json")
+
+    def save(self, record: Dict) -> str:
+        """
+        Persist a profile and drop the oldest ones beyond the ring size
+
+        Args:
+            record: Profile metadata and folded stacks
+
+        Returns:
+            Profile identifier
+        """
+        # Time-ordered identifiers make the ring order the name order
+        profile_id = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        record = dict(record, profile_id=profile_id)
+
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, self._path(profile_id))
+
+            ids = self._ids()
+            for stale in ids[:max(0, len(ids) - self.max_profiles)]:
+                try:
+                    os.remove(self._path(stale))
+                except FileNotFoundError:
+                    pass
+
+        return profile_id
+
+    def _ids(self) -> List[str]:
+        return sorted(name[:-5] for name in os.listdir(self.root_dir) if name.endswith(".json"))
+
+    def list(self) -> List[Dict]:
+        """Metadata of the stored profiles, newest first"""
+        summaries = []
+        for profile_id in reversed(self._ids()):
+            record = self.get(profile_id)
+            if record is not None:
+                record.pop("folded", None)
+                summaries.append(record)
+        return summaries
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        """Load a profile, or None if it does not exist"""
+        if not all(c.isalnum() or c == "-" for c in profile_id):
+            return None
+        try:
+            with open(self._path(profile_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling selected requests.
+
+    A request is profiled when it carries the X-Profile header together with
+    a valid X-Admin-Token, or when it is drawn by PROFILE_SAMPLE_RATE.
+    Admin-requested profiles are always kept; sampled ones only when the
+    request took at least PROFILE_SLOW_SECONDS. Kept profiles are announced
+    through the X-Profile-Id response header.
+    """
+
+    def __init__(
+        self,
+        app,
+        path_prefix: str = "/api/v1/weather",
+        sample_rate: float = 0.0,
+        slow_seconds: float = 5.0,
+        interval_seconds: float = 0.005
+    ):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.interval_seconds = interval_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode().lower(): value.decode() for key, value in scope["headers"]}
+        forced = "x-profile" in headers and is_admin(headers.get("x-admin-token"))
+        if not forced and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+
+        async def recording_receive():
+            message = await receive()
+            if message["type"] == "http.request" and len(body) < _MAX_BODY_BYTES:
+                body.extend(message.get("body", b"")[:_MAX_BODY_BYTES - len(body)])
+            return message
+
+        sampler = StackSampler(self.interval_seconds)
+        started = time.time()
+        start = time.perf_counter()
+        sampler.start()
+
+        async def sending(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                if forced or elapsed >= self.slow_seconds:
+                    # The response is complete once it starts for these endpoints,
+                    # so the profile can be kept and announced in its headers; the
+                    # file is written off the event loop
+                    sampler.stop()
+                    profile_id = await asyncio.to_thread(
+                        self._save, scope, body, started, elapsed, message["status"], forced, sampler
+                    )
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (b"x-profile-id", profile_id.encode())
+                    ])
+            await send(message)
+
+        try:
+            await self.app(scope, recording_receive, sending)
+        finally:
+            sampler.stop()
+
+    def _save(self, scope, body: bytes, started: float, elapsed: float, status: int, forced: bool,
+              sampler: StackSampler) -> str:
+        record = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "query_string": scope.get("query_string", b"").decode(errors="replace"),
+            "body": body.decode(errors="replace"),
+            "started": started,
+            "duration_seconds": elapsed,
+            "status": status,
+            "trigger": "admin" if forced else "sampled",
+            "samples": sampler.samples,
+            "interval_seconds": sampler.interval_seconds,
+            "folded": sampler.folded()
+        }
+        profile_id = get_profile_store().save(record)
+        logger.info(f"Captured profile {profile_id} for {scope['path']} ({elapsed:.2f}s)")
+        return profile_id
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """Whether a token matches ADMIN_TOKEN; admin features are disabled when it is unset"""
+    expected = os.getenv("ADMIN_TOKEN")
+    return bool(expected) and hmac.compare_digest((token or "").encode(), expected.encode())
+
+
+@lru_cache(maxsize=1)
+def get_profile_store() -> ProfileStore:
+    """Get singleton ProfileStore, configured through PROFILE_DIR and PROFILE_MAX_ENTRIES"""
+    root_dir = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "quadcode", "profiles"))
+    return ProfileStore(root_dir, int(os.getenv("PROFILE_MAX_ENTRIES", "50")))
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Declarative registry of Earthdata collections and the variables derived from them
+"""
+
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from quadcode.app.core.grid import Grid, MERRA2_GRID, IMERG_GRID
+
+
+# Temporal resolutions of collections, coarsest first
+RESOLUTIONS = ("monthly", "daily")
+
+
+@dataclass(frozen=True)
+class Collection:
+    """An Earthdata collection with one granule per day or per month"""
+    short_name: str
+    version: str
+    label: str
+    source_name: str
+    source_url: str
+    grid: Grid
+    hour: Optional[int] = None  # hour-of-day step to read from hourly granules; None for daily
+    resolution: str = "daily"
+
+
+@dataclass(frozen=True)
+class VariableSpec:
+    """
+    A weather variable computed from fields of one collection.
+
+    Derived variables also list other variables of the same collection in
+    depends; their transform receives those variables' values next to the
+    raw fields, so shared inputs are read and converted only once.
+    """
+    name: str
+    collection: Collection
+    fields: Tuple[str, ...]
+    transform: Callable[[Dict[str, np.ndarray]], np.ndarray]
+    units: str
+    depends: Tuple[str, ...] = ()
+
+
+def kelvin_to_celsius(temp_k: np.ndarray) -> np.ndarray:
+    """Convert temperature from Kelvin to degrees Celsius"""
+    return temp_k - 273.15
+
+
+def wind_speed(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Wind speed (m/s) from eastward and northward components"""
+    return np.sqrt(u ** 2 + v ** 2)
+
+
+def relative_humidity(qv: np.ndarray, temp_k: np.ndarray, pressure: np.ndarray) -> np.ndarray:
+    """Relative humidity (%) from specific humidity (kg/kg), temperature (K) and pressure (Pa)"""
+    temp_c = temp_k - 273.15
+    es = 611.2 * np.exp(17.67 * temp_c / (temp_k - 29.65))
+    return np.clip(100.0 * (qv * pressure) / (0.622 * es), 0, 100)
+
+
+def dew_point(qv: np.ndarray, pressure: np.ndarray) -> np.ndarray:
+    """Dew point (°C) from specific humidity (kg/kg) and pressure (Pa), Magnus formula"""
+    vapor_pressure = qv * pressure / (0.622 + 0.378 * qv)
+    gamma = np.log(np.maximum(vapor_pressure, 1e-6) / 611.2)
+    return 243.5 * gamma / (17.67 - gamma)
+
+
+def heat_index(temp_c: np.ndarray, rh: np.ndarray) -> np.ndarray:
+    """
+    NWS heat index (°C) from air temperature (°C) and relative humidity (%).
+    Uses the Rothfusz regression with its low/high humidity adjustments
+    where the simple formula gives 80°F or more.
+    """
+    t = temp_c * 9 / 5 + 32
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+
+    full = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+            - 6.83783e-3 * t ** 2 - 5.481717e-2 * rh ** 2 + 1.22874e-3 * t ** 2 * rh
+            + 8.5282e-4 * t * rh ** 2 - 1.99e-6 * t ** 2 * rh ** 2)
+    dry = (rh < 13) & (t >= 80) & (t <= 112)
+    full = np.where(dry, full - (13 - rh) / 4 * np.sqrt(np.maximum(17 - np.abs(t - 95), 0) / 17), full)
+    moist = (rh > 85) & (t >= 80) & (t <= 87)
+    full = np.where(moist, full + (rh - 85) / 10 * (87 - t) / 5, full)
+
+    hi = np.where((simple + t) / 2 >= 80, full, simple)
+    return (hi - 32) * 5 / 9
+
+
+def wind_chill(temp_c: np.ndarray, speed: np.ndarray) -> np.ndarray:
+    """
+    Wind chill (°C) from air temperature (°C) and wind speed (m/s).
+    Outside the index's range (above 10°C or below 4.8 km/h) the air temperature is returned.
+    """
+    v = (speed * 3.6) ** 0.16
+    chill = 13.12 + 0.6215 * temp_c - 11.37 * v + 0.3965 * temp_c * v
+    return np.where((temp_c <= 10) & (speed * 3.6 > 4.8), chill, temp_c)
+
+
+M2SDNXSLV = Collection(
+    short_name="M2SDNXSLV",
+    version="5.12.4",
+    label="MERRA-2 M2SDNXSLV",
+    source_name="MERRA-2 M2SDNXSLV v5.12.4",
+    source_url="https://disc.gsfc.nasa.gov/datasets/M2SDNXSLV_5.12.4/summary",
+    grid=MERRA2_GRID,
+)
+
+M2T1NXSLV = Collection(
+    short_name="M2T1NXSLV",
+    version="5.12.4",
+    label="MERRA-2 M2T1NXSLV",
+    source_name="MERRA-2 M2T1NXSLV v5.12.4",
+    source_url="https://disc.gsfc.nasa.gov/datasets/M2T1NXSLV_5.12.4/summary",
+    grid=MERRA2_GRID,
+    hour=12,
+)
+
+GPM_3IMERGDF = Collection(
+    short_name="GPM_3IMERGDF",
+    version="07",
+    label="GPM IMERG v07",
+    source_name="GPM IMERG Final v07",
+    source_url="https://gpm.nasa.gov/data/imerg",
+    grid=IMERG_GRID,
+)
+
+M2SMNXSLV = Collection(
+    short_name="M2SMNXSLV",
+    version="5.12.4",
+    label="MERRA-2 M2SMNXSLV",
+    source_name="MERRA-2 M2SMNXSLV v5.12.4",
+    source_url="https://disc.gsfc.nasa.gov/datasets/M2SMNXSLV_5.12.4/summary",
+    grid=MERRA2_GRID,
+    resolution="monthly",
+)
+
+GPM_3IMERGM = Collection(
+    short_name="GPM_3IMERGM",
+    version="07",
+    label="GPM IMERG Monthly v07",
+    source_name="GPM IMERG Final Monthly v07",
+    source_url="https://gpm.nasa.gov/data/imerg",
+    grid=IMERG_GRID,
+    resolution="monthly",
+)
+
+COLLECTIONS: Dict[str, Collection] = {
+    c.short_name: c for c in (M2SDNXSLV, M2T1NXSLV, GPM_3IMERGDF, M2SMNXSLV, GPM_3IMERGM)
+}
+
+# Monthly-mean counterpart of each daily collection, with the same field names
+MONTHLY_COLLECTIONS: Dict[Collection, Collection] = {
+    M2SDNXSLV: M2SMNXSLV,
+    GPM_3IMERGDF: GPM_3IMERGM,
+}
+
+VARIABLES: Dict[str, VariableSpec] = {
+    spec.name: spec for spec in (
+        VariableSpec(
+            name="temperature",
+            collection=M2SDNXSLV,
+            fields=("T2MMEAN",),
+            transform=lambda f: kelvin_to_celsius(f["T2MMEAN"]),
+            units="celsius",
+        ),
+        VariableSpec(
+            name="precipitation",
+            collection=GPM_3IMERGDF,
+            fields=("precipitation",),
+            transform=lambda f: f["precipitation"],
+            units="mm/day",
+        ),
+        VariableSpec(
+            name="wind_speed",
+            collection=M2T1NXSLV,
+            fields=("U2M", "V2M"),
+            transform=lambda f: wind_speed(f["U2M"], f["V2M"]),
+            units="m/s",
+        ),
+        VariableSpec(
+            name="humidity",
+            collection=M2T1NXSLV,
+            fields=("QV2M", "T2M", "PS"),
+            transform=lambda f: relative_humidity(f["QV2M"], f["T2M"], f["PS"]),
+            units="percent",
+        ),
+        VariableSpec(
+            name="dew_point",
+            collection=M2T1NXSLV,
+            fields=("QV2M", "PS"),
+            transform=lambda f: dew_point(f["QV2M"], f["PS"]),
+            units="celsius",
+        ),
+        VariableSpec(
+            name="heat_index",
+            collection=M2T1NXSLV,
+            fields=("T2M",),
+            depends=("humidity",),
+            transform=lambda f: heat_index(kelvin_to_celsius(f["T2M"]), f["humidity"]),
+            units="celsius",
+        ),
+        VariableSpec(
+            name="wind_chill",
+            collection=M2T1NXSLV,
+            fields=("T2M",),
+            depends=("wind_speed",),
+            transform=lambda f: wind_chill(kelvin_to_celsius(f["T2M"]), f["wind_speed"]),
+            units="celsius",
+        ),
+    )
+}
+
+
+def _monthly_variable(spec: VariableSpec) -> VariableSpec:
+    """Monthly-mean product of a variable: same fields and transform on the monthly collection"""
+    monthly = replace(spec, collection=MONTHLY_COLLECTIONS[spec.collection])
+    if spec.name == "precipitation":
+        # IMERG monthly precipitation is a mean rate in mm/hr
+        monthly = replace(monthly, transform=lambda f: f["precipitation"] * 24.0)
+    return monthly
+
+
+# Variables whose monthly product matches their daily one: a linear
+# transform of a monthly-mean field is the monthly mean of the daily value.
+# Wind speed and the humidity indices are nonlinear in their fields (the
+# speed of the mean wind vector is not the mean speed), and their daily
+# product reads only the 12 UTC step, so they have no monthly product.
+MONTHLY_VARIABLES = ("temperature", "precipitation")
+
+# Variables of each temporal resolution
+PRODUCTS: Dict[str, Dict[str, VariableSpec]] = {
+    "monthly": {name: _monthly_variable(VARIABLES[name]) for name in MONTHLY_VARIABLES},
+    "daily": VARIABLES,
+}
+
+
+def get_variable(name: str) -> VariableSpec:
+    """
+    Look up a variable in the registry
+
+    Raises:
+        ValueError: If the variable is unknown
+    """
+    spec = VARIABLES.get(getattr(name, "value", name))
+    if spec is None:
+        raise ValueError(f"Unknown variable: {name}")
+    return spec
+
+
+def select_variable(name: str, resolution: str = "daily") -> VariableSpec:
+    """
+    Pick the coarsest product of a variable that answers a query needing
+    the given temporal resolution
+
+    Args:
+        name: Variable name
+        resolution: Finest resolution the query needs ("daily" or "monthly")
+
+    Returns:
+        VariableSpec on the selected collection
+
+    Raises:
+        ValueError: If the variable or resolution is unknown
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    name = get_variable(name).name
+
+    # Any product at least as fine as needed answers the query
+    for candidate in RESOLUTIONS[RESOLUTIONS.index(resolution):]:
+        spec = PRODUCTS[candidate].get(name)
+        if spec is not None:
+            return spec
+    raise ValueError(f"No {resolution} product for variable: {name}")
+
+
+def resolve_variables(names: Iterable[str], resolution: str = "daily") -> List[VariableSpec]:
+    """
+    Resolve requested variables and everything they depend on into
+    evaluation order (dependencies first, each variable once).
+    Products are picked with select_variable; dependencies come from the
+    same product table as the variable that needs them.
+
+    Raises:
+        ValueError: If a variable is unknown, depends on a variable of another
+            collection, or the dependencies form a cycle
+    """
+    ordered: List[VariableSpec] = []
+    visiting = set()
+
+    def visit(spec: VariableSpec) -> None:
+        if spec in ordered:
+            return
+        if spec.name in visiting:
+            raise ValueError(f"Dependency cycle through variable: {spec.name}")
+        visiting.add(spec.name)
+        for name in spec.depends:
+            dependency = PRODUCTS[spec.collection.resolution].get(name)
+            if dependency is None or dependency.collection != spec.collection:
+                raise ValueError(f"{spec.name} depends on {name} from another collection")
+            visit(dependency)
+        visiting.discard(spec.name)
+        ordered.append(spec)
+
+    for name in names:
+        visit(select_variable(name, resolution))
+    return ordered
+
+
+def required_fields(specs: Iterable[VariableSpec]) -> List[str]:
+    """Union of the raw fields read by a set of variables, in first-use order"""
+    fields: List[str] = []
+    for spec in specs:
+        fields.extend(f for f in spec.fields if f not in fields)
+    return fields
+
+
+def evaluate_variables(specs: Iterable[VariableSpec], fields: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Evaluate resolved variables over raw field arrays in one vectorized pass each
+
+    Args:
+        specs: Variables in evaluation order, as returned by resolve_variables
+        fields: Raw field name -> array (over years or days)
+
+    Returns:
+        Variable name -> array of values
+    """
+    values: Dict[str, np.ndarray] = {}
+    for spec in specs:
+        inputs = {name: fields[name] for name in spec.fields}
+        inputs.update({name: values[name] for name in spec.depends})
+        values[spec.name] = np.asarray(spec.transform(inputs), dtype=float)
+    return values
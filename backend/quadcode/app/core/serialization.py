@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Response serialization: fast JSON, negotiated compact formats and compression
+"""
+
+import gzip
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from pydantic import BaseModel
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+
+# Media types accepted for each format
+_MEDIA_TYPES = {
+    JSON: JSON,
+    "application/*": JSON,
+    "*/*": JSON,
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    ARROW: ARROW,
+}
+
+# Bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+
+# Columns of the tabular (Arrow) view of a response
+Columns = Dict[str, List]
+
+# Splits a JSON payload into its tabular columns and the remaining payload
+Tabulator = Callable[[Dict], Tuple[Columns, Dict]]
+
+
+def dumps_json(payload) -> bytes:
+    """Encode JSON-compatible data, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def _parse_header(value: str) -> List[Tuple[str, float]]:
+    """Parse an Accept-style header into (token, q) pairs ordered by preference"""
+    items = []
+    for position, part in enumerate(value.split(",")):
+        token, *params = [p.strip() for p in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        items.append((token.lower(), q, position))
+    items.sort(key=lambda item: (-item[1], item[2]))
+    return [(token, q) for token, q, _ in items if q > 0]
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Pick the response format from an Accept header
+
+    Returns:
+        One of JSON, MSGPACK, ARROW; JSON when nothing better is accepted
+
+    Raises:
+        HTTPException: 406 if only unsupported formats are accepted
+    """
+    if not accept:
+        return JSON
+
+    for token, _ in _parse_header(accept):
+        media_type = _MEDIA_TYPES.get(token)
+        if media_type == MSGPACK and msgpack is None:
+            continue
+        if media_type == ARROW and pa is None:
+            continue
+        if media_type is not None:
+            return media_type
+
+    raise HTTPException(status_code=406, detail=f"Supported formats: {JSON}, {MSGPACK}, {ARROW}")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick brotli or gzip from an Accept-Encoding header, or None for identity"""
+    if not accept_encoding:
+        return None
+    for token, _ in _parse_header(accept_encoding):
+        if token == "br" and brotli is not None:
+            return "br"
+        if token in ("gzip", "*"):
+            return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Compress a body with the negotiated content encoding"""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=5)
+    return body
+
+
+def encode(payload, media_type: str, tabulate: Optional[Tabulator] = None) -> bytes:
+    """
+    Encode JSON-compatible data in a negotiated format
+
+    Args:
+        payload: JSON-compatible data (dicts, lists, numbers, strings)
+        media_type: JSON, MSGPACK or ARROW
+        tabulate: Splits the payload for Arrow into a record batch and the
+            remaining fields, which travel as JSON in the schema metadata
+
+    Raises:
+        HTTPException: 406 if Arrow is requested for a response without a tabular view
+    """
+    if media_type == MSGPACK:
+        return msgpack.packb(payload, use_bin_type=True)
+
+    if media_type == ARROW:
+        if tabulate is None:
+            raise HTTPException(status_code=406, detail=f"{ARROW} is not available for this endpoint")
+        columns, rest = tabulate(payload)
+        table = pa.table(columns).replace_schema_metadata({"payload": dumps_json(rest)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    return dumps_json(payload)
+
+
+def render(
+    request: Request,
+    model: BaseModel,
+    tabulate: Optional[Tabulator] = None,
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serialize a response model once, in the format and encoding the client accepts.
+
+    Returning the Response directly skips FastAPI's second validation and
+    encoding pass through response_model; the model itself was validated
+    when it was built.
+
+    Args:
+        request: Incoming request (Accept and Accept-Encoding headers)
+        model: Response model to serialize
+        tabulate: Tabular view of the response for Arrow IPC
+        status_code: HTTP status code
+        headers: Extra response headers, e.g. caching headers
+
+    Returns:
+        Response with the encoded (and possibly compressed) body
+    """
+    media_type = negotiate_format(request.headers.get("accept"))
+    body = encode(model.model_dump(mode="json"), media_type, tabulate)
+
+    headers = {"Vary": "Accept, Accept-Encoding", **(headers or {})}
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding is not None and len(body) >= COMPRESSION_MIN_BYTES:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+def weather_columns(payload: Dict) -> Tuple[Columns, Dict]:
+    """Tabular view of a WeatherQueryResponse: one row per variable and year"""
+    columns: Columns = {"variable": [], "year": [], "value": []}
+    rest = dict(payload, historical_data={})
+    for variable, data in payload["historical_data"].items():
+        columns["variable"].extend([variable] * len(data["values"]))
+        columns["year"].extend(data["years"])
+        columns["value"].extend(data["values"])
+        rest["historical_data"][variable] = {
+            key: value for key, value in data.items() if key not in ("values", "years")
+        }
+    return columns, rest
+
+
+def calendar_columns(payload: Dict) -> Tuple[Columns, Dict]:
+    """Tabular view of a CalendarResponse: one row per variable and calendar day"""
+    columns: Columns = {"variable": [], "month": [], "day": []}
+    rest = dict(payload, calendar={})
+    for variable, data in payload["calendar"].items():
+        for entry in data["days"]:
+            columns["variable"].append(variable)
+            columns["month"].append(entry["month"])
+            columns["day"].append(entry["day"])
+            for name, value in entry["statistics"].items():
+                if name != "trend":
+                    columns.setdefault(name, []).append(value)
+        rest["calendar"][variable] = {key: value for key, value in data.items() if key != "days"}
+
+    # Probabilities become one column per threshold label, null where absent
+    labels = sorted({
+        label
+        for data in payload["calendar"].values()
+        for entry in data["days"]
+        for label in entry["probabilities"]
+    })
+    for label in labels:
+        columns[f"p_{label}"] = [
+            entry["probabilities"].get(label)
+            for data in payload["calendar"].values() for entry in data["days"]
+        ]
+    return columns, rest
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Columnar per-year result series passed from extraction to the API edge
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass
+class YearSeries:
+    """
+    One variable's values at one location over a contiguous range of years.
+
+    Values stay in a float64 array aligned with an int32 year index, with
+    NaN marking missing years, from extraction through statistics; they
+    only become Python lists when a response model is built.
+    """
+    years: np.ndarray
+    values: np.ndarray
+    actual_lat: Optional[float] = None
+    actual_lon: Optional[float] = None
+    collection: Optional[str] = None
+
+    def __post_init__(self):
+        self.years = np.asarray(self.years, dtype=np.int32)
+        self.values = np.asarray(self.values, dtype=np.float64)
+        if self.years.shape != self.values.shape:
+            raise ValueError(f"years {self.years.shape} and values {self.values.shape} differ in shape")
+
+    @classmethod
+    def empty(cls, start_year: int, end_year: int, collection: Optional[str] = None) -> "YearSeries":
+        """Series with every year of a range missing"""
+        years = np.arange(start_year, end_year + 1, dtype=np.int32)
+        return cls(years=years, values=np.full(len(years), np.nan), collection=collection)
+
+    @classmethod
+    def from_years(
+        cls,
+        start_year: int,
+        end_year: int,
+        years: Sequence[int],
+        values: Sequence[float],
+        **kwargs
+    ) -> "YearSeries":
+        """Series over a range of years from values known for some of them"""
+        series = cls.empty(start_year, end_year)
+        series.values[np.asarray(years, dtype=np.int32) - start_year] = values
+        return cls(years=series.years, values=series.values, **kwargs)
+
+    @property
+    def missing(self) -> np.ndarray:
+        """Mask of years without a value"""
+        return np.isnan(self.values)
+
+    def valid_values(self) -> np.ndarray:
+        """Values of the years that have one"""
+        return self.values[~self.missing]
+
+    def valid_years(self) -> np.ndarray:
+        """Years that have a value"""
+        return self.years[~self.missing]
+
+    def missing_years(self) -> List[int]:
+        """Years without a value"""
+        return self.years[self.missing].tolist()
@@ -4,24 +4,26 @@ Utility functions for weather data processing
 """
 
 import numpy as np
-from typing import List, Dict, Tuple, Optional
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional, Union
 import logging
+import warnings
 
 logger = logging.getLogger(__name__)
 
 
-def compute_statistics(values: List[float]) -> Dict[str, Optional[float]]:
+def compute_statistics(values: Union[List[float], np.ndarray]) -> Dict[str, Optional[float]]:
     """
-    Compute statistical measures from a list of values.
+    Compute statistical measures from a list or array of values.
     Handles missing values (NaN) gracefully by filtering them out.
 
     Args:
-        values: List of numerical values (may contain NaN)
+        values: Numerical values (may contain NaN)
 
     Returns:
         Dictionary containing mean, median, std, min, max, percentiles, count
     """
-    if not values:
+    if len(values) == 0:
         logger.warning("Empty values list provided to compute_statistics")
         return {
             "mean": None,
@@ -36,8 +38,8 @@ def compute_statistics(values: List[float]) -> Dict[str, Optional[float]]:
             "count": 0,
         }
 
-    # Convert to numpy array and filter out NaN values
-    arr = np.array(values, dtype=float)
+    # Convert to numpy array (no copy for float64 arrays) and filter out NaN values
+    arr = np.asarray(values, dtype=float)
     valid_arr = arr[~np.isnan(arr)]
 
     if len(valid_arr) == 0:
@@ -55,7 +57,7 @@ def compute_statistics(values: List[float]) -> Dict[str, Optional[float]]:
             "count": 0,
         }
 
-    logger.info(f"Computing statistics for {len(valid_arr)} valid values")
+    logger.debug("Computing statistics for %d valid values", len(valid_arr))
 
     return {
         "mean": float(np.mean(valid_arr)),
@@ -72,7 +74,7 @@ def compute_statistics(values: List[float]) -> Dict[str, Optional[float]]:
 
 
 def compute_probabilities(
-    values: List[float],
+    values: Union[List[float], np.ndarray],
     thresholds: Dict[str, float]
 ) -> Dict[str, float]:
     """
@@ -80,18 +82,18 @@ def compute_probabilities(
     Handles missing values (NaN) gracefully by filtering them out.
 
     Args:
-        values: List of numerical values (may contain NaN)
+        values: Numerical values (may contain NaN)
         thresholds: Dictionary with threshold names and values
 
     Returns:
         Dictionary of probabilities (0.0 to 1.0)
     """
-    if not values or not thresholds:
+    if len(values) == 0 or not thresholds:
         logger.warning("Empty values or thresholds provided")
         return {}
 
     # Convert to numpy array and filter out NaN values
-    arr = np.array(values, dtype=float)
+    arr = np.asarray(values, dtype=float)
     valid_arr = arr[~np.isnan(arr)]
 
     if len(valid_arr) == 0:
@@ -101,34 +103,227 @@ def compute_probabilities(
     probabilities = {}
 
     for name, threshold in thresholds.items():
-        if name in ["hot", "wet", "windy", "humid"]:
+        label, above = threshold_label(name, threshold)
+        if above:
             prob = float(np.sum(valid_arr > threshold) / len(valid_arr))
-            probabilities[f"above_{threshold}"] = prob
-        elif name in ["cold", "dry"]:
+        else:
             prob = float(np.sum(valid_arr < threshold) / len(valid_arr))
-            probabilities[f"below_{threshold}"] = prob
+        probabilities[label] = prob
+
+    return probabilities
+
+
+def threshold_label(name: str, threshold: float) -> Tuple[str, bool]:
+    """
+    Map a named threshold to its probability label and direction.
+    "cold" and "dry" thresholds count values below the threshold;
+    every other name counts values above it.
+
+    Args:
+        name: Threshold name (e.g. "hot", "cold")
+        threshold: Threshold value
+
+    Returns:
+        Tuple of (label such as "above_35", True if counting values above)
+    """
+    if name in ["cold", "dry"]:
+        return f"below_{threshold}", False
+    return f"above_{threshold}", True
+
+
+def compute_probabilities_sorted(
+    sorted_values: np.ndarray,
+    thresholds: Dict[str, float]
+) -> Dict[str, float]:
+    """
+    Compute threshold probabilities from a sorted sample using binary search.
+    Gives the same result as compute_probabilities in O(log n) per threshold.
+
+    Args:
+        sorted_values: Valid (non-NaN) values in ascending order
+        thresholds: Dictionary with threshold names and values
+
+    Returns:
+        Dictionary of probabilities (0.0 to 1.0)
+    """
+    n = len(sorted_values)
+    if n == 0 or not thresholds:
+        return {}
+
+    probabilities = {}
+    for name, threshold in thresholds.items():
+        label, above = threshold_label(name, threshold)
+        if above:
+            hits = n - np.searchsorted(sorted_values, threshold, side="right")
         else:
-            prob = float(np.sum(valid_arr > threshold) / len(valid_arr))
-            probabilities[f"above_{threshold}"] = prob
+            hits = np.searchsorted(sorted_values, threshold, side="left")
+        probabilities[label] = float(hits / n)
 
     return probabilities
 
 
+def nan_percentiles(matrix: np.ndarray, percentiles: List[float]) -> np.ndarray:
+    """
+    Column-wise percentiles ignoring NaN, equal to np.nanpercentile(matrix, q, axis=0).
+
+    np.nanpercentile falls back to a per-column Python loop when NaNs are
+    present; one sort along the rows (NaN sort last) followed by linear
+    interpolation between ranks stays vectorized for any number of columns.
+
+    Args:
+        matrix: 2D array with one row per sample
+        percentiles: Percentiles in [0, 100]
+
+    Returns:
+        Array of shape (len(percentiles), columns); NaN for columns without valid values
+    """
+    ordered = np.sort(matrix, axis=0)
+    count = np.sum(~np.isnan(matrix), axis=0)
+    last = np.maximum(count - 1, 0)
+
+    result = np.empty((len(percentiles), matrix.shape[1]))
+    for i, q in enumerate(percentiles):
+        rank = q / 100 * last
+        below = np.floor(rank).astype(int)
+        above = np.minimum(below + 1, last)
+        low = np.take_along_axis(ordered, below[None, :], axis=0)[0]
+        high = np.take_along_axis(ordered, above[None, :], axis=0)[0]
+        result[i] = low + (high - low) * (rank - below)
+    result[:, count == 0] = np.nan
+    return result
+
+
+def compute_statistics_matrix(matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Compute statistics column-wise over a (year x day) matrix in one vectorized pass.
+    NaN entries are treated as missing.
+
+    Args:
+        matrix: 2D array with one row per year and one column per day
+
+    Returns:
+        Dictionary of 1D arrays (one entry per column) with the same keys as
+        compute_statistics; columns without valid values are NaN with count 0
+    """
+    matrix = np.asarray(matrix, dtype=float)
+
+    with warnings.catch_warnings():
+        # All-NaN columns (e.g. February 29 without leap years) yield NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        p10, p25, p50, p75, p90 = nan_percentiles(matrix, [10, 25, 50, 75, 90])
+        stats = {
+            "mean": np.nanmean(matrix, axis=0),
+            "median": p50,
+            "std": np.nanstd(matrix, axis=0),
+            "min": np.nanmin(matrix, axis=0),
+            "max": np.nanmax(matrix, axis=0),
+            "percentile_10": p10,
+            "percentile_25": p25,
+            "percentile_75": p75,
+            "percentile_90": p90,
+        }
+
+    stats["count"] = np.sum(~np.isnan(matrix), axis=0)
+    return stats
+
+
+def compute_probabilities_matrix(
+    matrix: np.ndarray,
+    thresholds: Dict[str, float]
+) -> Dict[str, np.ndarray]:
+    """
+    Compute threshold probabilities column-wise over a (year x day) matrix.
+    NaN entries are treated as missing.
+
+    Args:
+        matrix: 2D array with one row per year and one column per day
+        thresholds: Dictionary with threshold names and values
+
+    Returns:
+        Dictionary of probability arrays keyed like compute_probabilities;
+        columns without valid values are NaN
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    valid = ~np.isnan(matrix)
+    count = valid.sum(axis=0)
+
+    probabilities = {}
+    for name, threshold in thresholds.items():
+        label, above = threshold_label(name, threshold)
+        hits = (matrix > threshold) if above else (matrix < threshold)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            probabilities[label] = np.where(count > 0, (hits & valid).sum(axis=0) / count, np.nan)
+
+    return probabilities
+
+
+def compute_trend_matrix(matrix: np.ndarray, years: Union[List[int], np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Compute trend analysis column-wise over a (year x cell) matrix in one vectorized pass.
+    Matches compute_trend_analysis for every column; NaN entries are treated as missing.
+
+    Args:
+        matrix: 2D array with one row per year
+        years: Year of each row
+
+    Returns:
+        Dictionary of 1D arrays with slope, intercept, r_squared and
+        percent_change; NaN where a column has fewer than 2 valid values
+        (percent_change also where its first value is 0)
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    valid = ~np.isnan(matrix)
+    count = valid.sum(axis=0)
+    x = np.asarray(years, dtype=float)[:, None] * valid
+    y = np.where(valid, matrix, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = x.sum(axis=0) / count
+        y_mean = y.sum(axis=0) / count
+        dx = np.where(valid, x - x_mean, 0.0)
+        dy = np.where(valid, y - y_mean, 0.0)
+        sxx = np.sum(dx * dx, axis=0)
+        sxy = np.sum(dx * dy, axis=0)
+        syy = np.sum(dy * dy, axis=0)
+
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        ss_res = np.sum((dy - slope * dx) ** 2 * valid, axis=0)
+        r_squared = np.where(syy != 0, 1 - ss_res / syy, 0.0)
+
+        rows = np.arange(matrix.shape[0])[:, None]
+        first = np.take_along_axis(matrix, np.argmax(valid, axis=0)[None, :], axis=0)[0]
+        last = np.take_along_axis(matrix, np.max(np.where(valid, rows, 0), axis=0)[None, :], axis=0)[0]
+        percent_change = np.where(first != 0, (last - first) / first * 100, np.nan)
+
+    insufficient = count < 2
+    for arr in (slope, intercept, r_squared, percent_change):
+        arr[insufficient] = np.nan
+    return {"slope": slope, "intercept": intercept, "r_squared": r_squared, "percent_change": percent_change}
+
+
+def trend_direction(slope: float, r_squared: float) -> str:
+    """Classify a trend as "increasing", "decreasing" or "stable" (small or poorly fitting slopes)"""
+    if abs(slope) < 0.01 or r_squared < 0.1:
+        return "stable"
+    return "increasing" if slope > 0 else "decreasing"
+
+
 def compute_trend_analysis(
-    values: List[float],
-    years: List[int]
+    values: Union[List[float], np.ndarray],
+    years: Union[List[int], np.ndarray]
 ) -> Dict[str, Optional[float]]:
     """
     Compute trend analysis using linear regression.
 
     Args:
-        values: List of numerical values
-        years: List of corresponding years
+        values: Numerical values
+        years: Corresponding years
 
     Returns:
         Dictionary containing slope, intercept, r_squared, trend_direction, percent_change
     """
-    if not values or not years or len(values) < 2:
+    if len(values) < 2 or len(years) < 2:
         logger.warning("Insufficient data for trend analysis")
         return {
             "slope": None,
@@ -139,8 +334,8 @@ def compute_trend_analysis(
         }
 
     # Convert to numpy arrays and filter out NaN
-    arr_values = np.array(values, dtype=float)
-    arr_years = np.array(years, dtype=float)
+    arr_values = np.asarray(values, dtype=float)
+    arr_years = np.asarray(years, dtype=float)
 
     # Filter out NaN values
     valid_mask = ~np.isnan(arr_values)
@@ -167,29 +362,120 @@ def compute_trend_analysis(
     r_squared = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0.0
 
     # Determine trend direction
-    if abs(slope) < 0.01 or r_squared < 0.1:
-        trend_direction = "stable"
-    elif slope > 0:
-        trend_direction = "increasing"
-    else:
-        trend_direction = "decreasing"
+    direction = trend_direction(slope, r_squared)
 
     # Calculate percent change from first to last year
     first_value = valid_values[0]
     last_value = valid_values[-1]
     percent_change = ((last_value - first_value) / first_value * 100) if first_value != 0 else None
 
-    logger.info(f"Trend analysis: slope={slope:.4f}, r²={r_squared:.4f}, direction={trend_direction}")
+    logger.debug("Trend analysis: slope=%.4f, r²=%.4f, direction=%s", slope, r_squared, direction)
 
     return {
         "slope": float(slope),
         "intercept": float(intercept),
         "r_squared": float(r_squared),
-        "trend_direction": trend_direction,
+        "trend_direction": direction,
         "percent_change": float(percent_change) if percent_change is not None else None
     }
 
 
+@lru_cache(maxsize=64)
+def bootstrap_index(n: int, resamples: int, seed: Optional[int]) -> np.ndarray:
+    """
+    Read-only (resamples x n) matrix of bootstrap sample indices.
+
+    Seeded matrices are shared by every series of the same length, so
+    repeated requests get identical intervals without drawing again.
+    """
+    index = np.random.default_rng(seed).integers(0, n, size=(resamples, n))
+    index.flags.writeable = False
+    return index
+
+
+def compute_bootstrap_intervals(
+    values: Union[List[float], np.ndarray],
+    years: Union[List[int], np.ndarray],
+    thresholds: Optional[Dict[str, float]] = None,
+    resamples: int = 2000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None
+) -> Dict:
+    """
+    Percentile bootstrap confidence intervals for threshold probabilities and
+    the trend slope, with a bootstrap p-value for the slope.
+
+    All resamples are drawn as one (resamples x n) index matrix of (year,
+    value) pairs and reduced in a single vectorized pass: the threshold hit
+    indicators and the least-squares slope of every resample are computed
+    at once, without a Python loop over resamples.
+
+    Args:
+        values: Numerical values (may contain NaN)
+        years: Corresponding years
+        thresholds: Dictionary with threshold names and values
+        resamples: Number of bootstrap resamples
+        confidence: Confidence level of the intervals
+        seed: Random seed, for reproducible intervals
+
+    Returns:
+        Dictionary containing probabilities (keyed like compute_probabilities,
+        each with low and high bounds), slope_low, slope_high and p_value;
+        the slope entries are None with fewer than 3 valid values
+    """
+    arr_values = np.asarray(values, dtype=float)
+    arr_years = np.asarray(years, dtype=float)
+    valid_mask = ~np.isnan(arr_values)
+    y = arr_values[valid_mask]
+    x = arr_years[valid_mask]
+
+    n = len(y)
+    intervals = {"probabilities": {}, "slope_low": None, "slope_high": None, "p_value": None}
+    if n == 0:
+        return intervals
+
+    index = bootstrap_index(n, resamples, seed) if seed is not None else \
+        np.random.default_rng().integers(0, n, size=(resamples, n))
+    alpha = (1 - confidence) / 2
+
+    if thresholds:
+        labels = []
+        hits = np.empty((len(thresholds), n))
+        for row, (name, threshold) in enumerate(thresholds.items()):
+            label, above = threshold_label(name, threshold)
+            labels.append(label)
+            hits[row] = (y > threshold) if above else (y < threshold)
+
+        # (thresholds x resamples) probabilities; np.take gathers much faster than fancy indexing here
+        resampled = np.take(hits, index, axis=1).mean(axis=-1)
+        low, high = np.quantile(resampled, [alpha, 1 - alpha], axis=1)
+        intervals["probabilities"] = {
+            label: {"low": float(low[row]), "high": float(high[row])}
+            for row, label in enumerate(labels)
+        }
+
+    if n >= 3 and np.ptp(x) > 0:
+        # Slope of every resample; resamples drawing a single year have none
+        xb = np.take(x - x.mean(), index)
+        xb -= xb.mean(axis=1, keepdims=True)
+        yb = np.take(y, index)
+        sxx = np.einsum("ij,ij->i", xb, xb)
+        sxy = np.einsum("ij,ij->i", xb, yb)
+        slopes = sxy[sxx > 0] / sxx[sxx > 0]
+
+        slope_low, slope_high = np.quantile(slopes, [alpha, 1 - alpha])
+
+        # Two-sided p-value of a zero slope: twice the share of resamples on the far side of zero
+        tail = min(np.count_nonzero(slopes <= 0), np.count_nonzero(slopes >= 0))
+        intervals.update(
+            slope_low=float(slope_low),
+            slope_high=float(slope_high),
+            p_value=float(min(1.0, 2 * (tail + 1) / (len(slopes) + 1)))
+        )
+
+    return intervals
+
+
 def compute_grid_offset(
     requested_lat: float,
     requested_lon: float,
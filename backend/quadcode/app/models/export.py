@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Pydantic models for streamed exports
+"""
+
+from pydantic import BaseModel, Field
+from typing import List
+
+from quadcode.app.models.weather import Location, DayOfYear, HistoricalYears, WeatherVariable
+
+
+class SeriesExportRequest(BaseModel):
+    """Request body for exporting the daily series of one location"""
+    location: Location
+    historical_years: HistoricalYears
+    variables: List[WeatherVariable] = Field(
+        ...,
+        description="List of variables to export, one column each",
+        example=["temperature", "precipitation"]
+    )
+
+
+class BatchExportRequest(BaseModel):
+    """Request body for exporting one day of the year at many locations"""
+    locations: List[Location] = Field(..., description="Locations to export, in output order", min_length=1)
+    day_of_year: DayOfYear
+    historical_years: HistoricalYears
+    variables: List[WeatherVariable] = Field(
+        ...,
+        description="List of variables to export",
+        example=["temperature", "precipitation"]
+    )
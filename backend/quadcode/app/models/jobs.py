@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Pydantic models for background query jobs
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional
+from enum import Enum
+
+from quadcode.app.models.weather import WeatherQueryResponse
+
+
+class JobStatus(str, Enum):
+    """Lifecycle states of a background job"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobProgress(BaseModel):
+    """Progress of a background job in (variable, year) units"""
+    completed: int = Field(..., description="Number of variable-years fetched")
+    total: int = Field(..., description="Total number of variable-years to fetch")
+    percent: float = Field(..., description="Completion percentage (0-100)")
+
+
+class JobResponse(BaseModel):
+    """Status of a background query job"""
+    job_id: str
+    status: JobStatus
+    progress: JobProgress
+    created_at: str
+    updated_at: str
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    result: Optional[WeatherQueryResponse] = Field(
+        None,
+        description="Query result, available once the job has completed"
+    )
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Pydantic models for continuous daily time series
+"""
+
+from datetime import date
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from quadcode.app.models.weather import Location, DayOfYear, WeatherVariable
+
+
+class TimeSeriesRequest(BaseModel):
+    """Daily series of one location over a date range, optionally kept to a calendar window each year"""
+    location: Location
+    start_date: date = Field(..., description="First day of the range")
+    end_date: date = Field(..., description="Last day of the range")
+    window_start: Optional[DayOfYear] = Field(
+        None, description="First calendar day kept in each year, e.g. March 1 for a March-May season"
+    )
+    window_end: Optional[DayOfYear] = Field(
+        None, description="Last calendar day kept in each year; may wrap the new year"
+    )
+    variables: List[WeatherVariable] = Field(
+        ...,
+        description="List of variables, one value and one missing flag column each",
+        example=["temperature", "precipitation"],
+        min_length=1
+    )
+
+    @field_validator('start_date')
+    @classmethod
+    def validate_start_date(cls, v):
+        """Validate the range starts within the data record"""
+        if v.year < 1980:
+            raise ValueError("start_date must be in 1980 or later")
+        return v
+
+    @field_validator('end_date')
+    @classmethod
+    def validate_end_date(cls, v, info):
+        """Validate end date is not in the future and >= start_date"""
+        if v > date.today():
+            raise ValueError("end_date cannot be in the future")
+
+        start_date = info.data.get('start_date')
+        if start_date and v < start_date:
+            raise ValueError("end_date must be >= start_date")
+        return v
+
+    @model_validator(mode='after')
+    def validate_window(self):
+        """Validate the window is given whole or not at all"""
+        if (self.window_start is None) != (self.window_end is None):
+            raise ValueError("window_start and window_end must be given together")
+        return self
@@ -23,6 +23,15 @@ class WeatherVariable(str, Enum):
     PRECIPITATION = "precipitation"
     WIND_SPEED = "wind_speed"
     HUMIDITY = "humidity"
+    DEW_POINT = "dew_point"
+    HEAT_INDEX = "heat_index"
+    WIND_CHILL = "wind_chill"
+
+
+class ExtremeMethod(str, Enum):
+    """Extreme-value models fitted to per-year series"""
+    GEV = "gev"
+    POT = "pot"
 
 
 class DayOfYear(BaseModel):
@@ -79,6 +88,63 @@ class WeatherQueryRequest(BaseModel):
             "precipitation": {"wet": 50}
         }
     )
+    include_distribution: bool = Field(
+        False,
+        description="Include the sorted empirical distribution of each variable in the response"
+    )
+    confidence_intervals: bool = Field(
+        False,
+        description="Include bootstrap confidence intervals for probabilities and the trend slope"
+    )
+    extremes: Optional[ExtremeMethod] = Field(
+        None,
+        description="Fit an extreme-value model (gev or pot) to each variable and include its return levels"
+    )
+
+
+class SeasonalQueryRequest(BaseModel):
+    """Request body for seasonal query endpoint"""
+    location: Location
+    months: List[int] = Field(
+        ...,
+        description="Months of the season in order; may wrap the new year",
+        example=[12, 1, 2],
+        min_length=1,
+        max_length=12
+    )
+    historical_years: HistoricalYears
+    variables: List[WeatherVariable] = Field(
+        ...,
+        description="List of variables to query; seasonal means exist for temperature and precipitation",
+        example=["temperature", "precipitation"]
+    )
+    thresholds: Optional[Dict[str, Dict[str, float]]] = Field(
+        None,
+        description="Thresholds for probability calculations",
+        example={"precipitation": {"wet": 5}}
+    )
+    include_distribution: bool = Field(
+        False,
+        description="Include the sorted empirical distribution of each variable in the response"
+    )
+    confidence_intervals: bool = Field(
+        False,
+        description="Include bootstrap confidence intervals for probabilities and the trend slope"
+    )
+    extremes: Optional[ExtremeMethod] = Field(
+        None,
+        description="Fit an extreme-value model (gev or pot) to each variable and include its return levels"
+    )
+
+    @field_validator('months')
+    @classmethod
+    def validate_months(cls, v):
+        """Validate months are valid and distinct"""
+        if any(month < 1 or month > 12 for month in v):
+            raise ValueError("months must be between 1 and 12")
+        if len(set(v)) != len(v):
+            raise ValueError("months must be distinct")
+        return v
 
 
 class GridPoint(BaseModel):
@@ -88,6 +154,12 @@ class GridPoint(BaseModel):
     dataset: str
 
 
+class ConfidenceInterval(BaseModel):
+    """Bootstrap confidence interval"""
+    low: float
+    high: float
+
+
 class TrendAnalysis(BaseModel):
     """Trend analysis data"""
     slope: Optional[float] = Field(None, description="Linear regression slope (change per year)")
@@ -95,6 +167,14 @@ class TrendAnalysis(BaseModel):
     r_squared: Optional[float] = Field(None, description="R-squared value (0-1)")
     trend_direction: Optional[str] = Field(None, description="'increasing', 'decreasing', or 'stable'")
     percent_change: Optional[float] = Field(None, description="Percent change from first to last year")
+    slope_interval: Optional[ConfidenceInterval] = Field(
+        None,
+        description="Bootstrap confidence interval of the slope, present when confidence_intervals was requested"
+    )
+    p_value: Optional[float] = Field(
+        None,
+        description="Bootstrap two-sided p-value of a zero slope, present when confidence_intervals was requested"
+    )
 
 
 class Statistics(BaseModel):
@@ -112,12 +192,47 @@ class Statistics(BaseModel):
     trend: Optional[TrendAnalysis] = Field(None, description="Trend analysis over time")
 
 
+class ExtremeValueAnalysis(BaseModel):
+    """Extreme-value model fitted to the per-year values of a variable"""
+    method: ExtremeMethod
+    location: Optional[float] = Field(None, description="GEV location parameter")
+    threshold: Optional[float] = Field(None, description="Peaks-over-threshold threshold")
+    rate: Optional[float] = Field(None, description="Yearly rate of values above the threshold")
+    scale: Optional[float] = Field(None, description="Scale parameter")
+    shape: Optional[float] = Field(None, description="Shape parameter; positive for a heavy upper tail")
+    sample_size: int = Field(..., description="Number of values fitted")
+    return_levels: Dict[str, Optional[float]] = Field(
+        ..., description="Value exceeded once per return period on average, keyed by the period in years"
+    )
+    probabilities: Dict[str, Optional[float]] = Field(
+        ..., description="Threshold probabilities under the model, keyed like probabilities"
+    )
+
+
+class EmpiricalDistribution(BaseModel):
+    """Compact empirical distribution (sorted sample) of a variable"""
+    sorted_values: List[float] = Field(..., description="Valid values in ascending order")
+    count: int = Field(..., description="Number of values in the sample")
+
+
 class VariableData(BaseModel):
     """Data for a single weather variable"""
     values: List[float]
     years: List[int]
     statistics: Statistics
     probabilities: Dict[str, float]
+    probability_intervals: Optional[Dict[str, ConfidenceInterval]] = Field(
+        None,
+        description="Bootstrap confidence intervals of the probabilities, present when confidence_intervals was requested"
+    )
+    distribution: Optional[EmpiricalDistribution] = Field(
+        None,
+        description="Empirical distribution, present when include_distribution was requested"
+    )
+    extremes: Optional[ExtremeValueAnalysis] = Field(
+        None,
+        description="Extreme-value model, present when extremes was requested; fit parameters are null for too few values"
+    )
 
 
 class QueryInfo(BaseModel):
@@ -131,6 +246,14 @@ class QueryInfo(BaseModel):
         None,
         description="Years with missing data per variable"
     )
+    distribution_key: Optional[str] = Field(
+        None,
+        description="Key for evaluating new thresholds via the /probabilities endpoint"
+    )
+    precomputed: bool = Field(
+        False,
+        description="Answered from precomputed climatology tiles instead of the data"
+    )
 
 
 class DataSource(BaseModel):
@@ -150,3 +273,60 @@ class WeatherQueryResponse(BaseModel):
     query_info: QueryInfo
     historical_data: Dict[str, VariableData]
     metadata: Metadata
+
+
+class ProbabilityRequest(BaseModel):
+    """Request body for evaluating thresholds against cached distributions"""
+    distribution_key: str = Field(..., description="distribution_key from a previous query response")
+    thresholds: Dict[str, Dict[str, float]] = Field(
+        ...,
+        description="Thresholds for probability calculations",
+        example={"temperature": {"hot": 30, "cold": 10}}
+    )
+
+
+class ProbabilityResponse(BaseModel):
+    """Response body for threshold evaluation"""
+    distribution_key: str
+    probabilities: Dict[str, Dict[str, float]]
+
+
+class CalendarRequest(BaseModel):
+    """Request body for the full-year calendar endpoint"""
+    location: Location
+    historical_years: HistoricalYears
+    variables: List[WeatherVariable] = Field(
+        ...,
+        description="List of variables to query",
+        example=["temperature", "precipitation"]
+    )
+    thresholds: Optional[Dict[str, Dict[str, float]]] = Field(
+        None,
+        description="Thresholds for probability calculations",
+        example={"temperature": {"hot": 35, "cold": 5}}
+    )
+
+
+class CalendarDay(BaseModel):
+    """Statistics and probabilities for one calendar day"""
+    month: int
+    day: int
+    statistics: Statistics
+    probabilities: Dict[str, float]
+
+
+class CalendarVariableData(BaseModel):
+    """Full-year calendar for a single weather variable"""
+    days: List[CalendarDay] = Field(..., description="One entry per calendar day, January 1 to December 31")
+    years: List[int] = Field(..., description="Years with data")
+    missing_years: List[int] = Field(default_factory=list, description="Years without data")
+
+
+class CalendarResponse(BaseModel):
+    """Response body for the full-year calendar endpoint"""
+    requested_location: Location
+    actual_grid_points: Dict[str, GridPoint]
+    years_analyzed: int
+    data_period: str
+    calendar: Dict[str, CalendarVariableData]
+    units: Dict[str, str]
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Full-year calendar: per-day statistics and probabilities at one location
+"""
+
+import asyncio
+import calendar
+import os
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import logging
+
+from quadcode.app.models.weather import (
+    CalendarRequest,
+    CalendarResponse,
+    CalendarDay,
+    CalendarVariableData,
+    Statistics,
+    GridPoint
+)
+from quadcode.app.services.earthdata_service import EarthdataService
+from quadcode.app.services.fetch_policy import CircuitOpenError
+from quadcode.app.services.point_store import PointStore
+from quadcode.app.core.grid import DAYS_PER_YEAR, day_of_year_index, day_from_index
+from quadcode.app.core.registry import get_variable
+from quadcode.app.core.utils import compute_statistics_matrix, compute_probabilities_matrix
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of whole-year reads running at the same time
+CALENDAR_MAX_CONCURRENT_YEARS = int(os.getenv("CALENDAR_MAX_CONCURRENT_YEARS", "4"))
+
+# Gaps of stored days up to this long are read through rather than splitting
+# a read of missing days in two, since each read costs a search
+MISSING_DAYS_MERGE_GAP = int(os.getenv("MISSING_DAYS_MERGE_GAP", "3"))
+
+# A read of missing days: (variables, first day, last day)
+Run = Tuple[List[str], date, date]
+
+
+def expected_days(year: int) -> np.ndarray:
+    """Mask of day slots that should hold data for a year"""
+    expected = np.ones(DAYS_PER_YEAR, dtype=bool)
+    if not calendar.isleap(year):
+        expected[day_of_year_index(2, 29)] = False
+
+    today = date.today()
+    if year == today.year:
+        expected[day_of_year_index(today.month, today.day):] = False
+    elif year > today.year:
+        expected[:] = False
+    return expected
+
+
+def _optional(value) -> Optional[float]:
+    """Convert a NumPy scalar to float, mapping NaN to None"""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def _cell(variable: str, lat: float, lon: float) -> tuple:
+    """Grid cell (lat_idx, lon_idx) of a variable's collection holding a location"""
+    lat_idx, lon_idx, _, _ = get_variable(variable).collection.grid.snap(lat, lon)
+    return lat_idx, lon_idx
+
+
+def day_runs(year: int, indices: np.ndarray, gap: int = MISSING_DAYS_MERGE_GAP) -> List[Tuple[date, date]]:
+    """Contiguous date ranges covering day indices of a year, joined across gaps of at most gap days"""
+    runs: List[List[date]] = []
+    for index in indices.tolist():
+        day = date(year, *day_from_index(index))
+        if runs and (day - runs[-1][1]).days <= gap + 1:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [(first, last) for first, last in runs]
+
+
+def missing_runs(rows: Dict[str, Optional[np.ndarray]], year: int, indices: Optional[np.ndarray] = None) -> List[Run]:
+    """
+    Reads filling the expected days of a year that stored rows lack: the
+    missing days of each collection grouped into contiguous date ranges
+
+    Args:
+        rows: Stored series of each variable for the year, None if absent
+        year: Year of the rows
+        indices: Day indices wanted (see day_of_year_index); defaults to the whole year
+
+    Returns:
+        Runs of (variables, first day, last day), one read each
+    """
+    indices = np.arange(DAYS_PER_YEAR) if indices is None else indices
+    expected = indices[expected_days(year)[indices]]
+
+    missing: Dict[str, Tuple[List[str], np.ndarray]] = {}
+    for variable, row in rows.items():
+        gaps = expected if row is None else expected[np.isnan(row[expected])]
+        if len(gaps):
+            collection = get_variable(variable).collection.short_name
+            names, days = missing.get(collection, ([], gaps[:0]))
+            missing[collection] = (names + [variable], np.union1d(days, gaps))
+
+    return [
+        (names, first, last)
+        for names, days in missing.values()
+        for first, last in day_runs(year, days)
+    ]
+
+
+async def read_runs(
+    service: EarthdataService,
+    store: PointStore,
+    runs: List[Run],
+    lat: float,
+    lon: float,
+    year: int
+) -> None:
+    """
+    Read runs of missing days of a year at once and merge what they return
+    into the point store, base variables of derived ones included. A read
+    that fails leaves its days missing; an open circuit is raised.
+    """
+    async def read(variables: List[str], first: date, last: date) -> Dict[str, Dict]:
+        try:
+            return await service.fetch_variables_period(variables, lat, lon, first.isoformat(), last.isoformat())
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching {variables} for {first} to {last}: {e}")
+            return {}
+
+    for fetched in await asyncio.gather(*[read(*run) for run in runs]):
+        for variable, result in fetched.items():
+            in_year = result["years"] == year
+            values = np.full(DAYS_PER_YEAR, np.nan, dtype=np.float32)
+            values[result["day_indices"][in_year]] = result["values"][in_year]
+            store.put_year(variable, *_cell(variable, lat, lon), year, values)
+
+
+async def load_year(
+    service: EarthdataService,
+    store: PointStore,
+    semaphore: asyncio.Semaphore,
+    variables: List[str],
+    lat: float,
+    lon: float,
+    year: int
+) -> Dict[str, Optional[np.ndarray]]:
+    """
+    Load a year's daily series of several variables from the point store,
+    reading only the days it lacks from Earthdata: a year not stored at all
+    is one read per collection, and a stored year with a few missing days
+    costs a read of those days only. Every series computed along the way,
+    including the base variables a derived one depends on, is written back
+    to the store.
+    """
+    rows = {}
+    for variable in variables:
+        rows[variable] = store.get_year(variable, *_cell(variable, lat, lon), year)
+
+    runs = missing_runs(rows, year)
+    if not runs:
+        return rows
+
+    async with semaphore:
+        await read_runs(service, store, runs, lat, lon, year)
+    for variable in {name for names, _, _ in runs for name in names}:
+        rows[variable] = store.get_year(variable, *_cell(variable, lat, lon), year)
+    return rows
+
+
+async def build_calendar(
+    request: CalendarRequest,
+    service: EarthdataService,
+    store: PointStore,
+    start_year: int,
+    end_year: int
+) -> CalendarResponse:
+    """
+    Compute per-day statistics and probabilities for every day of the year.
+
+    Each year is read once as a contiguous daily series for the grid cell
+    (served from the point store when already available), and all
+    statistics are computed in a single vectorized pass over the
+    (year x day) matrix.
+
+    Args:
+        request: Calendar request with location, years, variables, thresholds
+        service: EarthdataService instance
+        store: Point store holding extracted daily series
+        start_year: Effective start year
+        end_year: Effective end year
+
+    Returns:
+        CalendarResponse with one CalendarDay per day of the year and variable
+    """
+    lat = request.location.lat
+    lon = request.location.lon
+    years = list(range(start_year, end_year + 1))
+    semaphore = asyncio.Semaphore(CALENDAR_MAX_CONCURRENT_YEARS)
+
+    variables = [get_variable(variable).name for variable in request.variables]
+    rows_by_year = await asyncio.gather(*[
+        load_year(service, store, semaphore, variables, lat, lon, year)
+        for year in years
+    ])
+
+    result = {}
+    actual_grid_points = {}
+
+    for variable in request.variables:
+        spec = get_variable(variable)
+        _, _, grid_lat, grid_lon = spec.collection.grid.snap(lat, lon)
+        logger.info(f"Building {spec.name} calendar for cell ({grid_lat}, {grid_lon})")
+
+        matrix = np.full((len(years), DAYS_PER_YEAR), np.nan, dtype=np.float32)
+        for i, rows in enumerate(rows_by_year):
+            if rows[spec.name] is not None:
+                matrix[i] = rows[spec.name]
+
+        has_data = ~np.isnan(matrix).all(axis=1)
+        stats = compute_statistics_matrix(matrix)
+        probs = {}
+        if request.thresholds and variable in request.thresholds:
+            probs = compute_probabilities_matrix(matrix, request.thresholds[variable])
+
+        days: List[CalendarDay] = []
+        for index in range(DAYS_PER_YEAR):
+            month, day = day_from_index(index)
+            day_stats = {name: _optional(values[index]) for name, values in stats.items() if name != "count"}
+            days.append(CalendarDay(
+                month=month,
+                day=day,
+                statistics=Statistics(count=int(stats["count"][index]), **day_stats),
+                probabilities={
+                    label: float(values[index])
+                    for label, values in probs.items()
+                    if not np.isnan(values[index])
+                }
+            ))
+
+        result[variable] = CalendarVariableData(
+            days=days,
+            years=[year for year, ok in zip(years, has_data) if ok],
+            missing_years=[year for year, ok in zip(years, has_data) if not ok]
+        )
+        actual_grid_points[variable] = GridPoint(
+            lat=grid_lat,
+            lon=grid_lon,
+            dataset=spec.collection.label
+        )
+
+    return CalendarResponse(
+        requested_location=request.location,
+        actual_grid_points=actual_grid_points,
+        years_analyzed=len(years),
+        data_period=f"{start_year}-{end_year}",
+        calendar=result,
+        units={variable.value: get_variable(variable).units for variable in request.variables}
+    )
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Chunk reference index for netCDF4/HDF5 granules and multi-year virtual datasets
+
+The index builder scans the HDF5 chunk layout of a granule once and records
+the byte offset and size of every chunk in a kerchunk-style reference file
+(zarr v2 metadata plus [url, offset, size] chunk references). Reference files
+of many granules can then be opened together as one virtual xarray Dataset
+concatenated along time, whose reads fetch only the chunks a selection needs,
+concurrently, instead of opening and decoding every granule separately.
+"""
+
+import base64
+import json
+import math
+import os
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence
+
+import h5netcdf
+import numpy as np
+import xarray as xr
+from xarray.backends import BackendArray
+from xarray.core import indexing
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Reads a byte range: (url, offset, size) -> bytes
+RangeReader = Callable[[str, int, int], bytes]
+
+# Attributes handled by the zarr array metadata instead of .zattrs
+_ENCODING_ATTRS = {"_FillValue", "_Netcdf4Dimid", "_Netcdf4Coordinates", "DIMENSION_LIST", "REFERENCE_LIST", "CLASS", "NAME"}
+
+
+def _json_value(value):
+    """Convert an HDF5 attribute value to a JSON-serializable value"""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if isinstance(value, np.ndarray):
+        return [_json_value(v) for v in value.tolist()]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return "NaN" if math.isnan(value) else ("Infinity" if value > 0 else "-Infinity")
+    return value
+
+
+def _from_json_value(value):
+    if value == "NaN":
+        return float("nan")
+    if value == "Infinity":
+        return float("inf")
+    if value == "-Infinity":
+        return float("-inf")
+    return value
+
+
+def _codecs(dataset) -> tuple:
+    """Map the HDF5 filter pipeline of a dataset to zarr compressor and filters"""
+    if dataset.fletcher32 or dataset.scaleoffset is not None:
+        raise ValueError(f"Unsupported HDF5 filters on {dataset.name}")
+    if dataset.compression not in (None, "gzip"):
+        raise ValueError(f"Unsupported compression {dataset.compression} on {dataset.name}")
+
+    filters = [{"id": "shuffle", "elementsize": dataset.dtype.itemsize}] if dataset.shuffle else None
+    compressor = {"id": "zlib", "level": dataset.compression_opts} if dataset.compression == "gzip" else None
+    return compressor, filters
+
+
+def build_references(source, url: str, variables: Sequence[str]) -> Dict:
+    """
+    Scan a granule's HDF5 chunk layout and build kerchunk-style references
+
+    Args:
+        source: Local path or file object of the granule (only metadata is read)
+        url: URL recorded in the chunk references
+        variables: Data variables to index; their dimension coordinates are
+            stored inline
+
+    Returns:
+        Reference dict with "version" and "refs" keys
+    """
+    refs = {".zgroup": json.dumps({"zarr_format": 2})}
+
+    with h5netcdf.File(source, "r") as f:
+        coord_names = set()
+        for name in variables:
+            var = f.variables[name]
+            dset = var._h5ds
+            if dset.chunks is None:
+                raise ValueError(f"Variable {name} is not chunked")
+
+            compressor, filters = _codecs(dset)
+            refs[f"{name}/.zarray"] = json.dumps({
+                "zarr_format": 2,
+                "shape": list(dset.shape),
+                "chunks": list(dset.chunks),
+                "dtype": dset.dtype.str,
+                "compressor": compressor,
+                "filters": filters,
+                "fill_value": _json_value(dset.fillvalue),
+                "order": "C",
+            })
+            attrs = {k: _json_value(v) for k, v in var.attrs.items() if k not in _ENCODING_ATTRS}
+            attrs["_ARRAY_DIMENSIONS"] = list(var.dimensions)
+            refs[f"{name}/.zattrs"] = json.dumps(attrs)
+
+            for i in range(dset.id.get_num_chunks()):
+                info = dset.id.get_chunk_info(i)
+                if info.filter_mask != 0:
+                    raise ValueError(f"Chunk {info.chunk_offset} of {name} skips filters")
+                key = ".".join(str(o // c) for o, c in zip(info.chunk_offset, dset.chunks))
+                refs[f"{name}/{key}"] = [url, int(info.byte_offset), int(info.size)]
+
+            coord_names.update(var.dimensions)
+
+        # Dimension coordinates are small, so store them inline
+        for name in coord_names:
+            if name not in f.variables:
+                continue
+            var = f.variables[name]
+            data = np.ascontiguousarray(var[...])
+            refs[f"{name}/.zarray"] = json.dumps({
+                "zarr_format": 2,
+                "shape": list(data.shape),
+                "chunks": list(data.shape),
+                "dtype": data.dtype.str,
+                "compressor": None,
+                "filters": None,
+                "fill_value": None,
+                "order": "C",
+            })
+            attrs = {k: _json_value(v) for k, v in var.attrs.items() if k not in _ENCODING_ATTRS}
+            attrs["_ARRAY_DIMENSIONS"] = list(var.dimensions)
+            refs[f"{name}/.zattrs"] = json.dumps(attrs)
+            refs[f"{name}/0"] = "base64:" + base64.b64encode(data.tobytes()).decode("ascii")
+
+    return {"version": 1, "refs": refs}
+
+
+def _decode_chunk(raw: bytes, meta: Dict) -> np.ndarray:
+    """Decode one stored chunk according to its zarr metadata"""
+    if meta["compressor"] is not None:
+        raw = zlib.decompress(raw)
+    for codec in reversed(meta["filters"] or []):
+        if codec["id"] == "shuffle":
+            size = codec["elementsize"]
+            raw = np.frombuffer(raw, dtype=np.uint8).reshape(size, -1).T.tobytes()
+        else:
+            raise ValueError(f"Unsupported filter {codec['id']}")
+    return np.frombuffer(raw, dtype=meta["dtype"]).reshape(meta["chunks"])
+
+
+def _inline_array(refs: Dict, name: str) -> np.ndarray:
+    meta = json.loads(refs[f"{name}/.zarray"])
+    data = base64.b64decode(refs[f"{name}/0"][len("base64:"):])
+    return np.frombuffer(data, dtype=meta["dtype"]).reshape(meta["shape"])
+
+
+class _ReferenceArray(BackendArray):
+    """
+    Lazy array over one variable of several granules, concatenated along the
+    first (time) dimension, that reads only the chunks an indexing key needs
+    """
+
+    def __init__(self, name: str, granule_refs: List[Dict], reader: RangeReader, executor: ThreadPoolExecutor):
+        self.name = name
+        self.refs = granule_refs
+        self.reader = reader
+        self.executor = executor
+        self.metas = [json.loads(r[f"{name}/.zarray"]) for r in granule_refs]
+
+        first = self.metas[0]
+        for meta in self.metas[1:]:
+            if meta["shape"][1:] != first["shape"][1:] or meta["dtype"] != first["dtype"]:
+                raise ValueError(f"Granules disagree on the layout of {name}")
+
+        lengths = [meta["shape"][0] for meta in self.metas]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.shape = (int(self.offsets[-1]),) + tuple(first["shape"][1:])
+        self.dtype = np.dtype(first["dtype"])
+        self.fill_value = _from_json_value(first["fill_value"])
+
+    def __getitem__(self, key: indexing.ExplicitIndexer) -> np.ndarray:
+        return indexing.explicit_indexing_adapter(
+            key, self.shape, indexing.IndexingSupport.OUTER, self._raw_indexing_method
+        )
+
+    def _raw_indexing_method(self, key: tuple) -> np.ndarray:
+        # Normalize every dimension to an array of indices, remembering scalar dims
+        selections = []
+        squeeze = []
+        for axis, (k, size) in enumerate(zip(key, self.shape)):
+            if isinstance(k, (int, np.integer)):
+                selections.append(np.array([int(k) % size]))
+                squeeze.append(axis)
+            elif isinstance(k, slice):
+                selections.append(np.arange(size)[k])
+            else:
+                selections.append(np.asarray(k) % size)
+
+        out = np.full([len(s) for s in selections], self.fill_value, dtype=self.dtype)
+
+        # Plan the chunk reads of every granule touched by the time selection
+        tasks = []
+        granule_of = np.searchsorted(self.offsets, selections[0], side="right") - 1
+        for g in np.unique(granule_of):
+            meta = self.metas[g]
+            chunks = meta["chunks"]
+            time_positions = np.nonzero(granule_of == g)[0]
+            per_axis = [(time_positions, selections[0][time_positions] - self.offsets[g])]
+            per_axis += [(np.arange(len(s)), s) for s in selections[1:]]
+
+            chunk_ids = [np.unique(local // c) for (_, local), c in zip(per_axis, chunks)]
+            for chunk_key in np.array(np.meshgrid(*chunk_ids, indexing="ij")).reshape(len(chunks), -1).T:
+                tasks.append((g, tuple(int(c) for c in chunk_key), per_axis))
+
+        def read(task):
+            g, chunk_key, _ = task
+            ref = self.refs[g].get(f"{self.name}/{'.'.join(map(str, chunk_key))}")
+            if ref is None:
+                return None
+            url, offset, size = ref
+            return _decode_chunk(self.reader(url, offset, size), self.metas[g])
+
+        for (g, chunk_key, per_axis), chunk in zip(tasks, self.executor.map(read, tasks)):
+            if chunk is None:
+                continue
+            chunks = self.metas[g]["chunks"]
+            out_index = []
+            chunk_index = []
+            for (positions, local), c, k in zip(per_axis, chunks, chunk_key):
+                inside = (local // c) == k
+                out_index.append(positions[inside])
+                chunk_index.append(local[inside] - k * c)
+            out[np.ix_(*out_index)] = chunk[np.ix_(*chunk_index)]
+
+        return out.squeeze(axis=tuple(squeeze)) if squeeze else out
+
+
+def open_virtual_dataset(
+    granule_refs: List[Dict],
+    variables: Sequence[str],
+    reader: RangeReader,
+    executor: ThreadPoolExecutor
+) -> xr.Dataset:
+    """
+    Open the reference files of several granules as one lazy Dataset
+    concatenated along the time dimension
+
+    Args:
+        granule_refs: Reference dicts in time order, as built by build_references
+        variables: Data variables to expose
+        reader: Byte range reader used for chunk reads
+        executor: Thread pool used for concurrent chunk reads
+
+    Returns:
+        CF-decoded xarray Dataset; indexing it only reads the chunks needed
+    """
+    refs = [r["refs"] for r in granule_refs]
+
+    # Decode each granule's time axis separately since their units differ
+    times = []
+    for r in refs:
+        attrs = json.loads(r["time/.zattrs"])
+        attrs.pop("_ARRAY_DIMENSIONS")
+        times.append(xr.decode_cf(xr.Dataset({"time": ("time", _inline_array(r, "time"), attrs)})).time.values)
+
+    data_vars = {}
+    for name in variables:
+        attrs = json.loads(refs[0][f"{name}/.zattrs"])
+        dims = attrs.pop("_ARRAY_DIMENSIONS")
+        array = _ReferenceArray(name, refs, reader, executor)
+        if array.fill_value is not None:
+            attrs["_FillValue"] = array.fill_value
+        data_vars[name] = xr.Variable(dims, indexing.LazilyIndexedArray(array), attrs)
+
+    coords = {"time": np.concatenate(times)}
+    for name in set(d for v in data_vars.values() for d in v.dims) - {"time"}:
+        attrs = json.loads(refs[0][f"{name}/.zattrs"])
+        attrs.pop("_ARRAY_DIMENSIONS")
+        coords[name] = xr.Variable(name, _inline_array(refs[0], name), attrs)
+
+    return xr.decode_cf(xr.Dataset(data_vars, coords=coords))
+
+
+class ChunkIndexStore:
+    """Persists reference files locally, one per granule"""
+
+    def __init__(self, root_dir: str):
+        """
+        Args:
+            root_dir: Directory holding the reference files
+        """
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _path(self, filename: str, variables: Sequence[str]) -> str:
+        return os.path.join(self.root_dir, f"{filename}.{'-'.join(sorted(variables))}.json")
+
+    def get(self, filename: str, variables: Sequence[str]) -> Optional[Dict]:
+        """Return the stored references of a granule, or None"""
+        try:
+            with open(self._path(filename, variables)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.error(f"Corrupt chunk index for {filename}: {e}")
+            return None
+
+    def put(self, filename: str, variables: Sequence[str], refs: Dict) -> None:
+        """Atomically store the references of a granule"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.root_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(refs, f)
+        os.replace(tmp_path, self._path(filename, variables))
+
+
+@lru_cache(maxsize=1)
+def get_chunk_index_store() -> Optional[ChunkIndexStore]:
+    """
+    Get singleton instance of ChunkIndexStore.
+    Configured through CHUNK_INDEX_DIR; setting CHUNK_INDEX_ENABLED=false
+    disables indexed reads.
+    """
+    if os.getenv("CHUNK_INDEX_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    return ChunkIndexStore(os.getenv("CHUNK_INDEX_DIR", os.path.join(tempfile.gettempdir(), "quadcode", "chunk_index")))
@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+Precomputed day-of-year climatology: global per-cell statistics tiles and the batch job building them
+
+For a variable, a year range and a calendar day, a tile holds the statistics
+of every grid cell (count, mean, std, min, max, percentiles, trend, a GEV fit
+with its return levels and threshold exceedance probabilities) and its value
+in every year, as float32 layers. Tiles are split into
+square blocks of cells, each compressed on its own and located through an
+offset table in the tile header, so answering one cell decompresses a
+single small block: the lookup cost does not depend on the grid size.
+
+Tile file layout:
+    magic b"QCLT", format version (uint32), header length (uint32)
+    header: JSON with variable, years, day, grid shape, block size, layer
+        names, threshold labels and the [offset, length] of every block
+    blocks: zlib-compressed, byte-shuffled float32 arrays of shape
+        (layers, block rows, block columns), in row-major block order
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import struct
+import tempfile
+import time
+import zlib
+from calendar import isleap
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import logging
+
+from quadcode.app.core.extremes import RETURN_PERIODS, fit_gev_matrix, gev_return_levels
+from quadcode.app.core.grid import DAYS_PER_YEAR, day_from_index
+from quadcode.app.core.registry import get_variable, resolve_variables, required_fields, evaluate_variables
+from quadcode.app.core.utils import (
+    compute_statistics_matrix,
+    compute_probabilities_matrix,
+    compute_trend_matrix,
+    threshold_label
+)
+from quadcode.app.services.snapshot import CLIMATOLOGY, SnapshotBundle, get_snapshot
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"QCLT"
+_VERSION = 1
+_PREAMBLE = struct.Struct("<4sII")
+
+# Per-cell layers of every tile, in file order; probabilities follow as "p_<label>"
+STATISTICS = (
+    "count", "mean", "median", "std", "min", "max",
+    "percentile_10", "percentile_25", "percentile_75", "percentile_90",
+    "slope", "intercept", "r_squared", "percent_change",
+    "gev_location", "gev_scale", "gev_shape",
+) + tuple(f"return_level_{period}" for period in RETURN_PERIODS)
+
+# Prefix of the per-year value layers, which follow the probabilities
+YEAR_LAYER_PREFIX = "value_"
+
+
+def year_layer(year: int) -> str:
+    """Name of the layer holding the values of one year"""
+    return f"{YEAR_LAYER_PREFIX}{year}"
+
+
+def reduce_day(stack: np.ndarray, years: np.ndarray, thresholds: Dict[str, float], band_rows: int = 64) -> Dict[str, np.ndarray]:
+    """
+    Reduce one calendar day of a global grid over years to per-cell statistics
+
+    Rows of cells are reduced in bands, so the float64 working arrays stay
+    bounded on fine grids.
+
+    Args:
+        stack: (year, lat, lon) array, NaN for missing years
+        years: Year of each row of the stack
+        thresholds: Threshold names and values for exceedance probabilities
+        band_rows: Latitude rows reduced at once
+
+    Returns:
+        Mapping of layer name (STATISTICS, then "p_<label>") to float32 (lat, lon) arrays
+    """
+    n_years, n_lat, n_lon = stack.shape
+    labels = [threshold_label(name, value)[0] for name, value in thresholds.items()]
+    layers = {name: np.empty((n_lat, n_lon), dtype=np.float32) for name in STATISTICS}
+    layers.update({f"p_{label}": np.empty((n_lat, n_lon), dtype=np.float32) for label in labels})
+
+    for row in range(0, n_lat, band_rows):
+        rows = slice(row, min(row + band_rows, n_lat))
+        matrix = stack[:, rows, :].reshape(n_years, -1)
+        shape = (rows.stop - rows.start, n_lon)
+
+        reduced = dict(compute_statistics_matrix(matrix))
+        reduced.update(compute_trend_matrix(matrix, years))
+        gev = fit_gev_matrix(matrix)
+        reduced.update({f"gev_{name}": gev[name] for name in ("location", "scale", "shape")})
+        for period, levels in zip(RETURN_PERIODS, gev_return_levels(gev)):
+            reduced[f"return_level_{period}"] = levels
+        for label, probability in compute_probabilities_matrix(matrix, thresholds).items():
+            reduced[f"p_{label}"] = probability
+
+        for name, values in reduced.items():
+            layers[name][rows] = np.asarray(values, dtype=np.float32).reshape(shape)
+
+    return layers
+
+
+def _shuffle(block: np.ndarray) -> bytes:
+    """Group the bytes of float32 values by significance, which compresses much better"""
+    return np.ascontiguousarray(block.view(np.uint8).reshape(-1, 4).T).tobytes()
+
+
+def _unshuffle(data: bytes, shape: Tuple[int, ...]) -> np.ndarray:
+    return np.ascontiguousarray(np.frombuffer(data, dtype=np.uint8).reshape(4, -1).T).view(np.float32).reshape(shape)
+
+
+def write_tile(path: str, layers: Dict[str, np.ndarray], meta: Dict, block: int = 32) -> None:
+    """
+    Write a tile atomically
+
+    Args:
+        path: Tile file path
+        layers: Layer name to (lat, lon) array, all of one shape
+        meta: Extra header fields (variable, years, day, thresholds...)
+        block: Side of the square blocks of cells compressed together
+    """
+    names = list(layers)
+    stack = np.stack([np.asarray(layers[name], dtype=np.float32) for name in names])
+    _, n_lat, n_lon = stack.shape
+
+    blocks = []
+    offsets = []
+    offset = 0
+    for row in range(0, n_lat, block):
+        for col in range(0, n_lon, block):
+            data = zlib.compress(_shuffle(np.ascontiguousarray(stack[:, row:row + block, col:col + block])), 6)
+            blocks.append(data)
+            offsets.append([offset, len(data)])
+            offset += len(data)
+
+    header = json.dumps(dict(meta, layers=names, shape=[n_lat, n_lon], block=block, blocks=offsets)).encode()
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_PREAMBLE.pack(_MAGIC, _VERSION, len(header)))
+        f.write(header)
+        for data in blocks:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=1024)
+def _tile_header(path: str, mtime_ns: int) -> Tuple[Dict, int]:
+    """Parsed header of a tile and the file offset of its first block; cached per file version"""
+    with open(path, "rb") as f:
+        magic, version, length = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Unsupported tile format in {path}")
+        return json.loads(f.read(length)), _PREAMBLE.size + length
+
+
+def read_cell(path: str, lat_idx: int, lon_idx: int) -> Optional[Dict]:
+    """
+    Read the layers of one cell from a tile
+
+    Returns:
+        Dict with the tile header fields and values (layer name -> float),
+        or None if the tile does not exist
+    """
+    try:
+        header, data_start = _tile_header(path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+    n_lat, n_lon = header["shape"]
+    block = header["block"]
+    block_row, block_col = lat_idx // block, lon_idx // block
+    blocks_per_row = -(-n_lon // block)
+    offset, length = header["blocks"][block_row * blocks_per_row + block_col]
+    rows = min(block, n_lat - block_row * block)
+    cols = min(block, n_lon - block_col * block)
+
+    with open(path, "rb") as f:
+        data = os.pread(f.fileno(), length, data_start + offset)
+    values = _unshuffle(zlib.decompress(data), (len(header["layers"]), rows, cols))[:, lat_idx % block, lon_idx % block]
+    return dict(header, values={name: float(value) for name, value in zip(header["layers"], values)})
+
+
+def read_window(path: str, lat_range: slice, lon_range: slice) -> Optional[Tuple[Dict, np.ndarray]]:
+    """
+    Read the layers of a window of cells from a tile, decompressing only the blocks it overlaps
+
+    Returns:
+        Tile header and a (layer, lat, lon) array, or None if the tile does not exist
+    """
+    try:
+        header, data_start = _tile_header(path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+    n_lat, n_lon = header["shape"]
+    block = header["block"]
+    blocks_per_row = -(-n_lon // block)
+    lat_start, lat_stop, _ = lat_range.indices(n_lat)
+    lon_start, lon_stop, _ = lon_range.indices(n_lon)
+    window = np.full((len(header["layers"]), max(lat_stop - lat_start, 0), max(lon_stop - lon_start, 0)),
+                     np.nan, dtype=np.float32)
+
+    with open(path, "rb") as f:
+        for block_row in range(lat_start // block, -(-lat_stop // block)):
+            for block_col in range(lon_start // block, -(-lon_stop // block)):
+                offset, length = header["blocks"][block_row * blocks_per_row + block_col]
+                row0, col0 = block_row * block, block_col * block
+                rows = min(block, n_lat - row0)
+                cols = min(block, n_lon - col0)
+                values = _unshuffle(zlib.decompress(os.pread(f.fileno(), length, data_start + offset)),
+                                    (len(header["layers"]), rows, cols))
+                r0, r1 = max(lat_start, row0), min(lat_stop, row0 + rows)
+                c0, c1 = max(lon_start, col0), min(lon_stop, col0 + cols)
+                window[:, r0 - lat_start:r1 - lat_start, c0 - lon_start:c1 - lon_start] = \
+                    values[:, r0 - row0:r1 - row0, c0 - col0:c1 - col0]
+    return header, window
+
+
+class ClimatologyStore:
+    """
+    Tiles of one directory per (variable, year range), one file per calendar day.
+
+    A job's progress is the set of tiles on disk, since each is written
+    atomically; progress.json records the job configuration, so a resumed
+    job cannot mix thresholds, and the days that failed. Tiles missing on
+    disk are restored from the warm-cache snapshot, if any, on first use.
+    """
+
+    def __init__(self, root_dir: str, snapshot: Optional[SnapshotBundle] = None):
+        """
+        Args:
+            root_dir: Directory holding the tiles
+            snapshot: Warm-cache bundle restoring tiles missing on disk
+        """
+        self.root_dir = root_dir
+        self.snapshot = snapshot
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _dir(self, variable: str, start_year: int, end_year: int) -> str:
+        return os.path.join(self.root_dir, variable, f"{start_year}-{end_year}")
+
+    def tile_path(self, variable: str, start_year: int, end_year: int, day_index: int) -> str:
+        return os.path.join(self._dir(variable, start_year, end_year), f"{day_index:03d}.qct")
+
+    def _local_path(self, variable: str, start_year: int, end_year: int, day_index: int) -> str:
+        """Path of a tile, restored from the snapshot first if it is only there"""
+        path = self.tile_path(variable, start_year, end_year, day_index)
+        if self.snapshot is not None and not os.path.exists(path):
+            relative = f"{variable}/{start_year}-{end_year}/{day_index:03d}.qct"
+            try:
+                self.snapshot.restore(CLIMATOLOGY, relative, path)
+            except OSError as e:
+                logger.error(f"Could not restore climatology tile {relative} from the snapshot: {e}")
+        return path
+
+    def tile_version(self, variable: str, start_year: int, end_year: int, day_index: int) -> int:
+        """Modification time of a tile in nanoseconds, or 0 if it is not precomputed"""
+        try:
+            return os.stat(self._local_path(variable, start_year, end_year, day_index)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def completed_days(self, variable: str, start_year: int, end_year: int) -> List[int]:
+        """Day indices whose tile exists, on disk or in the snapshot"""
+        names = []
+        if self.snapshot is not None:
+            names = self.snapshot.list_files(CLIMATOLOGY, f"{variable}/{start_year}-{end_year}")
+        try:
+            names += os.listdir(self._dir(variable, start_year, end_year))
+        except FileNotFoundError:
+            pass
+        return sorted({int(name[:-4]) for name in names if name.endswith(".qct")})
+
+    def put_tile(self, variable: str, start_year: int, end_year: int, day_index: int,
+                 layers: Dict[str, np.ndarray], meta: Dict, block: int = 32) -> None:
+        write_tile(self.tile_path(variable, start_year, end_year, day_index), layers, meta, block)
+
+    def get_cell(self, variable: str, start_year: int, end_year: int, day_index: int,
+                 lat_idx: int, lon_idx: int) -> Optional[Dict]:
+        """
+        Statistics of one grid cell, or None if the tile is not precomputed
+
+        Returns:
+            Dict with values (layer name -> float) and probabilities
+            (threshold label -> layer name) among the tile header fields
+        """
+        path = self._local_path(variable, start_year, end_year, day_index)
+        try:
+            return read_cell(path, lat_idx, lon_idx)
+        except (OSError, ValueError, zlib.error) as e:
+            logger.error(f"Corrupt climatology tile {path}: {e}")
+            return None
+
+    def get_window(self, variable: str, start_year: int, end_year: int, day_index: int,
+                   lat_range: slice, lon_range: slice) -> Optional[Tuple[Dict, np.ndarray]]:
+        """
+        Statistics of a window of grid cells, or None if the tile is not precomputed
+
+        Returns:
+            Tile header (layers, probabilities...) and a (layer, lat, lon) array
+        """
+        path = self._local_path(variable, start_year, end_year, day_index)
+        try:
+            return read_window(path, lat_range, lon_range)
+        except (OSError, ValueError, zlib.error) as e:
+            logger.error(f"Corrupt climatology tile {path}: {e}")
+            return None
+
+    def load_progress(self, variable: str, start_year: int, end_year: int) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self._dir(variable, start_year, end_year), "progress.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_progress(self, variable: str, start_year: int, end_year: int, progress: Dict) -> None:
+        directory = self._dir(variable, start_year, end_year)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, os.path.join(directory, "progress.json"))
+
+
+# Per-process state of precompute workers
+_worker_service = None
+_worker_store: Optional[ClimatologyStore] = None
+
+
+def _init_worker(root_dir: str) -> None:
+    """Pool initializer: each worker process authenticates and opens the store once"""
+    global _worker_service, _worker_store
+    from quadcode.app.core.logs import configure_logging
+    from quadcode.app.services.earthdata_service import EarthdataService
+    from quadcode.app.services.fetch_scheduler import FetchLane, fetch_lane
+
+    configure_logging()
+    # Warm-up work: never ahead of queries in this process's fetch scheduler
+    fetch_lane.set(FetchLane.PREFETCH)
+    _worker_service = EarthdataService()
+    _worker_store = ClimatologyStore(root_dir)
+
+
+async def _fetch_day_stack(variable: str, years: np.ndarray, month: int, day: int) -> Optional[np.ndarray]:
+    """Evaluate a variable over the whole grid for one calendar day of every year, as a (year, lat, lon) stack"""
+    specs = resolve_variables([variable])
+    collection = specs[-1].collection
+    fields = required_fields(specs)
+
+    stack = None
+    for row, year in enumerate(years):
+        if month == 2 and day == 29 and not isleap(int(year)):
+            continue
+        result = await _worker_service.fetch_global_fields(collection, fields, month, day, int(year))
+        if result is None:
+            continue
+
+        values = evaluate_variables(specs, result["fields"])[variable]
+        expected = (collection.grid.lat_count, collection.grid.lon_count)
+        if values.shape != expected:
+            raise ValueError(f"{collection.short_name} grid {values.shape} does not match {collection.grid.name} {expected}")
+        if stack is None:
+            stack = np.full((len(years),) + expected, np.nan, dtype=np.float32)
+        stack[row] = values
+    return stack
+
+
+def _build_day(task: Tuple) -> Tuple[str, int, Optional[str]]:
+    """
+    Pool task: fetch, reduce and write the tile of one variable and calendar day
+
+    Returns:
+        Tuple of (variable, day_index, error message or None)
+    """
+    variable, start_year, end_year, day_index, thresholds, block = task
+    month, day = day_from_index(day_index)
+    years = np.arange(start_year, end_year + 1)
+    try:
+        stack = asyncio.run(_fetch_day_stack(variable, years, month, day))
+        if stack is None:
+            return variable, day_index, "no data"
+
+        layers = reduce_day(stack, years, thresholds)
+        # The series itself, so a query answered from the tile gets the per-year values too
+        layers.update({year_layer(year): stack[row] for row, year in enumerate(years)})
+        meta = {
+            "variable": variable,
+            "start_year": start_year,
+            "end_year": end_year,
+            "day_index": day_index,
+            "grid": get_variable(variable).collection.grid.name,
+            "probabilities": {threshold_label(name, value)[0]: f"p_{threshold_label(name, value)[0]}"
+                              for name, value in thresholds.items()},
+        }
+        _worker_store.put_tile(variable, start_year, end_year, day_index, layers, meta, block)
+        return variable, day_index, None
+    except Exception as e:
+        return variable, day_index, repr(e)
+
+
+def run_precompute(
+    store: ClimatologyStore,
+    variables: Iterable[str],
+    start_year: int,
+    end_year: int,
+    days: Optional[Iterable[int]] = None,
+    thresholds: Optional[Dict[str, Dict[str, float]]] = None,
+    workers: int = 4,
+    block: int = 32,
+    restart: bool = False
+) -> Dict[str, Dict]:
+    """
+    Build the climatology tiles of variables for a year range on a process pool
+
+    Each (variable, day) is one task: its worker reads that day of every
+    year over the whole grid and reduces it to one tile. Days whose tile
+    already exists are skipped, so an interrupted job resumes where it
+    stopped; granules read before the interruption come from the local
+    granule cache when it is enabled.
+
+    Args:
+        store: Tile store
+        variables: Daily variables to precompute (see the registry)
+        start_year: First year of the climatology
+        end_year: Last year of the climatology
+        days: Day indices (0-365, see day_of_year_index); all by default
+        thresholds: Exceedance thresholds per variable, stored as probability layers
+        workers: Worker processes
+        block: Side of the square blocks of cells tiles are compressed in
+        restart: Rebuild existing tiles, e.g. after changing thresholds
+
+    Returns:
+        Per variable, the number of completed days and the failed days with their errors
+
+    Raises:
+        ValueError: If a variable is unknown, or existing tiles were built
+            with a different configuration and restart is not set
+    """
+    variables = [get_variable(variable).name for variable in variables]
+    days = sorted(set(days)) if days is not None else list(range(DAYS_PER_YEAR))
+    thresholds = thresholds or {}
+
+    tasks = []
+    progress = {}
+    for variable in variables:
+        # Floats, so probability labels match those of query requests ("above_35.0")
+        config = {
+            "thresholds": {name: float(value) for name, value in thresholds.get(variable, {}).items()},
+            "block": block
+        }
+        previous = store.load_progress(variable, start_year, end_year)
+        if previous is not None and previous["config"] != config and not restart:
+            raise ValueError(
+                f"Tiles of {variable} for {start_year}-{end_year} were built with {previous['config']}; "
+                f"use restart to rebuild them with {config}"
+            )
+
+        done = set() if restart else set(store.completed_days(variable, start_year, end_year))
+        pending = [day for day in days if day not in done]
+        progress[variable] = {"config": config, "failed": {}, "started": time.time()}
+        store.save_progress(variable, start_year, end_year, progress[variable])
+        tasks.extend((variable, start_year, end_year, day, config["thresholds"], block) for day in pending)
+        logger.info(f"{variable} {start_year}-{end_year}: {len(days) - len(pending)} days done, {len(pending)} to build")
+
+    started = time.monotonic()
+    # Spawned workers do not inherit the parent's threads and locks
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=workers, initializer=_init_worker, initargs=(store.root_dir,)) as pool:
+        for finished, (variable, day_index, error) in enumerate(pool.imap_unordered(_build_day, tasks), start=1):
+            if error is not None:
+                progress[variable]["failed"][str(day_index)] = error
+                logger.warning(f"Climatology {variable} day {day_index} failed: {error}")
+            progress[variable]["updated"] = time.time()
+            store.save_progress(variable, start_year, end_year, progress[variable])
+
+            elapsed = time.monotonic() - started
+            logger.info(
+                f"Climatology {finished}/{len(tasks)} days built, "
+                f"about {elapsed / finished * (len(tasks) - finished):.0f}s left"
+            )
+
+    return {
+        variable: {
+            "completed": len(store.completed_days(variable, start_year, end_year)),
+            "failed": progress[variable]["failed"],
+        }
+        for variable in variables
+    }
+
+
+@lru_cache(maxsize=1)
+def get_climatology_store() -> Optional[ClimatologyStore]:
+    """
+    Get singleton instance of ClimatologyStore.
+    Configured through CLIMATOLOGY_DIR; setting CLIMATOLOGY_ENABLED=false
+    stops queries from being answered from tiles. Tiles missing on disk are
+    restored from the SNAPSHOT_PATH bundle, if any.
+    """
+    if os.getenv("CLIMATOLOGY_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    return ClimatologyStore(
+        os.getenv("CLIMATOLOGY_DIR", os.path.join(tempfile.gettempdir(), "quadcode", "climatology")),
+        snapshot=get_snapshot()
+    )
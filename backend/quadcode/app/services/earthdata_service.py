@@ -3,14 +3,75 @@
 Service for fetching NASA Earthdata weather data
 """
 
+import asyncio
 import earthaccess
+import numpy as np
 import xarray as xr
-from typing import Dict, List, Optional
+import os
+from calendar import monthrange
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from functools import lru_cache
 import logging
 
+from quadcode.app.core.grid import DAYS_PER_YEAR, day_of_year_index, day_of_year_indices
+from quadcode.app.core.logs import PER_YEAR
+from quadcode.app.core.series import YearSeries
+from quadcode.app.core.registry import (
+    Collection,
+    VariableSpec,
+    PRODUCTS,
+    VARIABLES,
+    get_variable,
+    resolve_variables,
+    required_fields,
+    evaluate_variables
+)
+from quadcode.app.services.granule_cache import (
+    get_granule_cache,
+    granule_filename,
+    granule_month,
+    open_granule_dataset,
+    read_granule_point,
+    read_granule_window
+)
+from quadcode.app.services.point_store import get_point_store
+from quadcode.app.services.chunk_index import build_references, get_chunk_index_store, open_virtual_dataset
+from quadcode.app.services.fetch_policy import CircuitOpenError, get_fetch_policy
+from quadcode.app.services.granule_budget import get_granule_budget
+from quadcode.app.services.fetch_scheduler import FetchLane, fetch_lane, get_fetch_scheduler
+from quadcode.app.services.range_client import get_range_client
+from quadcode.app.services.search_cache import get_search_cache
+
 logger = logging.getLogger(__name__)
 
+# Deadline of indexed multi-year reads and whole-grid reads
+MULTI_GRANULE_TIMEOUT_SECONDS = float(os.getenv("FETCH_MULTI_GRANULE_TIMEOUT_SECONDS", "600"))
+
+
+def collection_fields(collection: Collection) -> List[str]:
+    """All registry fields read from a collection, in registry order"""
+    return required_fields(spec for spec in VARIABLES.values() if spec.collection == collection)
+
+
+def _group_by_collection(variables: Sequence[str], resolution: str = "daily") -> Dict[Collection, List[VariableSpec]]:
+    """Resolve variables with their dependencies and group them by collection, in evaluation order"""
+    groups: Dict[Collection, List[VariableSpec]] = {}
+    for spec in resolve_variables(variables, resolution):
+        groups.setdefault(spec.collection, []).append(spec)
+    return groups
+
+
+def season_year_offsets(months: Sequence[int]) -> Dict[int, int]:
+    """
+    Year offset of each month of a season, relative to the season's year.
+    A season that wraps the new year (e.g. December-February) belongs to
+    the year it ends in, so its months before the wrap are from the year before.
+    """
+    wrap = next((i for i in range(1, len(months)) if months[i] < months[i - 1]), None)
+    return {month: -1 if wrap is not None and i < wrap else 0 for i, month in enumerate(months)}
+
 
 class EarthdataService:
     """Service for fetching data from NASA Earthdata"""
@@ -24,67 +85,186 @@ class EarthdataService:
             logger.error(f"Failed to authenticate with NASA Earthdata: {e}")
             raise
 
-    async def _fetch_temperature_single_year(
+        self.granule_cache = get_granule_cache()
+        self.searches = get_search_cache()
+        self.chunk_index = get_chunk_index_store()
+        self._chunk_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("CHUNK_READ_WORKERS", "16")),
+            thread_name_prefix="quadcode-chunk"
+        )
+        self._https_session = None
+        self.range_client = get_range_client()
+        self.fetch_policy = get_fetch_policy()
+        self.granule_budget = get_granule_budget()
+        self.scheduler = get_fetch_scheduler()
+        self.point_store = get_point_store()
+
+    @asynccontextmanager
+    async def _fetch_slot(self, nbytes: Optional[int] = None) -> AsyncIterator[None]:
+        """
+        Wait for the turn of a fetch under the fetch scheduler (lane and
+        client of the context), then for its granule budget reservation
+        """
+        async with self.scheduler.slot():
+            async with self.granule_budget.slot(nbytes):
+                yield
+
+    def _granule_source(self, granule, download: Optional[bool] = None):
+        """
+        Local path of a granule in the granule cache when enabled, or a
+        remote file object streaming it from Earthdata (see _remote_file)
+
+        Args:
+            granule: earthaccess search result
+            download: Download uncached granules into the cache instead of
+                streaming them; by default only batch and prefetch work does
+        """
+        if download is None:
+            # An interactive read needs a few chunks of a global granule (about
+            # 400 MB a day for M2T1NXSLV); downloading it all would run inside
+            # the fetch deadline and hold the granule lock against its hedge
+            download = fetch_lane.get() != FetchLane.INTERACTIVE
+        source = None
+        if self.granule_cache is not None:
+            source = self.granule_cache.fetch(granule) if download else self.granule_cache.get(granule)
+        if source is None:
+            source = self._remote_file(granule)
+        return source
+
+    def _remote_file(self, granule):
+        """
+        File object reading a granule from Earthdata with range requests over
+        the pooled range client, or through earthaccess when it is disabled
+        """
+        if self.range_client is not None:
+            return self.range_client.open(granule.data_links()[0])
+        return earthaccess.open([granule])[0]
+
+    @contextmanager
+    def _open_granule(self, granule) -> Iterator[xr.Dataset]:
+        """
+        Open a granule, reading it from the local granule cache when enabled
+        and streaming it from Earthdata otherwise
+        """
+        with open_granule_dataset(self._granule_source(granule)) as ds:
+            yield ds
+
+    async def fetch_variables_data(
         self,
+        variables: Sequence[str],
         lat: float,
         lon: float,
         month: int,
         day: int,
-        year: int
-    ) -> Optional[Dict]:
-        """Fetch temperature data for a single year"""
-        try:
-            date_str = f"{year}-{month:02d}-{day:02d}"
-            logger.info(f"Fetching temperature for {date_str}")
+        start_year: int,
+        end_year: int
+    ) -> Dict[str, Dict]:
+        """
+        Fetch multi-year data for several variables
 
-            search_results = earthaccess.search_data(
-                short_name="M2SDNXSLV",
-                version="5.12.4",
-                temporal=(date_str, date_str),
-            )
+        Requested variables are resolved with the variables they derive
+        from and grouped by collection, so each granule is read once for
+        every base field it provides. Base and derived variables are then
+        evaluated in dependency order, each as one vectorized NumPy
+        operation over all years.
 
-            if len(search_results) > 0:
-                files = earthaccess.open(search_results)
-                with xr.open_dataset(files[0]) as ds:
-                    temp_data = ds['T2MMEAN'].sel(lat=lat, lon=lon, method='nearest')
-                    actual_lat = float(temp_data.lat.values)
-                    actual_lon = float(temp_data.lon.values)
-
-                    temp_values = temp_data.values
-                    if len(temp_values) == 0:
-                        logger.warning(f"Empty data array for {date_str}")
-                        return None
-
-                    temp_k = float(temp_values[0])
-                    temp_c = temp_k - 273.15
-
-                    logger.info(f"Fetched temperature for {year}: {temp_c:.2f}°C")
-                    return {
-                        "temp_c": temp_c,
-                        "actual_lat": actual_lat,
-                        "actual_lon": actual_lon
-                    }
-            else:
-                logger.warning(f"No temperature data found for {date_str}")
-                return None
+        Years already harvested into the point store by an earlier read of
+        a nearby cell are served from it; the tile read around this cell is
+        harvested in turn (see PointStore.harvest_window).
 
-        except Exception as e:
-            logger.error(f"Error fetching temperature for {year}: {e}")
-            return None
+        Args:
+            variables: Variable names (see the registry)
+            lat: Latitude
+            lon: Longitude
+            month: Month (1-12)
+            day: Day of month (1-31)
+            start_year: Start year
+            end_year: End year
+
+        Returns:
+            Mapping of variable to its YearSeries over start_year..end_year
 
-    async def fetch_temperature_data(
+        Raises:
+            ValueError: If a variable is unknown
+        """
+        requested = {get_variable(variable).name for variable in variables}
+        years = np.arange(start_year, end_year + 1)
+        day_index = day_of_year_index(month, day)
+
+        async def fetch_group(collection: Collection, group: List[VariableSpec]) -> Dict[str, YearSeries]:
+            names = [spec.name for spec in group if spec.name in requested]
+            lat_idx, lon_idx, grid_lat, grid_lon = collection.grid.snap(lat, lon)
+            values = {
+                name: self.point_store.get_tile_values(name, lat_idx, lon_idx, day_index, years)
+                for name in names
+            }
+            actual_lat, actual_lon = grid_lat, grid_lon
+
+            todo = np.zeros(len(years), dtype=bool)
+            for name in names:
+                todo |= np.isnan(values[name])
+            if todo.any():
+                first, last = int(years[todo][0]), int(years[todo][-1])
+                window = self.point_store.harvest_window(collection.grid, lat_idx, lon_idx)
+                series = await self._fetch_collection_fields(
+                    collection, required_fields(group), lat, lon, month, day, first, last, window
+                )
+
+                fetched = evaluate_variables(group, series["fields"])
+                span = slice(first - start_year, last - start_year + 1)
+                for name in names:
+                    values[name][span] = np.where(np.isnan(fetched[name]), values[name][span], fetched[name])
+                if series["actual_lat"] is not None:
+                    actual_lat, actual_lon = series["actual_lat"], series["actual_lon"]
+
+                tile = series.get("tile")
+                if tile is not None:
+                    harvested = evaluate_variables(group, tile["fields"])
+                    for name, tile_values in harvested.items():
+                        self.point_store.put_tile_values(
+                            name, day_index, np.arange(first, last + 1),
+                            tile["lat_start"], tile["lon_start"], tile_values
+                        )
+
+            return {
+                name: YearSeries(
+                    years=years,
+                    values=values[name],
+                    actual_lat=actual_lat,
+                    actual_lon=actual_lon,
+                    collection=collection.short_name
+                )
+                for name in names
+            }
+
+        results = {}
+        for group_result in await asyncio.gather(*[
+            fetch_group(collection, group)
+            for collection, group in _group_by_collection(variables).items()
+        ]):
+            results.update(group_result)
+
+        for variable, series in results.items():
+            if series.missing.any():
+                logger.warning(f"Missing {variable} data for years: {series.missing_years()}")
+
+        return results
+
+    async def fetch_variable_data(
         self,
+        variable: str,
         lat: float,
         lon: float,
         month: int,
         day: int,
         start_year: int,
         end_year: int
-    ) -> Dict:
+    ) -> YearSeries:
         """
-        Fetch temperature data from MERRA-2 daily dataset using parallel requests
+        Fetch multi-year data for a single variable
 
         Args:
+            variable: Variable name (see the registry)
             lat: Latitude
             lon: Longitude
             month: Month (1-12)
@@ -93,387 +273,751 @@ class EarthdataService:
             end_year: End year
 
         Returns:
-            Dict with values, years, actual_lat, actual_lon, missing_years
+            YearSeries over start_year..end_year
         """
-        import asyncio
-
-        values = []
-        years = []
-        actual_lat = None
-        actual_lon = None
-        missing_years = []
+        results = await self.fetch_variables_data([variable], lat, lon, month, day, start_year, end_year)
+        return results[get_variable(variable).name]
 
-        # Fetch all years in parallel
-        year_range = list(range(start_year, end_year + 1))
-        tasks = [
-            self._fetch_temperature_single_year(lat, lon, month, day, year)
-            for year in year_range
-        ]
+    async def _fetch_collection_fields(
+        self,
+        collection: Collection,
+        fields: List[str],
+        lat: float,
+        lon: float,
+        month: int,
+        day: int,
+        start_year: int,
+        end_year: int,
+        window: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
+    ) -> Dict:
+        """
+        Fetch raw fields of one collection for a calendar day across years
 
-        results = await asyncio.gather(*tasks)
+        Uses the chunk reference index when enabled, falling back to
+        reading each year's granule in parallel.
 
-        # Process results
-        for year, result in zip(year_range, results):
-            if result is not None:
-                values.append(result["temp_c"])
-                years.append(year)
-                if actual_lat is None:
-                    actual_lat = result["actual_lat"]
-                    actual_lon = result["actual_lon"]
-            else:
-                missing_years.append(year)
+        Args:
+            window: Grid index ranges (lat, lon) of a tile holding the cell
+                to read along, from the chunks that are decoded anyway
 
-        if missing_years:
-            logger.warning(f"Missing temperature data for years: {missing_years}")
+        Returns:
+            Dict with fields (name -> array over start_year..end_year, NaN
+            for missing years), actual_lat, actual_lon, and tile when a
+            window is given: fields (name -> (year, lat, lon) array),
+            lat_start, lon_start
+        """
+        if self.chunk_index is not None:
+            try:
+                # Chunk reads of all years hold one scheduler turn; they open no granules
+                async with self.scheduler.slot():
+                    return await self.fetch_policy.run(
+                        collection.short_name, self._read_indexed_fields,
+                        collection, fields, lat, lon, month, day, start_year, end_year, window,
+                        timeout=MULTI_GRANULE_TIMEOUT_SECONDS, hedge=False
+                    )
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning(f"Indexed read of {collection.short_name} failed, falling back to per-year reads: {e}")
 
-        return {
-            "values": values,
-            "years": years,
-            "actual_lat": actual_lat,
-            "actual_lon": actual_lon,
-            "missing_years": missing_years
+        year_range = list(range(start_year, end_year + 1))
+        results = await asyncio.gather(*[
+            self._fetch_fields_single_year(collection, fields, lat, lon, month, day, year, window)
+            for year in year_range
+        ])
+
+        found = [result for result in results if result is not None]
+        combined = {
+            "fields": {
+                name: np.array([
+                    result["fields"][name] if result is not None else np.nan for result in results
+                ], dtype=float)
+                for name in fields
+            },
+            "actual_lat": found[0]["actual_lat"] if found else None,
+            "actual_lon": found[0]["actual_lon"] if found else None
         }
-
-    async def _fetch_precipitation_single_year(
+        if window is not None:
+            (lat_start, lat_stop), (lon_start, lon_stop) = window
+            tile_fields = {}
+            for name in fields:
+                stack = np.full((len(year_range), lat_stop - lat_start, lon_stop - lon_start), np.nan)
+                for i, result in enumerate(results):
+                    if result is not None:
+                        stack[i] = result["tile"][name]
+                tile_fields[name] = stack
+            combined["tile"] = {"fields": tile_fields, "lat_start": lat_start, "lon_start": lon_start}
+        return combined
+
+    async def _fetch_fields_single_year(
         self,
+        collection: Collection,
+        fields: List[str],
         lat: float,
         lon: float,
         month: int,
         day: int,
-        year: int
+        year: int,
+        window: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
     ) -> Optional[Dict]:
-        """Fetch precipitation data for a single year"""
-        try:
-            date_str = f"{year}-{month:02d}-{day:02d}"
-            logger.info(f"Fetching precipitation for {date_str}")
-
-            search_results = earthaccess.search_data(
-                short_name="GPM_3IMERGDF",
-                version="07",
-                temporal=(date_str, date_str),
-            )
-
-            if len(search_results) > 0:
-                files = earthaccess.open(search_results)
-                with xr.open_dataset(files[0]) as ds:
-                    precip_data = ds['precipitation'].sel(lat=lat, lon=lon, method='nearest')
-                    actual_lat = float(precip_data.lat.values)
-                    actual_lon = float(precip_data.lon.values)
-
-                    precip_values = precip_data.values
-                    if len(precip_values) == 0:
-                        logger.warning(f"Empty data array for {date_str}")
-                        return None
-
-                    precip_mm = float(precip_values[0])
-
-                    logger.info(f"Fetched precipitation for {year}: {precip_mm:.2f}mm")
-                    return {
-                        "precip_mm": precip_mm,
-                        "actual_lat": actual_lat,
-                        "actual_lon": actual_lon
-                    }
-            else:
-                logger.warning(f"No precipitation data found for {date_str}")
+        """
+        Run a single-year read under the fetch scheduler, the granule budget and the fetch policy.
+        Errors left after retries are logged and reported as a missing year;
+        an open circuit is raised so the whole request fails fast.
+        """
+        async with self._fetch_slot():
+            try:
+                return await self.fetch_policy.run(
+                    collection.short_name, self._read_fields_single_year,
+                    collection, fields, lat, lon, month, day, year, window
+                )
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.error("Error fetching %s for %s: %r", collection.short_name, year, e, extra=PER_YEAR)
                 return None
 
-        except Exception as e:
-            logger.error(f"Error fetching precipitation for {year}: {e}")
-            return None
-
-    async def _fetch_wind_single_year(
+    def _read_fields_single_year(
         self,
+        collection: Collection,
+        fields: List[str],
         lat: float,
         lon: float,
         month: int,
         day: int,
-        year: int
+        year: int,
+        window: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
     ) -> Optional[Dict]:
-        """Fetch wind speed data for a single year"""
-        import numpy as np
-
-        try:
-            date_str = f"{year}-{month:02d}-{day:02d}"
-            logger.info(f"Fetching wind data for {date_str}")
-
-            search_results = earthaccess.search_data(
-                short_name="M2T1NXSLV",
-                version="5.12.4",
-                temporal=(date_str, date_str),
-            )
-
-            if len(search_results) > 0:
-                files = earthaccess.open(search_results)
-                with xr.open_dataset(files[0]) as ds:
-                    u_wind = ds['U2M'].isel(time=12).sel(lat=lat, lon=lon, method='nearest')
-                    v_wind = ds['V2M'].isel(time=12).sel(lat=lat, lon=lon, method='nearest')
-
-                    actual_lat = float(u_wind.lat.values)
-                    actual_lon = float(u_wind.lon.values)
-
-                    wind_speed_midday = np.sqrt(u_wind**2 + v_wind**2)
-
-                    if wind_speed_midday.size == 0:
-                        logger.warning(f"Empty wind data for {date_str}")
-                        return None
+        """
+        Blocking read of raw fields from one year's granule; raises on fetch errors.
+        With a window, the tile around the cell is read in the same pass
+        and returned as tile (name -> (lat, lon) array).
+        """
+        date_str = f"{year}-{month:02d}-{day:02d}"
+        logger.info("Fetching %s %s for %s", collection.short_name, fields, date_str, extra=PER_YEAR)
 
-                    wind_speed_daily = float(wind_speed_midday.values)
+        granule = self._search_day(collection, date_str)
+        if granule is None:
+            return None
 
-                    logger.info(f"Fetched wind speed for {year}: {wind_speed_daily:.2f} m/s")
-                    return {
-                        "wind_speed": wind_speed_daily,
-                        "actual_lat": actual_lat,
-                        "actual_lon": actual_lon
-                    }
-            else:
-                logger.warning(f"No wind data found for {date_str}")
-                return None
+        source = self._granule_source(granule)
+        lat_idx, lon_idx, _, _ = collection.grid.snap(lat, lon)
+        tile = None
+        if window is None:
+            point = read_granule_point(source, fields, lat_idx, lon_idx)
+        else:
+            tile = read_granule_window(source, fields, *window)
+            point = tile.isel(lat=lat_idx - window[0][0], lon=lon_idx - window[1][0])
+        if point.sizes.get("time", 0) == 0:
+            logger.warning("Empty data array for %s", date_str, extra=PER_YEAR)
+            return None
 
-        except Exception as e:
-            logger.error(f"Error fetching wind data for {year}: {e}")
+        step = collection.hour if collection.hour is not None else 0
+        point = point.isel(time=step)
+        result = {
+            "fields": {name: float(point[name].values) for name in fields},
+            "actual_lat": float(point.lat.values),
+            "actual_lon": float(point.lon.values)
+        }
+        if tile is not None:
+            result["tile"] = {name: tile[name].values[step] for name in fields}
+        return result
+
+    def _search(self, collection: Collection, start_date: str, end_date: str) -> List:
+        """Granules of a collection covering a date range, through the search cache when enabled"""
+        if self.searches is not None:
+            cached = self.searches.get(collection.short_name, collection.version, start_date, end_date)
+            if cached is not None:
+                return cached
+        granules = list(earthaccess.search_data(
+            short_name=collection.short_name,
+            version=collection.version,
+            temporal=(start_date, end_date),
+        ))
+        if self.searches is not None:
+            self.searches.put(collection.short_name, collection.version, start_date, end_date, granules)
+        return granules
+
+    def _search_day(self, collection: Collection, date_str: str):
+        """Find the granule of a collection covering a date, or None if there is none"""
+        search_results = self._search(collection, date_str, date_str)
+        if len(search_results) == 0:
+            logger.warning("No %s data found for %s", collection.short_name, date_str, extra=PER_YEAR)
             return None
+        return search_results[0]
 
-    async def _fetch_humidity_single_year(
+    async def fetch_global_fields(
         self,
-        lat: float,
-        lon: float,
+        collection: Collection,
+        fields: List[str],
         month: int,
         day: int,
         year: int
     ) -> Optional[Dict]:
-        """Fetch humidity data for a single year"""
-        import numpy as np
+        """
+        Fetch raw fields of one day over the whole grid, under the fetch policy
 
-        try:
-            date_str = f"{year}-{month:02d}-{day:02d}"
-            logger.info(f"Fetching humidity data for {date_str}")
+        Used by batch jobs reducing entire grids (see the climatology
+        precompute); a whole-grid read is never hedged, as a duplicate
+        would double the transfer. Its granule budget reservation covers
+        the loaded grid and its float32 copy.
+
+        Returns:
+            Dict with fields (name -> float32 (lat, lon) array), lat and lon
+            coordinates, or None if no granule covers the day
 
-            search_results = earthaccess.search_data(
-                short_name="M2T1NXSLV",
-                version="5.12.4",
-                temporal=(date_str, date_str),
+        Raises:
+            Exception: Errors left after retries, including CircuitOpenError
+        """
+        grid = collection.grid
+        async with self._fetch_slot(len(fields) * grid.lat_count * grid.lon_count * 12):
+            return await self.fetch_policy.run(
+                collection.short_name, self._read_global_fields,
+                collection, fields, month, day, year,
+                timeout=MULTI_GRANULE_TIMEOUT_SECONDS, hedge=False
             )
 
-            if len(search_results) > 0:
-                files = earthaccess.open(search_results)
-                with xr.open_dataset(files[0]) as ds:
-                    qv = ds['QV2M'].isel(time=12).sel(lat=lat, lon=lon, method='nearest')
-                    temp_k = ds['T2M'].isel(time=12).sel(lat=lat, lon=lon, method='nearest')
-                    pressure = ds['PS'].isel(time=12).sel(lat=lat, lon=lon, method='nearest')
-
-                    actual_lat = float(qv.lat.values)
-                    actual_lon = float(qv.lon.values)
-
-                    if qv.size == 0:
-                        logger.warning(f"Empty humidity data for {date_str}")
-                        return None
-
-                    temp_c = temp_k - 273.15
-                    es = 611.2 * np.exp(17.67 * temp_c / (temp_k - 29.65))
-                    rh_midday = 100.0 * (qv * pressure) / (0.622 * es)
-                    rh_midday = np.clip(rh_midday, 0, 100)
-                    rh_daily = float(rh_midday.values)
-
-                    logger.info(f"Fetched humidity for {year}: {rh_daily:.2f}%")
-                    return {
-                        "humidity": rh_daily,
-                        "actual_lat": actual_lat,
-                        "actual_lon": actual_lon
-                    }
-            else:
-                logger.warning(f"No humidity data found for {date_str}")
-                return None
+    def _read_global_fields(
+        self,
+        collection: Collection,
+        fields: List[str],
+        month: int,
+        day: int,
+        year: int
+    ) -> Optional[Dict]:
+        """Blocking read of raw fields of one day over the whole grid"""
+        date_str = f"{year}-{month:02d}-{day:02d}"
+        logger.info("Fetching global %s %s for %s", collection.short_name, fields, date_str, extra=PER_YEAR)
 
-        except Exception as e:
-            logger.error(f"Error fetching humidity data for {year}: {e}")
+        granule = self._search_day(collection, date_str)
+        if granule is None:
             return None
 
-    async def fetch_precipitation_data(
+        with self._open_granule(granule) as ds:
+            grid = ds[fields]
+            if grid.sizes.get("time", 0) == 0:
+                logger.warning("Empty data array for %s", date_str, extra=PER_YEAR)
+                return None
+
+            grid = grid.isel(time=collection.hour if collection.hour is not None else 0)
+            # IMERG stores (lon, lat); every grid is returned as (lat, lon)
+            grid = grid.transpose("lat", "lon").load()
+            return {
+                "fields": {name: grid[name].values.astype(np.float32) for name in fields},
+                "lat": grid.lat.values,
+                "lon": grid.lon.values
+            }
+
+    def _read_range(self, url: str, offset: int, size: int) -> bytes:
+        """Read a byte range of a granule, locally if it is in the granule cache"""
+        if self.granule_cache is not None:
+            path = os.path.join(self.granule_cache.cache_dir, os.path.basename(url))
+            try:
+                with open(path, "rb") as f:
+                    return os.pread(f.fileno(), size, offset)
+            except FileNotFoundError:
+                pass
+
+        if self.range_client is not None:
+            return self.range_client.read_range(url, offset, offset + size)
+        if self._https_session is None:
+            self._https_session = earthaccess.get_fsspec_https_session()
+        return self._https_session.cat_file(url, start=offset, end=offset + size)
+
+    def _granule_references(self, granule, collection: Collection) -> Dict:
+        """
+        Load the chunk references of a granule, building and persisting them on first use.
+        Every registry field of the collection is indexed, so one reference file serves all variables.
+        """
+        fields = collection_fields(collection)
+        filename = granule_filename(granule)
+        refs = self.chunk_index.get(filename, fields)
+        if refs is not None:
+            return refs
+
+        logger.info("Building chunk index for %s", filename, extra=PER_YEAR)
+        source = self.granule_cache.get(granule) if self.granule_cache is not None else None
+        if source is None:
+            source = self._remote_file(granule)
+
+        refs = build_references(source, granule.data_links()[0], fields)
+        self.chunk_index.put(filename, fields, refs)
+        return refs
+
+    def _read_indexed_fields(
         self,
+        collection: Collection,
+        fields: List[str],
         lat: float,
         lon: float,
         month: int,
         day: int,
         start_year: int,
-        end_year: int
+        end_year: int,
+        window: Optional[Tuple[Tuple[int, int], Tuple[int, int]]] = None
     ) -> Dict:
         """
-        Fetch precipitation data from GPM IMERG using parallel requests
+        Read raw fields for one calendar day across all years through the chunk reference index
+
+        The granules of every year are opened as one virtual dataset with a
+        time dimension, and the point is extracted with a single vectorized
+        selection whose chunk reads run concurrently. With a window, the
+        tile around the point is sliced from the same chunks.
+        """
+        year_range = list(range(start_year, end_year + 1))
+
+        def search(year):
+            date_str = f"{year}-{month:02d}-{day:02d}"
+            try:
+                results = self._search(collection, date_str, date_str)
+            except Exception as e:
+                logger.error("Error searching %s granule for %s: %s", collection.short_name, date_str, e, extra=PER_YEAR)
+                return None
+            return results[0] if len(results) > 0 else None
+
+        granules = list(self._chunk_executor.map(search, year_range))
+        found = [granule for granule in granules if granule is not None]
+        if not found:
+            return {
+                "fields": {name: np.full(len(year_range), np.nan) for name in fields},
+                "actual_lat": None,
+                "actual_lon": None
+            }
+
+        refs = [self._granule_references(granule, collection) for granule in found]
+        ds = open_virtual_dataset(refs, fields, self._read_range, self._chunk_executor)
+
+        mask = (ds.time.dt.month == month) & (ds.time.dt.day == day)
+        if collection.hour is not None:
+            mask &= ds.time.dt.hour == collection.hour
+        steps = np.nonzero(mask.values)[0]
+
+        lat_idx, lon_idx, _, _ = collection.grid.snap(lat, lon)
+        tile = None
+        if window is None:
+            point = ds.isel(time=steps, lat=lat_idx, lon=lon_idx).load()
+        else:
+            (lat_start, lat_stop), (lon_start, lon_stop) = window
+            tile = ds.isel(time=steps, lat=slice(lat_start, lat_stop), lon=slice(lon_start, lon_stop))
+            tile = tile.transpose("time", "lat", "lon").load()
+            point = tile.isel(lat=lat_idx - lat_start, lon=lon_idx - lon_start)
+
+        # Scatter the found years into arrays over the whole range
+        positions = point.time.dt.year.values - start_year
+        logger.info(f"Fetched {collection.short_name} for {len(positions)} years through the chunk index")
+
+        values = {}
+        for name in fields:
+            values[name] = np.full(len(year_range), np.nan)
+            values[name][positions] = point[name].values
+        result = {
+            "fields": values,
+            "actual_lat": float(point.lat.values),
+            "actual_lon": float(point.lon.values)
+        }
+        if tile is not None:
+            tile_fields = {}
+            for name in fields:
+                tile_fields[name] = np.full((len(year_range),) + tile[name].shape[1:], np.nan)
+                tile_fields[name][positions] = tile[name].values
+            result["tile"] = {"fields": tile_fields, "lat_start": lat_start, "lon_start": lon_start}
+        return result
+
+    async def fetch_variable_single_year(
+        self,
+        variable: str,
+        lat: float,
+        lon: float,
+        month: int,
+        day: int,
+        year: int
+    ) -> Optional[Dict]:
+        """
+        Fetch a single year of any supported variable
 
         Args:
+            variable: Variable name (see the registry)
             lat: Latitude
             lon: Longitude
             month: Month (1-12)
             day: Day of month (1-31)
-            start_year: Start year
-            end_year: End year
+            year: Year to fetch
 
         Returns:
-            Dict with values, years, actual_lat, actual_lon, missing_years
+            Dict with value, actual_lat, actual_lon, or None if no data was found
         """
-        import asyncio
+        specs = resolve_variables([variable])
+        collection = specs[-1].collection
+        result = await self._fetch_fields_single_year(
+            collection, required_fields(specs), lat, lon, month, day, year
+        )
+        if result is None:
+            return None
 
-        values = []
-        years = []
-        actual_lat = None
-        actual_lon = None
-        missing_years = []
+        fields = {name: np.float64(value) for name, value in result["fields"].items()}
+        value = float(evaluate_variables(specs, fields)[specs[-1].name])
+        if np.isnan(value):
+            return None
 
-        # Fetch all years in parallel
-        year_range = list(range(start_year, end_year + 1))
-        tasks = [
-            self._fetch_precipitation_single_year(lat, lon, month, day, year)
-            for year in year_range
-        ]
+        return {
+            "value": value,
+            "actual_lat": result["actual_lat"],
+            "actual_lon": result["actual_lon"]
+        }
 
-        results = await asyncio.gather(*tasks)
+    async def fetch_variables_year_series(
+        self,
+        variables: Sequence[str],
+        lat: float,
+        lon: float,
+        year: int
+    ) -> Dict[str, Dict]:
+        """
+        Fetch every day of a year at one location in a single time-contiguous read per collection
 
-        # Process results
-        for year, result in zip(year_range, results):
-            if result is not None:
-                values.append(result["precip_mm"])
-                years.append(year)
-                if actual_lat is None:
-                    actual_lat = result["actual_lat"]
-                    actual_lon = result["actual_lon"]
-            else:
-                missing_years.append(year)
+        The granules of the year are found with one search and streamed
+        through the granule budget, each reduced to the requested cell and
+        closed right away (see _stream_point_fields). Variables are resolved
+        with their dependencies, and the series of every resolved variable
+        is returned so callers can cache base and derived series together.
 
-        if missing_years:
-            logger.warning(f"Missing precipitation data for years: {missing_years}")
+        Args:
+            variables: Variable names (see the registry)
+            lat: Latitude
+            lon: Longitude
+            year: Year to fetch
 
-        return {
-            "values": values,
-            "years": years,
-            "actual_lat": actual_lat,
-            "actual_lon": actual_lon,
-            "missing_years": missing_years
-        }
+        Returns:
+            Mapping of each resolved variable to a dict with values (float32
+            array of 366 days indexed by day_of_year_index, NaN where
+            missing), actual_lat, actual_lon; collections without granules
+            are left out
+        """
+        async def fetch_group(collection: Collection, group: List[VariableSpec]) -> Dict[str, Dict]:
+            result = await self._fetch_year_fields(collection, required_fields(group), lat, lon, year)
+            if result is None:
+                return {}
+
+            return {
+                name: {
+                    "values": values.astype(np.float32),
+                    "actual_lat": result["actual_lat"],
+                    "actual_lon": result["actual_lon"]
+                }
+                for name, values in evaluate_variables(group, result["fields"]).items()
+            }
+
+        results = {}
+        for group_result in await asyncio.gather(*[
+            fetch_group(collection, group)
+            for collection, group in _group_by_collection(variables).items()
+        ]):
+            results.update(group_result)
+        return results
+
+    async def fetch_variable_year_series(
+        self,
+        variable: str,
+        lat: float,
+        lon: float,
+        year: int
+    ) -> Optional[Dict]:
+        """
+        Fetch every day of a year of one variable at one location
 
-    async def fetch_wind_data(
+        Returns:
+            Dict with values, actual_lat, actual_lon (see
+            fetch_variables_year_series), or None if no granules were found
+        """
+        results = await self.fetch_variables_year_series([variable], lat, lon, year)
+        return results.get(get_variable(variable).name)
+
+    async def fetch_variables_period(
         self,
+        variables: Sequence[str],
         lat: float,
         lon: float,
-        month: int,
-        day: int,
+        start_date: str,
+        end_date: str
+    ) -> Dict[str, Dict]:
+        """
+        Fetch every day of a contiguous date range at one location in a single read per collection
+
+        Like fetch_variables_year_series over an arbitrary range: one search
+        per collection, its granules streamed concurrently through the fetch
+        scheduler and granule budget (see _stream_point_fields).
+
+        Args:
+            variables: Variable names (see the registry)
+            lat: Latitude
+            lon: Longitude
+            start_date: First day, YYYY-MM-DD
+            end_date: Last day, YYYY-MM-DD
+
+        Returns:
+            Mapping of each resolved variable to a dict with years and
+            day_indices (see day_of_year_index) of the days read, values
+            (float32, NaN where missing), actual_lat, actual_lon; collections
+            without granules are left out
+        """
+        async def fetch_group(collection: Collection, group: List[VariableSpec]) -> Dict[str, Dict]:
+            result = await self._stream_point_fields(collection, required_fields(group), lat, lon, start_date, end_date)
+            if result is None:
+                return {}
+
+            day_indices = day_of_year_indices(result["months"], result["days"])
+            return {
+                name: {
+                    "years": result["years"],
+                    "day_indices": day_indices,
+                    "values": values.astype(np.float32),
+                    "actual_lat": result["actual_lat"],
+                    "actual_lon": result["actual_lon"]
+                }
+                for name, values in evaluate_variables(group, result["fields"]).items()
+            }
+
+        results = {}
+        for group_result in await asyncio.gather(*[
+            fetch_group(collection, group)
+            for collection, group in _group_by_collection(variables).items()
+        ]):
+            results.update(group_result)
+        return results
+
+    async def fetch_variables_seasonal(
+        self,
+        variables: Sequence[str],
+        lat: float,
+        lon: float,
+        months: Sequence[int],
         start_year: int,
         end_year: int
-    ) -> Dict:
+    ) -> Dict[str, Dict]:
         """
-        Fetch wind speed data from MERRA-2 hourly dataset using parallel requests
-        Computes daily mean wind speed from hourly U2M and V2M components
+        Fetch the seasonal mean of several variables for each year
+
+        A seasonal mean only needs monthly data, so variables are read from
+        the monthly-mean collections, one granule per month instead of one
+        per day. Values are averaged over the season weighted by the days
+        of each month. Only variables with a monthly product (see
+        MONTHLY_VARIABLES in the registry) can be averaged this way.
 
         Args:
+            variables: Variable names (see the registry)
             lat: Latitude
             lon: Longitude
-            month: Month (1-12)
-            day: Day of month (1-31)
-            start_year: Start year
-            end_year: End year
+            months: Months of the season in order, e.g. [12, 1, 2]
+            start_year: First season year
+            end_year: Last season year
 
         Returns:
-            Dict with values, years, actual_lat, actual_lon, missing_years
+            Mapping of variable to its YearSeries of season means over start_year..end_year
+
+        Raises:
+            ValueError: If a variable has no monthly product
+        """
+        requested = {get_variable(variable).name for variable in variables}
+        unsupported = sorted(requested - set(PRODUCTS["monthly"]))
+        if unsupported:
+            raise ValueError(
+                f"Seasonal means are available for {', '.join(PRODUCTS['monthly'])}; "
+                f"not for {', '.join(unsupported)}"
+            )
+        offsets = season_year_offsets(months)
+        year_range = list(range(start_year, end_year + 1))
+
+        async def fetch_group(collection: Collection, group: List[VariableSpec]) -> Dict[str, YearSeries]:
+            result = await self._stream_point_fields(
+                collection, required_fields(group), lat, lon,
+                f"{start_year + min(offsets.values())}-01-01", f"{end_year}-12-31", months=set(offsets)
+            )
+            if result is None:
+                return {
+                    spec.name: YearSeries.empty(start_year, end_year, collection.short_name)
+                    for spec in group if spec.name in requested
+                }
+
+            time_years, time_months = result["years"], result["months"]
+            in_season = np.isin(time_months, list(offsets))
+            season_years = time_years - np.array([offsets.get(m, 0) for m in time_months], dtype=int)
+            weights = np.array([monthrange(y, m)[1] for y, m in zip(time_years, time_months)], dtype=float)
+
+            values = evaluate_variables(group, result["fields"])
+
+            seasonal = {}
+            for name in requested & set(values):
+                means = np.full(len(year_range), np.nan)
+                for i, year in enumerate(year_range):
+                    steps = in_season & (season_years == year) & ~np.isnan(values[name])
+                    # A season mean needs every one of its months
+                    if set(time_months[steps].tolist()) == set(offsets):
+                        means[i] = np.average(values[name][steps], weights=weights[steps])
+                seasonal[name] = YearSeries(
+                    years=year_range,
+                    values=means,
+                    actual_lat=result["actual_lat"],
+                    actual_lon=result["actual_lon"],
+                    collection=collection.short_name
+                )
+            return seasonal
+
+        results = {}
+        for group_result in await asyncio.gather(*[
+            fetch_group(collection, group)
+            for collection, group in _group_by_collection(variables, "monthly").items()
+        ]):
+            results.update(group_result)
+
+        for variable, series in results.items():
+            if series.missing.any():
+                logger.warning(f"Missing seasonal {variable} data for years: {series.missing_years()}")
+
+        return results
+
+    async def _stream_point_fields(
+        self,
+        collection: Collection,
+        fields: List[str],
+        lat: float,
+        lon: float,
+        start_date: str,
+        end_date: str,
+        months: Optional[Iterable[int]] = None
+    ) -> Optional[Dict]:
         """
-        import asyncio
+        Read raw fields at one location from every granule of a period, one granule at a time
 
-        values = []
-        years = []
-        actual_lat = None
-        actual_lon = None
-        missing_years = []
+        The granules are found with a single search; each one is then read
+        under its own fetch slot (a scheduler turn and a granule budget
+        reservation) and fetch policy run: opened with only the requested
+        fields, reduced to the cell and closed before its slot is handed on. A read over decades therefore holds at most
+        GRANULE_MAX_OPEN granules open, and the budget is shared with every
+        other query and job of the process. A granule still failing after
+        retries leaves its time steps missing; an open circuit fails the read.
 
-        # Fetch all years in parallel
-        year_range = list(range(start_year, end_year + 1))
-        tasks = [
-            self._fetch_wind_single_year(lat, lon, month, day, year)
-            for year in year_range
-        ]
+        Args:
+            months: Months to read; granules beginning in other months are
+                dropped from the search result before any is opened
 
-        results = await asyncio.gather(*tasks)
+        Returns:
+            Dict with fields (name -> array over time steps), the years,
+            months and days of the time steps in time order, actual_lat,
+            actual_lon, or None if no granules were found
+        """
+        logger.info("Fetching %s %s for %s to %s", collection.short_name, fields, start_date, end_date, extra=PER_YEAR)
+
+        granules = await self.fetch_policy.run(
+            collection.short_name, self._search_period, collection, start_date, end_date
+        )
+        if months is not None:
+            # Granules without temporal metadata are kept; their steps are filtered after reading
+            keep = {None, *months}
+            granules = [granule for granule in granules if granule_month(granule) in keep]
+        if not granules:
+            return None
 
-        # Process results
-        for year, result in zip(year_range, results):
-            if result is not None:
-                values.append(result["wind_speed"])
-                years.append(year)
-                if actual_lat is None:
-                    actual_lat = result["actual_lat"]
-                    actual_lon = result["actual_lon"]
-            else:
-                missing_years.append(year)
+        async def read(granule) -> Optional[Dict]:
+            async with self._fetch_slot():
+                try:
+                    return await self.fetch_policy.run(
+                        collection.short_name, self._read_granule_point, collection, fields, lat, lon, granule
+                    )
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    logger.error("Error reading %s granule %s: %r", collection.short_name,
+                                 granule_filename(granule), e, extra=PER_YEAR)
+                    return None
+
+        parts = [part for part in await asyncio.gather(*[read(granule) for granule in granules]) if part is not None]
+        if not parts:
+            return None
+
+        order = np.argsort(np.concatenate([part["times"] for part in parts]), kind="stable")
 
-        if missing_years:
-            logger.warning(f"Missing wind data for years: {missing_years}")
+        def joined(values: List[np.ndarray]) -> np.ndarray:
+            return np.concatenate(values)[order]
 
+        logger.info("Fetched %s for %s to %s: %d time steps from %d granules", collection.short_name,
+                    start_date, end_date, len(order), len(parts), extra=PER_YEAR)
         return {
-            "values": values,
-            "years": years,
-            "actual_lat": actual_lat,
-            "actual_lon": actual_lon,
-            "missing_years": missing_years
+            "fields": {name: joined([part["fields"][name] for part in parts]) for name in fields},
+            "years": joined([part["years"] for part in parts]),
+            "months": joined([part["months"] for part in parts]),
+            "days": joined([part["days"] for part in parts]),
+            "actual_lat": parts[0]["actual_lat"],
+            "actual_lon": parts[0]["actual_lon"]
         }
 
-    async def fetch_humidity_data(
+    def _search_period(self, collection: Collection, start_date: str, end_date: str) -> List:
+        """Find the granules of a collection covering a date range"""
+        search_results = self._search(collection, start_date, end_date)
+        if len(search_results) == 0:
+            logger.warning("No %s data found for %s to %s", collection.short_name, start_date, end_date, extra=PER_YEAR)
+        return search_results
+
+    def _read_granule_point(
         self,
+        collection: Collection,
+        fields: List[str],
         lat: float,
         lon: float,
-        month: int,
-        day: int,
-        start_year: int,
-        end_year: int
+        granule
     ) -> Dict:
         """
-        Fetch relative humidity data from MERRA-2 hourly dataset using parallel requests
-        Computes daily mean relative humidity from hourly QV2M (specific humidity)
-
-        Args:
-            lat: Latitude
-            lon: Longitude
-            month: Month (1-12)
-            day: Day of month (1-31)
-            start_year: Start year
-            end_year: End year
-
-        Returns:
-            Dict with values, years, actual_lat, actual_lon, missing_years
+        Blocking read of raw fields at one location from one granule.
+        Cached granules are read locally and the rest streamed, without
+        downloading them into the cache.
         """
-        import asyncio
+        lat_idx, lon_idx, _, _ = collection.grid.snap(lat, lon)
+        point = read_granule_point(self._granule_source(granule, download=False), fields, lat_idx, lon_idx)
+        if collection.hour is not None:
+            point = point.sel(time=point.time.dt.hour == collection.hour)
 
-        values = []
-        years = []
-        actual_lat = None
-        actual_lon = None
-        missing_years = []
+        return {
+            "fields": {name: point[name].values.astype(float) for name in fields},
+            "times": point.time.values,
+            "years": point.time.dt.year.values,
+            "months": point.time.dt.month.values,
+            "days": point.time.dt.day.values,
+            "actual_lat": float(point.lat.values),
+            "actual_lon": float(point.lon.values)
+        }
 
-        # Fetch all years in parallel
-        year_range = list(range(start_year, end_year + 1))
-        tasks = [
-            self._fetch_humidity_single_year(lat, lon, month, day, year)
-            for year in year_range
-        ]
+    async def _fetch_year_fields(
+        self,
+        collection: Collection,
+        fields: List[str],
+        lat: float,
+        lon: float,
+        year: int
+    ) -> Optional[Dict]:
+        """
+        Raw fields for every day of a year at one location
 
-        results = await asyncio.gather(*tasks)
+        Returns:
+            Dict with fields (name -> array of 366 days indexed by
+            day_of_year_index, NaN where missing), actual_lat, actual_lon,
+            or None if no granules were found
+        """
+        result = await self._stream_point_fields(collection, fields, lat, lon, f"{year}-01-01", f"{year}-12-31")
+        if result is None:
+            return None
 
-        # Process results
-        for year, result in zip(year_range, results):
-            if result is not None:
-                values.append(result["humidity"])
-                years.append(year)
-                if actual_lat is None:
-                    actual_lat = result["actual_lat"]
-                    actual_lon = result["actual_lon"]
-            else:
-                missing_years.append(year)
+        in_year = result["years"] == year
+        day_indices = day_of_year_indices(result["months"][in_year], result["days"][in_year])
 
-        if missing_years:
-            logger.warning(f"Missing humidity data for years: {missing_years}")
+        series = {}
+        for name in fields:
+            values = np.full(DAYS_PER_YEAR, np.nan)
+            values[day_indices] = result["fields"][name][in_year]
+            series[name] = values
 
         return {
-            "values": values,
-            "years": years,
-            "actual_lat": actual_lat,
-            "actual_lon": actual_lon,
-            "missing_years": missing_years
+            "fields": series,
+            "actual_lat": result["actual_lat"],
+            "actual_lon": result["actual_lon"]
         }
 
 
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Row-group generators of the streamed exports: daily series, batches of locations, calendars and climatology grids
+"""
+
+import asyncio
+import os
+from collections import deque
+from datetime import date
+from typing import AsyncIterator, Awaitable, Callable, Deque, Iterable, Optional, Tuple, TypeVar
+
+import numpy as np
+import logging
+
+from quadcode.app.models.weather import WeatherQueryRequest, CalendarRequest, Statistics
+from quadcode.app.models.export import SeriesExportRequest, BatchExportRequest
+from quadcode.app.services.earthdata_service import EarthdataService
+from quadcode.app.services.point_store import PointStore
+from quadcode.app.services.climatology import YEAR_LAYER_PREFIX, ClimatologyStore
+from quadcode.app.services.calendar_service import (
+    CALENDAR_MAX_CONCURRENT_YEARS,
+    build_calendar,
+    expected_days,
+    load_year
+)
+from quadcode.app.services.query_service import answer_query
+from quadcode.app.core.cache import TTLCache
+from quadcode.app.core.export import Schema, empty_columns
+from quadcode.app.core.grid import DAYS_PER_YEAR, day_from_index
+from quadcode.app.core.registry import get_variable
+from quadcode.app.core.serialization import Columns
+from quadcode.app.core.utils import threshold_label
+
+logger = logging.getLogger(__name__)
+
+# Row groups computed ahead of the one being sent; bounds export memory
+EXPORT_READ_AHEAD = int(os.getenv("EXPORT_READ_AHEAD", "4"))
+
+# Grid rows per row group of climatology exports
+EXPORT_GRID_BAND_ROWS = int(os.getenv("EXPORT_GRID_BAND_ROWS", "32"))
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Day-of-year slots in calendar order, as (month, day)
+_CALENDAR_DAYS = [day_from_index(index) for index in range(DAYS_PER_YEAR)]
+
+_STATISTICS = [name for name in Statistics.model_fields if name != "trend"]
+
+
+async def ordered(items: Iterable[T], load: Callable[[T], Awaitable[R]], ahead: int) -> AsyncIterator[R]:
+    """
+    Yield load(item) for each item in order, with at most `ahead` loads running.
+    Pending loads are cancelled when the consumer stops early, e.g. on client disconnect.
+    """
+    items = iter(items)
+    done = object()
+    pending: Deque[asyncio.Task] = deque()
+    try:
+        for item in items:
+            pending.append(asyncio.ensure_future(load(item)))
+            if len(pending) >= max(ahead, 1):
+                break
+        while pending:
+            result = await pending.popleft()
+            item = next(items, done)
+            if item is not done:
+                pending.append(asyncio.ensure_future(load(item)))
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def series_schema(request: SeriesExportRequest) -> Schema:
+    """Columns of a series export: the date and one column per variable"""
+    return [("date", "string")] + [(variable.value, "float") for variable in request.variables]
+
+
+async def series_batches(
+    request: SeriesExportRequest,
+    service: EarthdataService,
+    store: PointStore
+) -> AsyncIterator[Columns]:
+    """
+    Daily series of a location, one row group per year.
+
+    Years are read like the calendar reads them: from the point store,
+    fetching only incomplete years from Earthdata and storing them back.
+    Days that cannot hold data (February 29 of common years, the future)
+    are skipped; missing values are null.
+    """
+    lat = request.location.lat
+    lon = request.location.lon
+    variables = [get_variable(variable).name for variable in request.variables]
+    names = [variable.value for variable in request.variables]
+    semaphore = asyncio.Semaphore(CALENDAR_MAX_CONCURRENT_YEARS)
+    years = range(request.historical_years.start_year, request.historical_years.end_year + 1)
+
+    async def load(year: int) -> Tuple[int, dict]:
+        return year, await load_year(service, store, semaphore, variables, lat, lon, year)
+
+    async for year, rows in ordered(years, load, EXPORT_READ_AHEAD):
+        days = np.flatnonzero(expected_days(year))
+        columns = {"date": [date(year, *_CALENDAR_DAYS[index]).isoformat() for index in days]}
+        for name, variable in zip(names, variables):
+            row = rows[variable]
+            if row is None:
+                columns[name] = [None] * len(days)
+            else:
+                values = row[days].astype(np.float64)
+                columns[name] = [None if np.isnan(value) else value for value in values.tolist()]
+        yield columns
+
+
+BATCH_SCHEMA: Schema = [
+    ("location", "int"), ("name", "string"), ("lat", "float"), ("lon", "float"),
+    ("variable", "string"), ("grid_lat", "float"), ("grid_lon", "float"),
+    ("year", "int"), ("value", "float"),
+]
+
+
+async def batch_batches(
+    request: BatchExportRequest,
+    service: EarthdataService,
+    cache: TTLCache,
+    distributions: TTLCache
+) -> AsyncIterator[Columns]:
+    """
+    Per-year values of one day of the year at many locations, one row group per location.
+
+    Every location goes through the /query pipeline and its cache, so
+    exporting locations already queried costs no data I/O. Climatology
+    tiles are not used since they hold no per-year values.
+    """
+    start_year = request.historical_years.start_year
+    end_year = request.historical_years.end_year
+
+    async def load(indexed: Tuple[int, object]):
+        index, location = indexed
+        query = WeatherQueryRequest(
+            location=location,
+            day_of_year=request.day_of_year,
+            historical_years=request.historical_years,
+            variables=request.variables
+        )
+        return index, location, await answer_query(query, start_year, end_year, service, cache, distributions, None)
+
+    async for index, location, response in ordered(enumerate(request.locations), load, EXPORT_READ_AHEAD):
+        columns = empty_columns(BATCH_SCHEMA)
+        for variable, data in response.historical_data.items():
+            point = response.query_info.actual_grid_points[variable]
+            size = len(data.values)
+            columns["location"].extend([index] * size)
+            columns["name"].extend([location.name] * size)
+            columns["lat"].extend([location.lat] * size)
+            columns["lon"].extend([location.lon] * size)
+            columns["variable"].extend([variable] * size)
+            columns["grid_lat"].extend([point.lat] * size)
+            columns["grid_lon"].extend([point.lon] * size)
+            columns["year"].extend(data.years)
+            columns["value"].extend(data.values)
+        yield columns
+
+
+def _calendar_labels(request: CalendarRequest) -> list:
+    return sorted({
+        threshold_label(name, value)[0]
+        for thresholds in (request.thresholds or {}).values()
+        for name, value in thresholds.items()
+    })
+
+
+def calendar_schema(request: CalendarRequest) -> Schema:
+    """Columns of a calendar export, as in the Arrow view of /calendar"""
+    return (
+        [("variable", "string"), ("month", "int"), ("day", "int")]
+        + [(name, "int" if name == "count" else "float") for name in _STATISTICS]
+        + [(f"p_{label}", "float") for label in _calendar_labels(request)]
+    )
+
+
+async def calendar_batches(
+    request: CalendarRequest,
+    service: EarthdataService,
+    store: PointStore
+) -> AsyncIterator[Columns]:
+    """
+    Calendar statistics of a location, one row group per variable.
+
+    The calendar itself is small (366 days per variable); its inputs are
+    read and reduced by build_calendar, year by year from the point store.
+    """
+    response = await build_calendar(
+        request, service, store,
+        request.historical_years.start_year, request.historical_years.end_year
+    )
+    labels = _calendar_labels(request)
+    schema = calendar_schema(request)
+    for variable, data in response.calendar.items():
+        columns = empty_columns(schema)
+        for entry in data.days:
+            columns["variable"].append(variable)
+            columns["month"].append(entry.month)
+            columns["day"].append(entry.day)
+            for name in _STATISTICS:
+                columns[name].append(getattr(entry.statistics, name))
+            for label in labels:
+                columns[f"p_{label}"].append(entry.probabilities.get(label))
+        yield columns
+
+
+async def climatology_table(
+    store: ClimatologyStore,
+    variable: str,
+    start_year: int,
+    end_year: int,
+    day_index: int,
+    lat_range: Tuple[float, float],
+    lon_range: Tuple[float, float]
+) -> Optional[Tuple[Schema, AsyncIterator[Columns]]]:
+    """
+    Precomputed statistics of every grid cell in a bounding box, one row group per band of grid rows
+
+    Only the band being sent is decompressed, so a global export holds a
+    few hundred kilobytes at a time.
+
+    Args:
+        store: Climatology tile store
+        variable: Variable name
+        start_year: First year of the precomputed range
+        end_year: Last year of the precomputed range
+        day_index: Day slot of a 366-day year
+        lat_range: (south, north) bounds
+        lon_range: (west, east) bounds
+
+    Returns:
+        Schema and row groups, or None if the tile is not precomputed
+    """
+    grid = get_variable(variable).collection.grid
+    lat_start, lon_start, _, _ = grid.snap(lat_range[0], lon_range[0])
+    lat_stop, lon_stop, _, _ = grid.snap(lat_range[1], lon_range[1])
+    if lat_stop < lat_start or lon_stop < lon_start:
+        raise ValueError("Bounding box must be given as south <= north and west <= east")
+    lon_slice = slice(lon_start, lon_stop + 1)
+    bands = range(lat_start, lat_stop + 1, EXPORT_GRID_BAND_ROWS)
+
+    def read(band: int):
+        return store.get_window(
+            variable, start_year, end_year, day_index,
+            slice(band, min(band + EXPORT_GRID_BAND_ROWS, lat_stop + 1)), lon_slice
+        )
+
+    first = await asyncio.to_thread(read, bands[0])
+    if first is None:
+        return None
+    header = first[0]
+    # Statistics and probabilities; the per-year value layers are left out
+    layers = [
+        (layer, name) for layer, name in enumerate(header["layers"]) if not name.startswith(YEAR_LAYER_PREFIX)
+    ]
+    schema = [("lat", "float"), ("lon", "float")] + [
+        (name, "int" if name == "count" else "float") for _, name in layers
+    ]
+    lons = np.round(grid.lon_origin + grid.lon_step * np.arange(lon_slice.start, lon_slice.stop), 6)
+
+    async def batches() -> AsyncIterator[Columns]:
+        window = first
+        for position, band in enumerate(bands):
+            if position:
+                window = await asyncio.to_thread(read, band)
+                if window is None:
+                    raise ValueError(f"Climatology tile for {variable} day {day_index} disappeared during export")
+            values = window[1].astype(np.float64)
+            rows = values.shape[1]
+            lats = np.round(grid.lat_origin + grid.lat_step * np.arange(band, band + rows), 6)
+            columns = {
+                "lat": np.repeat(lats, lons.size).tolist(),
+                "lon": np.tile(lons, rows).tolist(),
+            }
+            for layer, name in layers:
+                flat = values[layer].ravel()
+                if name == "count":
+                    columns[name] = flat.astype(np.int64).tolist()
+                else:
+                    columns[name] = [None if np.isnan(value) else value for value in flat.tolist()]
+            yield columns
+
+    return schema, batches()
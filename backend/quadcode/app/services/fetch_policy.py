@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Fetch policy for Earthdata calls: deadlines, retries, hedging and circuit breaking
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a collection's circuit breaker is open and calls fail fast"""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether an error is worth retrying (timeouts, connection and I/O errors)"""
+    if isinstance(exc, (FileNotFoundError, PermissionError, CircuitOpenError)):
+        return False
+    return isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError, OSError))
+
+
+class CircuitBreaker:
+    """
+    Per-collection circuit breaker.
+
+    Opens after a number of consecutive failed calls, rejects calls while
+    open, and lets a single trial call through once the reset timeout has
+    passed.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        """
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_seconds: Time the circuit stays open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state: 'closed', 'open' or 'half_open'"""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may proceed"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_neutral(self) -> None:
+        """End a call that says nothing about upstream health, freeing the trial slot"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class FetchPolicy:
+    """
+    Runs blocking fetch callables in worker threads with a per-call deadline,
+    jittered exponential backoff for transient errors, an optional hedged
+    duplicate for slow calls, and a circuit breaker per collection.
+
+    A call that misses its deadline is abandoned, not interrupted: its worker
+    thread finishes in the background and its result is discarded.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float = 60.0,
+        max_retries: int = 2,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 8.0,
+        hedge_delay_seconds: Optional[float] = 10.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0
+    ):
+        """
+        Args:
+            timeout_seconds: Deadline of a single attempt, hedge included
+            max_retries: Retries after the first attempt for transient errors
+            backoff_base_seconds: Base of the exponential backoff
+            backoff_max_seconds: Upper bound of a single backoff sleep
+            hedge_delay_seconds: Delay before a duplicate request is issued
+                for a slow attempt; None disables hedging
+            failure_threshold: Consecutive failures that open a collection's circuit
+            reset_seconds: Time a circuit stays open before a trial call
+        """
+        self.timeout_seconds = timeout_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def breaker(self, collection: str) -> CircuitBreaker:
+        """Circuit breaker of a collection"""
+        with self._lock:
+            if collection not in self._breakers:
+                self._breakers[collection] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+            return self._breakers[collection]
+
+    def _count(self, collection: str, name: str) -> None:
+        with self._lock:
+            self._counters[collection][name] += 1
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Call, retry, hedge, timeout and failure counters plus breaker state per collection"""
+        with self._lock:
+            collections = set(self._counters) | set(self._breakers)
+            counters = {c: dict(self._counters.get(c, {})) for c in collections}
+        for collection in collections:
+            counters[collection]["circuit"] = self.breaker(collection).state
+        return counters
+
+    async def run(
+        self,
+        collection: str,
+        fn: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        hedge: bool = True
+    ) -> Any:
+        """
+        Run a blocking fetch under the policy
+
+        Args:
+            collection: Collection short name, used for the circuit breaker and counters
+            fn: Blocking callable performing the fetch
+            *args: Arguments passed to fn
+            timeout: Per-attempt deadline overriding the policy default
+            hedge: Whether slow attempts may be hedged with a duplicate call
+
+        Returns:
+            Result of fn
+
+        Raises:
+            CircuitOpenError: If the collection's circuit is open
+            Exception: The last error once retries are exhausted or for non-transient errors
+        """
+        breaker = self.breaker(collection)
+        timeout = timeout if timeout is not None else self.timeout_seconds
+
+        for attempt in range(self.max_retries + 1):
+            # Retries continue the call admitted first, which may be the half-open trial
+            if not (breaker.allow() if attempt == 0 else breaker.state != "open"):
+                self._count(collection, "short_circuits")
+                raise CircuitOpenError(f"Circuit open for {collection}; upstream is unhealthy")
+
+            self._count(collection, "calls")
+            try:
+                result = await self._attempt(collection, fn, args, timeout, hedge)
+            except Exception as e:
+                if isinstance(e, (asyncio.TimeoutError, TimeoutError)):
+                    self._count(collection, "timeouts")
+                self._count(collection, "failures")
+
+                # Only a call whose transient errors outlast its retries counts
+                # against the circuit; other errors (e.g. decoding) are not upstream's
+                if not is_transient(e):
+                    breaker.record_neutral()
+                    raise
+                if attempt == self.max_retries:
+                    breaker.record_failure()
+                    raise
+
+                delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+                self._count(collection, "retries")
+                logger.warning(f"Transient error on {collection} ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            return result
+
+    async def _attempt(self, collection: str, fn: Callable, args: tuple, timeout: float, hedge: bool) -> Any:
+        """One attempt, hedged with a duplicate call if it is slower than the hedge delay"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        def launch():
+            # Carry the request's context (e.g. its correlation ID) into the worker thread
+            context = contextvars.copy_context()
+            future = loop.run_in_executor(None, context.run, fn, *args)
+            # Abandoned futures must not log "exception was never retrieved"
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            return future
+
+        primary = launch()
+        pending = {primary}
+
+        if hedge and self.hedge_delay_seconds is not None and self.hedge_delay_seconds < timeout:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay_seconds)
+            if not done:
+                self._count(collection, "hedges")
+                pending.add(launch())
+
+        error: Optional[BaseException] = None
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count(collection, "hedge_wins")
+                    return future.result()
+                error = future.exception()
+
+        if pending:
+            raise asyncio.TimeoutError(f"{collection} fetch exceeded {timeout:.0f}s deadline")
+        raise error
+
+
+@lru_cache(maxsize=1)
+def get_fetch_policy() -> FetchPolicy:
+    """
+    Get singleton FetchPolicy, configured through FETCH_TIMEOUT_SECONDS,
+    FETCH_MAX_RETRIES, FETCH_BACKOFF_BASE_SECONDS, FETCH_BACKOFF_MAX_SECONDS,
+    FETCH_HEDGE_DELAY_SECONDS (0 disables hedging), BREAKER_FAILURE_THRESHOLD
+    and BREAKER_RESET_SECONDS.
+    """
+    hedge_delay = float(os.getenv("FETCH_HEDGE_DELAY_SECONDS", "10"))
+    return FetchPolicy(
+        timeout_seconds=float(os.getenv("FETCH_TIMEOUT_SECONDS", "60")),
+        max_retries=int(os.getenv("FETCH_MAX_RETRIES", "2")),
+        backoff_base_seconds=float(os.getenv("FETCH_BACKOFF_BASE_SECONDS", "0.5")),
+        backoff_max_seconds=float(os.getenv("FETCH_BACKOFF_MAX_SECONDS", "8")),
+        hedge_delay_seconds=hedge_delay if hedge_delay > 0 else None,
+        failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+        reset_seconds=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+    )
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Fair-share scheduling of granule fetches: priority lanes and weighted fair queuing per client
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from enum import Enum
+from functools import lru_cache
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class FetchLane(str, Enum):
+    """Priority lanes of fetches, highest first"""
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+    PREFETCH = "prefetch"
+
+
+LANE_ORDER = (FetchLane.INTERACTIVE, FetchLane.BATCH, FetchLane.PREFETCH)
+
+# Lane and client the fetches of the current request, job or worker are scheduled under
+fetch_lane: contextvars.ContextVar[FetchLane] = contextvars.ContextVar("fetch_lane", default=FetchLane.INTERACTIVE)
+fetch_client: contextvars.ContextVar[str] = contextvars.ContextVar("fetch_client", default="anonymous")
+
+# Recent waits per lane kept for the wait percentiles
+_WAIT_SAMPLES = 1024
+
+
+@contextmanager
+def fetch_context(lane: Optional[FetchLane] = None, client: Optional[str] = None) -> Iterator[None]:
+    """Schedule the fetches made inside the block under a lane and/or client"""
+    tokens = []
+    if lane is not None:
+        tokens.append((fetch_lane, fetch_lane.set(lane)))
+    if client is not None:
+        tokens.append((fetch_client, fetch_client.set(client)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class _Request:
+    __slots__ = ("client", "start", "finish", "loop", "future", "enqueued", "cancelled", "dispatched")
+
+    def __init__(self, client: str, start: float, finish: float, loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.client = client
+        self.start = start
+        self.finish = finish
+        self.loop = loop
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.cancelled = False
+        self.dispatched = False
+
+
+class _Lane:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.queued = 0
+        self.heap: List[Tuple[float, int, _Request]] = []
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+        self.admitted = 0
+        self.waited = 0
+        self.waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+
+class FetchScheduler:
+    """
+    Central admission of granule fetches in strict lane priority, fair across clients within a lane.
+
+    At most max_active fetches run at once, and at most a lane's limit of
+    them from that lane, so a capped lane leaves capacity to the lanes
+    below it. Freed capacity goes to the highest-priority lane with
+    waiters that is under its limit. Within a lane, clients are served by
+    start-time fair queuing: each fetch is tagged with a virtual finish
+    time advancing by 1/weight per fetch of its client, and the smallest
+    tag goes first, so a client queueing thousands of fetches only delays
+    another client's next fetch by about one fetch per active client.
+
+    Like the granule budget, the scheduler is shared by every event loop
+    of the process, hence the thread lock and thread-safe wake-ups, and
+    waiting happens before the fetch policy starts its deadlines.
+    """
+
+    def __init__(self, max_active: int, lane_limits: Dict[FetchLane, int],
+                 client_weights: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            max_active: Fetches running at once over all lanes
+            lane_limits: Fetches running at once per lane
+            client_weights: Share of each client within its lane; 1 by default
+        """
+        self.max_active = max_active
+        self.client_weights = client_weights or {}
+        self._lanes = {lane: _Lane(lane_limits.get(lane, max_active)) for lane in LANE_ORDER}
+        self._active = 0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _can_start(self, lane: _Lane) -> bool:
+        return self._active < self.max_active and lane.active < lane.limit
+
+    def _admit(self, lane: _Lane, waited: float) -> None:
+        self._active += 1
+        lane.active += 1
+        lane.admitted += 1
+        lane.waits.append(waited)
+
+    def _enqueue(self, lane: _Lane, client: str, loop: asyncio.AbstractEventLoop) -> _Request:
+        start = max(lane.virtual_time, lane.last_finish.get(client, 0.0))
+        finish = start + 1.0 / max(self.client_weights.get(client, 1.0), 1e-6)
+        lane.last_finish[client] = finish
+        request = _Request(client, start, finish, loop, loop.create_future())
+        heapq.heappush(lane.heap, (finish, next(self._sequence), request))
+        lane.queued += 1
+        return request
+
+    def _dispatch(self) -> None:
+        for lane in self._lanes.values():
+            while lane.heap and self._can_start(lane):
+                _, _, request = heapq.heappop(lane.heap)
+                if request.cancelled:
+                    continue
+                request.dispatched = True
+                lane.queued -= 1
+                lane.waited += 1
+                lane.virtual_time = max(lane.virtual_time, request.start)
+                self._admit(lane, time.monotonic() - request.enqueued)
+                request.loop.call_soon_threadsafe(self._grant, lane, request)
+            if not lane.heap and len(lane.last_finish) > _WAIT_SAMPLES:
+                # Forget clients whose tags the lane has caught up with
+                lane.last_finish = {
+                    client: finish for client, finish in lane.last_finish.items() if finish > lane.virtual_time
+                }
+
+    def _release(self, lane: _Lane) -> None:
+        with self._lock:
+            self._active -= 1
+            lane.active -= 1
+            self._dispatch()
+
+    def _grant(self, lane: _Lane, request: _Request) -> None:
+        if request.future.done():
+            # Cancelled while the grant was in flight: give the capacity back
+            self._release(lane)
+        else:
+            request.future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, lane: Optional[FetchLane] = None, client: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Hold one fetch slot for the duration of the block
+
+        Args:
+            lane: Priority lane; defaults to the fetch_lane of the context
+            client: Client the fetch is accounted to; defaults to the fetch_client of the context
+        """
+        state = self._lanes[lane or fetch_lane.get()]
+        client = client or fetch_client.get()
+
+        with self._lock:
+            request = None
+            if not state.heap and self._can_start(state):
+                self._admit(state, 0.0)
+            else:
+                request = self._enqueue(state, client, asyncio.get_running_loop())
+
+        if request is not None:
+            try:
+                await request.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    dispatched = request.dispatched
+                    if not dispatched:
+                        request.cancelled = True
+                        state.queued -= 1
+                if dispatched and request.future.done() and not request.future.cancelled():
+                    # Granted just before the cancellation: _grant will not give the slot back
+                    self._release(state)
+                raise
+
+        try:
+            yield
+        finally:
+            self._release(state)
+
+    def metrics(self) -> Dict:
+        """Running and queued fetches per lane, with wait percentiles over recent admissions"""
+        with self._lock:
+            lanes = {}
+            for name, lane in zip(LANE_ORDER, self._lanes.values()):
+                waits = np.array(lane.waits) if lane.waits else np.zeros(1)
+                lanes[name.value] = {
+                    "active": lane.active,
+                    "limit": lane.limit,
+                    "queued": lane.queued,
+                    "queued_clients": len({entry[2].client for entry in lane.heap if not entry[2].cancelled}),
+                    "admitted": lane.admitted,
+                    "waited": lane.waited,
+                    "wait_p50_seconds": float(np.percentile(waits, 50)),
+                    "wait_p95_seconds": float(np.percentile(waits, 95)),
+                    "wait_max_seconds": float(waits.max()),
+                }
+            return {"active": self._active, "max_active": self.max_active, "lanes": lanes}
+
+
+def parse_lane_limits(spec: str) -> Dict[FetchLane, int]:
+    """Parse lane limits such as "interactive=16,batch=12,prefetch=4" """
+    limits = {}
+    for part in spec.split(","):
+        if part.strip():
+            name, _, value = part.partition("=")
+            limits[FetchLane(name.strip())] = int(value)
+    return limits
+
+
+@lru_cache(maxsize=1)
+def get_fetch_scheduler() -> FetchScheduler:
+    """
+    Get singleton FetchScheduler, configured through FETCH_MAX_ACTIVE,
+    FETCH_LANE_LIMITS and FETCH_CLIENT_WEIGHTS (JSON client -> weight)
+    """
+    return FetchScheduler(
+        max_active=int(os.getenv("FETCH_MAX_ACTIVE", "16")),
+        lane_limits=parse_lane_limits(os.getenv("FETCH_LANE_LIMITS", "interactive=16,batch=12,prefetch=4")),
+        client_weights=json.loads(os.getenv("FETCH_CLIENT_WEIGHTS", "{}")),
+    )
+
+
+# Paths whose fetches run in the batch lane
+BATCH_PATH_PREFIXES = ("/api/v1/export", "/api/v1/jobs")
+
+
+class FetchContextMiddleware:
+    """
+    ASGI middleware scheduling the fetches of each request under its lane and client.
+
+    Exports and job submissions use the batch lane, other requests the
+    interactive one; an X-Fetch-Lane header may lower, never raise, the
+    priority. The client is the X-Client-Id header, or else the peer address.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        lane = FetchLane.BATCH if scope["path"].startswith(BATCH_PATH_PREFIXES) else FetchLane.INTERACTIVE
+        try:
+            requested = FetchLane(headers.get(b"x-fetch-lane", b"").decode("latin-1").strip().lower())
+        except ValueError:
+            requested = lane
+        if LANE_ORDER.index(requested) > LANE_ORDER.index(lane):
+            lane = requested
+
+        client = headers.get(b"x-client-id", b"").decode("latin-1").strip()
+        if not client:
+            client = scope["client"][0] if scope.get("client") else "anonymous"
+
+        with fetch_context(lane, client[:128]):
+            await self.app(scope, receive, send)
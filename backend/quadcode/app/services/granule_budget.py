@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Admission control for granule reads: a limit on open granules and a global memory budget
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Deque, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Waiter:
+    __slots__ = ("nbytes", "loop", "future")
+
+    def __init__(self, nbytes: int, loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.nbytes = nbytes
+        self.loop = loop
+        self.future = future
+
+
+class GranuleBudget:
+    """
+    Process-wide limit on concurrently open granules and the memory reserved for them.
+
+    Every granule read reserves a slot and an estimate of the memory it
+    holds while open; reads that do not fit wait in FIFO order, so a query
+    over many years streams through a bounded number of open granules
+    instead of opening them all at once. A read larger than the whole
+    budget is admitted once nothing else is open.
+
+    Waiting happens before a fetch starts, so queueing time never counts
+    against fetch deadlines or circuit breakers. The budget is shared by
+    every event loop of the process (the API loop and the loops of job
+    worker threads), hence the thread lock and thread-safe wake-ups.
+    """
+
+    def __init__(self, max_open: int, max_bytes: int, granule_bytes: int):
+        """
+        Args:
+            max_open: Granules open at once
+            max_bytes: Memory reserved by open granules at once
+            granule_bytes: Default estimate of the memory of one open granule
+        """
+        self.max_open = max_open
+        self.max_bytes = max_bytes
+        self.granule_bytes = granule_bytes
+
+        self._open = 0
+        self._reserved = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        self._stats = {"admitted": 0, "waited": 0, "wait_seconds": 0.0, "peak_open": 0, "peak_reserved_bytes": 0}
+
+    def _fits(self, nbytes: int) -> bool:
+        if self._open == 0:
+            return True
+        return self._open < self.max_open and self._reserved + nbytes <= self.max_bytes
+
+    def _admit(self, nbytes: int) -> None:
+        self._open += 1
+        self._reserved += nbytes
+        self._stats["admitted"] += 1
+        self._stats["peak_open"] = max(self._stats["peak_open"], self._open)
+        self._stats["peak_reserved_bytes"] = max(self._stats["peak_reserved_bytes"], self._reserved)
+
+    def _release(self, nbytes: int) -> None:
+        with self._lock:
+            self._open -= 1
+            self._reserved -= nbytes
+            # Hand the freed capacity to waiters in arrival order
+            while self._waiters and self._fits(self._waiters[0].nbytes):
+                waiter = self._waiters.popleft()
+                self._admit(waiter.nbytes)
+                waiter.loop.call_soon_threadsafe(self._grant, waiter)
+
+    def _grant(self, waiter: _Waiter) -> None:
+        if waiter.future.done():
+            # Cancelled while the grant was in flight: give the capacity back
+            self._release(waiter.nbytes)
+        else:
+            waiter.future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, nbytes: Optional[int] = None) -> AsyncIterator[None]:
+        """
+        Hold one open-granule slot for the duration of the block
+
+        Args:
+            nbytes: Memory the read holds while open; defaults to granule_bytes
+        """
+        nbytes = min(nbytes if nbytes is not None else self.granule_bytes, self.max_bytes)
+
+        with self._lock:
+            waiter = None
+            if not self._waiters and self._fits(nbytes):
+                self._admit(nbytes)
+            else:
+                loop = asyncio.get_running_loop()
+                waiter = _Waiter(nbytes, loop, loop.create_future())
+                self._waiters.append(waiter)
+
+        if waiter is not None:
+            started = time.monotonic()
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    granted = waiter.future.done() and not waiter.future.cancelled()
+                if granted:
+                    # Granted just before the cancellation: _grant will not give the slot back
+                    self._release(nbytes)
+                raise
+            with self._lock:
+                self._stats["waited"] += 1
+                self._stats["wait_seconds"] += time.monotonic() - started
+
+        try:
+            yield
+        finally:
+            self._release(nbytes)
+
+    def metrics(self) -> Dict:
+        """Open granules, reserved bytes, queue length and admission counters"""
+        with self._lock:
+            return dict(
+                self._stats,
+                open=self._open,
+                max_open=self.max_open,
+                reserved_bytes=self._reserved,
+                max_bytes=self.max_bytes,
+                queued=len(self._waiters),
+            )
+
+
+@lru_cache(maxsize=1)
+def get_granule_budget() -> GranuleBudget:
+    """
+    Get singleton GranuleBudget, configured through GRANULE_MAX_OPEN,
+    GRANULE_MEMORY_BUDGET_BYTES and GRANULE_OPEN_BYTES (the estimate per
+    open granule for point reads)
+    """
+    return GranuleBudget(
+        max_open=int(os.getenv("GRANULE_MAX_OPEN", "16")),
+        max_bytes=int(os.getenv("GRANULE_MEMORY_BUDGET_BYTES", str(1024 ** 3))),
+        granule_bytes=int(os.getenv("GRANULE_OPEN_BYTES", str(48 * 1024 ** 2))),
+    )
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Local on-disk cache of raw Earthdata granule files
+"""
+
+import fcntl
+import mmap
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+import earthaccess
+import h5netcdf
+import xarray as xr
+import logging
+
+from quadcode.app.core.logs import PER_YEAR
+
+logger = logging.getLogger(__name__)
+
+_LOCK_SUFFIX = ".lock"
+_EVICT_LOCK = ".evict.lock"
+
+
+def granule_filename(granule) -> str:
+    """File name of a granule, taken from its first data link"""
+    links = granule.data_links()
+    if not links:
+        raise ValueError("Granule has no data links")
+    return os.path.basename(links[0])
+
+
+def granule_month(granule) -> Optional[int]:
+    """Month a granule's temporal extent begins in, or None if its metadata does not say"""
+    try:
+        begins = granule["umm"]["TemporalExtent"]["RangeDateTime"]["BeginningDateTime"]
+        return int(begins[5:7])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def _flock(path: str, mode: int) -> Iterator[None]:
+    """Hold an fcntl lock on path for the duration of the block"""
+    with open(path, "a") as f:
+        fcntl.flock(f, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class GranuleCache:
+    """
+    Size-bounded LRU cache of downloaded granule files.
+
+    The global MERRA-2 and IMERG granules are the same for every location,
+    so once a granule is on disk, queries for any point on that date are
+    served from local reads. Downloads are written to a temporary file and
+    renamed into place, and per-granule file locks ensure concurrent
+    workers (threads or processes) download each granule only once.
+    Recency is tracked through file modification times. Batch and prefetch
+    work fills the cache; interactive reads use what is there and stream
+    the rest.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        """
+        Args:
+            cache_dir: Directory holding cached granules
+            max_bytes: Total size budget; least recently used files are evicted beyond it
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.cache_dir, filename)
+
+    def get(self, granule) -> Optional[str]:
+        """
+        Return the local path of a cached granule and mark it as recently used
+
+        Returns:
+            Local file path, or None if the granule is not cached
+        """
+        path = self._path(granule_filename(granule))
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def fetch(self, granule) -> str:
+        """
+        Return the local path of a granule, downloading it if needed
+
+        Args:
+            granule: earthaccess search result
+
+        Returns:
+            Local file path
+        """
+        filename = granule_filename(granule)
+        path = self._path(filename)
+
+        with _flock(path + _LOCK_SUFFIX, fcntl.LOCK_EX):
+            if os.path.exists(path):
+                os.utime(path)
+                return path
+
+            download_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".download-")
+            try:
+                logger.info("Downloading granule %s", filename, extra=PER_YEAR)
+                downloaded = earthaccess.download([granule], local_path=download_dir)
+                if not downloaded:
+                    raise IOError(f"Download of granule {filename} failed")
+                os.replace(downloaded[0], path)
+            finally:
+                shutil.rmtree(download_dir, ignore_errors=True)
+
+        self.evict()
+        return path
+
+    def sources(self, granules: List) -> List:
+        """
+        Resolve granules to cached local paths where available and remote
+        file objects otherwise, without downloading anything
+        """
+        local = [self.get(granule) for granule in granules]
+        remote_granules = [granule for granule, path in zip(granules, local) if path is None]
+        remote = iter(earthaccess.open(remote_granules)) if remote_granules else iter(())
+        return [path if path is not None else next(remote) for path in local]
+
+    def size(self) -> int:
+        """Total size in bytes of the cached granules"""
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self) -> List[tuple]:
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.startswith(".") and not entry.name.endswith(_LOCK_SUFFIX):
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self) -> None:
+        """Delete least recently used granules until the cache fits its byte budget"""
+        with _flock(self._path(_EVICT_LOCK), fcntl.LOCK_EX):
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+
+                # Skip granules that are being downloaded right now
+                with open(path + _LOCK_SUFFIX, "a") as lock:
+                    try:
+                        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    try:
+                        os.remove(path)
+                        total -= size
+                        logger.info(f"Evicted granule {os.path.basename(path)}")
+                    except FileNotFoundError:
+                        pass
+                    finally:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextmanager
+def open_granule_dataset(source, **kwargs) -> Iterator[xr.Dataset]:
+    """
+    Open a granule as an xarray Dataset.
+
+    Local paths are memory-mapped so reads go through the page cache without
+    copying the file; remote file objects are opened directly. On POSIX
+    systems a mapped file stays readable even if it is evicted meanwhile.
+
+    Args:
+        source: Local file path or remote file object
+        **kwargs: Extra arguments passed to xr.open_dataset
+    """
+    if not isinstance(source, str):
+        with xr.open_dataset(source, **kwargs) as ds:
+            yield ds
+        return
+
+    with open(source, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            with xr.open_dataset(mapped, engine="h5netcdf", **kwargs) as ds:
+                yield ds
+        finally:
+            mapped.close()
+
+
+def _read_subset(f: h5netcdf.File, fields: List[str], lat, lon) -> xr.Dataset:
+    """
+    Read and CF-decode fields at a grid index or index slice of lat and of
+    lon, reading only the chunks that hold them
+    """
+    cell = {"lat": lat, "lon": lon}
+
+    def read(name: str) -> xr.Variable:
+        variable = f.variables[name]
+        data = variable[tuple(cell.get(dim, slice(None)) for dim in variable.dimensions)]
+        dims = tuple(dim for dim in variable.dimensions if not isinstance(cell.get(dim, slice(None)), int))
+        return xr.Variable(dims, data, dict(variable.attrs))
+
+    raw = xr.Dataset(
+        {name: read(name) for name in fields},
+        coords={"time": read("time"), "lat": read("lat"), "lon": read("lon")}
+    )
+    return xr.decode_cf(raw)
+
+
+def read_granule_point(source, fields: List[str], lat_idx: int, lon_idx: int) -> xr.Dataset:
+    """
+    Read fields at one grid cell from a granule.
+
+    Only the coordinates and the requested fields are opened and decoded,
+    and only the chunks holding the cell are read; xr.open_dataset would
+    build and decode every variable of the granule first, which dominates
+    the cost of a point read. Values are CF-decoded as xr.open_dataset
+    decodes them.
+
+    Args:
+        source: Local file path or remote file object
+        fields: Variables to read
+        lat_idx: Latitude index of the cell, from Grid.snap
+        lon_idx: Longitude index of the cell, from Grid.snap
+
+    Returns:
+        Loaded dataset of the fields over time, with scalar lat and lon coordinates
+    """
+    with h5netcdf.File(source, "r") as f:
+        return _read_subset(f, fields, lat_idx, lon_idx)
+
+
+def read_granule_window(
+    source,
+    fields: List[str],
+    lat_range: Tuple[int, int],
+    lon_range: Tuple[int, int]
+) -> xr.Dataset:
+    """
+    Read fields over a rectangle of grid cells from a granule, like read_granule_point
+
+    Args:
+        source: Local file path or remote file object
+        fields: Variables to read
+        lat_range: Grid latitude indices [start, stop)
+        lon_range: Grid longitude indices [start, stop)
+
+    Returns:
+        Loaded dataset of the fields with dimensions (time, lat, lon)
+    """
+    with h5netcdf.File(source, "r") as f:
+        window = _read_subset(f, fields, slice(*lat_range), slice(*lon_range))
+    return window.transpose("time", "lat", "lon")
+
+
+@lru_cache(maxsize=1)
+def get_granule_cache() -> Optional[GranuleCache]:
+    """
+    Get singleton instance of GranuleCache.
+    Configured through GRANULE_CACHE_DIR and GRANULE_CACHE_MAX_BYTES;
+    a budget of 0 disables the cache.
+    """
+    max_bytes = int(os.getenv("GRANULE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+    if max_bytes <= 0:
+        return None
+
+    cache_dir = os.getenv("GRANULE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "quadcode", "granules"))
+    return GranuleCache(cache_dir, max_bytes)
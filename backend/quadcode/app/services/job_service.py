@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Background jobs for long historical weather queries
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from quadcode.app.models.jobs import JobStatus, JobProgress, JobResponse
+from quadcode.app.models.weather import WeatherQueryRequest, WeatherQueryResponse
+from quadcode.app.services.earthdata_service import EarthdataService, get_earthdata_service
+from quadcode.app.services.fetch_policy import CircuitOpenError, get_fetch_policy
+from quadcode.app.services.fetch_scheduler import FetchLane, fetch_client, fetch_lane
+from quadcode.app.services.query_service import build_weather_response, request_cache_key, store_distributions
+from quadcode.app.core.cache import TTLCache, get_query_cache, get_distribution_cache
+from quadcode.app.core.logs import correlation_id
+from quadcode.app.core.series import YearSeries
+
+logger = logging.getLogger(__name__)
+
+_JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Years fetched together by one job unit, for every variable of the job
+JOB_BLOCK_YEARS = int(os.getenv("JOB_BLOCK_YEARS", "10"))
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobManager:
+    """
+    Runs weather queries on a bounded background worker pool.
+
+    Each job is split into blocks of JOB_BLOCK_YEARS years, each fetched
+    for every variable at once through the multi-year query path, so a job
+    uses the point store, the chunk index and one read per collection like
+    the synchronous endpoint. Every finished block is persisted to the job
+    file per (variable, year), so a restarted process resumes a job from
+    the years it has not fetched yet instead of starting over.
+    """
+
+    def __init__(
+        self,
+        jobs_dir: str,
+        max_workers: int = 4,
+        cache: Optional[TTLCache] = None,
+        service_factory: Callable[[], EarthdataService] = get_earthdata_service
+    ):
+        """
+        Args:
+            jobs_dir: Directory where job state files are persisted
+            max_workers: Number of year blocks fetched concurrently
+            cache: Query result cache shared with the synchronous query endpoint
+            service_factory: Callable returning the EarthdataService to use
+        """
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+        self._cache = cache if cache is not None else get_query_cache()
+        self._service_factory = service_factory
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quadcode-job")
+        self._jobs: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _persist(self, job: Dict) -> None:
+        """Atomically write the job state to disk (caller holds the lock)"""
+        job["updated_at"] = _now()
+        fd, tmp_path = tempfile.mkstemp(dir=self.jobs_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self._job_path(job["job_id"]))
+
+    def submit(self, request: WeatherQueryRequest) -> JobResponse:
+        """
+        Create a job for a query and schedule its pending units.
+
+        Jobs analyze exactly the requested year range; the smart year
+        selection of the synchronous endpoint is not applied.
+
+        Args:
+            request: Weather query request
+
+        Returns:
+            JobResponse describing the new job
+        """
+        start_year = request.historical_years.start_year
+        end_year = request.historical_years.end_year
+        cache_key = request_cache_key(request, start_year, end_year)
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": JobStatus.QUEUED.value,
+            "request": request.model_dump(mode="json"),
+            "start_year": start_year,
+            "end_year": end_year,
+            "cache_key": cache_key,
+            "client": fetch_client.get(),
+            "created_at": _now(),
+            "updated_at": _now(),
+            "results": {variable.value: {} for variable in request.variables},
+            "error": None,
+            "result": None,
+        }
+
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Job {job['job_id']} answered from query cache")
+            job["status"] = JobStatus.COMPLETED.value
+            job["result"] = cached.model_dump(mode="json")
+
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            self._persist(job)
+
+        if job["status"] == JobStatus.QUEUED.value:
+            self._schedule(job["job_id"])
+
+        return self._describe(job)
+
+    def get(self, job_id: str) -> Optional[JobResponse]:
+        """Return the current state of a job, or None if it does not exist"""
+        if not _JOB_ID_PATTERN.fullmatch(job_id):
+            return None
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None and os.path.exists(self._job_path(job_id)):
+                with open(self._job_path(job_id)) as f:
+                    job = json.load(f)
+                self._jobs[job_id] = job
+            if job is None:
+                return None
+            return self._describe(job)
+
+    def resume(self) -> int:
+        """
+        Reload persisted jobs and reschedule the unfinished ones
+
+        Returns:
+            Number of jobs resumed
+        """
+        resumed = 0
+        for filename in sorted(os.listdir(self.jobs_dir)):
+            if not filename.endswith(".json"):
+                continue
+
+            try:
+                with open(os.path.join(self.jobs_dir, filename)) as f:
+                    job = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load job file {filename}: {e}")
+                continue
+
+            with self._lock:
+                self._jobs[job["job_id"]] = job
+
+            if job["status"] in (JobStatus.QUEUED.value, JobStatus.RUNNING.value):
+                self._schedule(job["job_id"])
+                resumed += 1
+
+        if resumed:
+            logger.info(f"Resumed {resumed} unfinished jobs from {self.jobs_dir}")
+        return resumed
+
+    def shutdown(self) -> None:
+        """Stop accepting work; in-flight units finish and pending ones resume on restart"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _pending_variables(self, job: Dict, first: int, last: int) -> List[str]:
+        """Variables missing a result for some year of a block"""
+        return [
+            variable for variable, years in job["results"].items()
+            if any(str(year) not in years for year in range(first, last + 1))
+        ]
+
+    def _pending_units(self, job: Dict) -> List[Tuple[int, int]]:
+        """First and last year of each block not fetched yet"""
+        blocks = [
+            (first, min(first + JOB_BLOCK_YEARS - 1, job["end_year"]))
+            for first in range(job["start_year"], job["end_year"] + 1, JOB_BLOCK_YEARS)
+        ]
+        return [(first, last) for first, last in blocks if self._pending_variables(job, first, last)]
+
+    def _schedule(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            units = self._pending_units(job)
+
+        if not units:
+            self._executor.submit(self._finalize, job_id)
+            return
+
+        for first, last in units:
+            self._executor.submit(self._run_unit, job_id, first, last)
+
+    def _resubmit(self, job_id: str, first: int, last: int) -> None:
+        """Schedule a deferred unit again, unless the manager was shut down meanwhile"""
+        try:
+            self._executor.submit(self._run_unit, job_id, first, last)
+        except RuntimeError:
+            # The unit stays pending in the job file and resume() picks it up
+            logger.info(f"Job {job_id} left years {first}-{last} for the next start")
+
+    def _run_unit(self, job_id: str, first: int, last: int) -> None:
+        """Fetch one block of years for every variable still missing them, in a worker thread"""
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["status"] == JobStatus.FAILED.value:
+                return
+            if job["status"] == JobStatus.QUEUED.value:
+                job["status"] = JobStatus.RUNNING.value
+                self._persist(job)
+            request = job["request"]
+            variables = self._pending_variables(job, first, last)
+
+        # Log lines of the unit (this pool thread runs only job units) carry the job id,
+        # and its fetches are scheduled in the batch lane under the submitting client
+        correlation_id.set(job_id)
+        fetch_lane.set(FetchLane.BATCH)
+        fetch_client.set(job.get("client") or job_id)
+        try:
+            service = self._service_factory()
+            fetched = asyncio.run(service.fetch_variables_data(
+                variables,
+                request["location"]["lat"],
+                request["location"]["lon"],
+                request["day_of_year"]["month"],
+                request["day_of_year"]["day"],
+                first,
+                last
+            ))
+        except CircuitOpenError as e:
+            # Upstream unhealthy: retry the unit once the circuit may have closed
+            delay = get_fetch_policy().reset_seconds
+            logger.warning(f"Job {job_id} deferring years {first}-{last} for {delay:.0f}s: {e}")
+            timer = threading.Timer(delay, self._resubmit, (job_id, first, last))
+            timer.daemon = True
+            timer.start()
+            return
+        except Exception as e:
+            logger.error(f"Job {job_id} failed fetching years {first}-{last}: {e}", exc_info=True)
+            with self._lock:
+                job["status"] = JobStatus.FAILED.value
+                job["error"] = str(e)
+                self._persist(job)
+            return
+
+        with self._lock:
+            for variable in variables:
+                series = fetched[variable]
+                for year, value in zip(series.years.tolist(), series.values.tolist()):
+                    job["results"][variable].setdefault(str(year), None if math.isnan(value) else {
+                        "value": value,
+                        "actual_lat": series.actual_lat,
+                        "actual_lon": series.actual_lon
+                    })
+            self._persist(job)
+            done = not self._pending_units(job)
+
+        if done:
+            self._finalize(job_id)
+
+    def _finalize(self, job_id: str) -> None:
+        """Build the final response from the per-year results and cache it"""
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["status"] in (JobStatus.COMPLETED.value, JobStatus.FAILED.value):
+                return
+            request = WeatherQueryRequest.model_validate(job["request"])
+            results = {variable: dict(years) for variable, years in job["results"].items()}
+
+        fetched = {}
+        for variable, years in results.items():
+            found = {int(year): result for year, result in years.items() if result is not None}
+            first = next(iter(found.values()), {})
+            fetched[variable] = YearSeries.from_years(
+                job["start_year"],
+                job["end_year"],
+                list(found),
+                [result["value"] for result in found.values()],
+                actual_lat=first.get("actual_lat"),
+                actual_lon=first.get("actual_lon")
+            )
+
+        try:
+            response = build_weather_response(request, fetched, job["start_year"], job["end_year"])
+        except Exception as e:
+            logger.error(f"Job {job_id} failed building response: {e}", exc_info=True)
+            with self._lock:
+                job["status"] = JobStatus.FAILED.value
+                job["error"] = str(e)
+                self._persist(job)
+            return
+
+        self._cache.set(job["cache_key"], response)
+        store_distributions(get_distribution_cache(), response)
+
+        with self._lock:
+            job["status"] = JobStatus.COMPLETED.value
+            job["result"] = response.model_dump(mode="json")
+            self._persist(job)
+
+        logger.info(f"Job {job_id} completed")
+
+    def _describe(self, job: Dict) -> JobResponse:
+        total = len(job["results"]) * (job["end_year"] - job["start_year"] + 1)
+        completed = sum(len(years) for years in job["results"].values())
+        if job["status"] == JobStatus.COMPLETED.value:
+            completed = total
+
+        return JobResponse(
+            job_id=job["job_id"],
+            status=JobStatus(job["status"]),
+            progress=JobProgress(
+                completed=completed,
+                total=total,
+                percent=round(100.0 * completed / total, 1) if total else 100.0
+            ),
+            created_at=job["created_at"],
+            updated_at=job["updated_at"],
+            error=job["error"],
+            result=WeatherQueryResponse.model_validate(job["result"]) if job["result"] else None
+        )
+
+
+@lru_cache(maxsize=1)
+def get_job_manager() -> JobManager:
+    """
+    Get singleton instance of JobManager.
+    The state directory and pool size are configurable through JOBS_DIR
+    and JOB_MAX_WORKERS.
+    """
+    jobs_dir = os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "quadcode", "jobs"))
+    return JobManager(
+        jobs_dir=jobs_dir,
+        max_workers=int(os.getenv("JOB_MAX_WORKERS", "4"))
+    )
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Local on-disk store of extracted daily point series
+"""
+
+import json
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import logging
+
+from quadcode.app.core.grid import DAYS_PER_YEAR, Grid
+from quadcode.app.services.snapshot import SnapshotBundle, get_snapshot
+
+logger = logging.getLogger(__name__)
+
+# First year on the year axis of harvested tiles (the start of MERRA-2)
+TILE_FIRST_YEAR = 1980
+
+IndexRange = Tuple[int, int]
+
+
+class PointStore:
+    """
+    Stores one float32 array of 366 daily values per (variable, grid cell, year).
+
+    Values are in the variable's output units. NaN marks a day that has not
+    been stored yet, so partially filled years are allowed and only the
+    missing days need to be fetched again.
+
+    Next to the series, cells harvested around single-day reads are kept
+    as tiles: grid-aligned blocks of tile_cells x tile_cells cells, one
+    float32 (year, lat, lon) array per (variable, block, calendar day).
+    A read of one cell decodes whole chunks anyway, so keeping the block
+    around it costs no extra I/O and answers queries for nearby cells.
+
+    Series and tiles missing on disk are looked up in the warm-cache
+    snapshot, if any; merging new values into one writes it to disk.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        tile_cells: int = 0,
+        regions: Sequence[Tuple[float, float, float, float]] = (),
+        max_region_cells: int = 16384,
+        snapshot: Optional[SnapshotBundle] = None
+    ):
+        """
+        Args:
+            root_dir: Directory holding the point series files
+            tile_cells: Side of the harvested blocks in grid cells; 0 disables tiles
+            regions: Hot areas harvested whole when a read falls inside,
+                as (lat_min, lat_max, lon_min, lon_max)
+            max_region_cells: Largest region harvested, in cells; larger
+                ones fall back to the block around the read cell
+            snapshot: Warm-cache bundle consulted for entries missing on disk
+        """
+        self.root_dir = root_dir
+        self.tile_cells = tile_cells
+        self.regions = [tuple(region) for region in regions]
+        self.max_region_cells = max_region_cells
+        self.snapshot = snapshot
+        os.makedirs(root_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, variable: str, lat_idx: int, lon_idx: int, year: int) -> str:
+        return os.path.join(self.root_dir, variable, f"{lat_idx}_{lon_idx}", f"{year}.npy")
+
+    def get_year(self, variable: str, lat_idx: int, lon_idx: int, year: int) -> Optional[np.ndarray]:
+        """
+        Load the daily series for a year
+
+        Returns:
+            float32 array of length 366 (NaN for days not stored), or None if
+            nothing is stored for this year
+        """
+        path = self._path(variable, lat_idx, lon_idx, year)
+        try:
+            return np.load(path)
+        except FileNotFoundError:
+            if self.snapshot is not None:
+                return self.snapshot.get_year(variable, lat_idx, lon_idx, year)
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Corrupt point store file {path}: {e}")
+            return None
+
+    def put_year(self, variable: str, lat_idx: int, lon_idx: int, year: int, values: np.ndarray) -> None:
+        """
+        Merge a daily series into the store; NaN entries do not overwrite stored days
+
+        Args:
+            variable: Variable name
+            lat_idx: Grid latitude index
+            lon_idx: Grid longitude index
+            year: Year of the series
+            values: Array of length 366 indexed by day_of_year_index
+        """
+        values = np.asarray(values, dtype=np.float32)
+        if values.shape != (DAYS_PER_YEAR,):
+            raise ValueError(f"Expected {DAYS_PER_YEAR} daily values, got shape {values.shape}")
+
+        path = self._path(variable, lat_idx, lon_idx, year)
+        directory = os.path.dirname(path)
+
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            existing = self.get_year(variable, lat_idx, lon_idx, year)
+            if existing is not None:
+                values = np.where(np.isnan(values), existing, values)
+
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, values)
+            os.replace(tmp_path, path)
+
+    def get_value(self, variable: str, lat_idx: int, lon_idx: int, year: int, day_index: int) -> Optional[float]:
+        """Return a single stored daily value, or None if it is not stored"""
+        series = self.get_year(variable, lat_idx, lon_idx, year)
+        if series is None or np.isnan(series[day_index]):
+            return None
+        return float(series[day_index])
+
+    def put_value(self, variable: str, lat_idx: int, lon_idx: int, year: int, day_index: int, value: float) -> None:
+        """Store a single daily value"""
+        values = np.full(DAYS_PER_YEAR, np.nan, dtype=np.float32)
+        values[day_index] = value
+        self.put_year(variable, lat_idx, lon_idx, year, values)
+
+    def harvest_window(self, grid: Grid, lat_idx: int, lon_idx: int) -> Optional[Tuple[IndexRange, IndexRange]]:
+        """
+        Grid index ranges [start, stop) to harvest around a read cell: a hot
+        region holding the cell, else the aligned block holding it
+
+        Returns:
+            (lat_range, lon_range), or None if tiles are disabled
+        """
+        if self.tile_cells <= 0:
+            return None
+
+        for lat_min, lat_max, lon_min, lon_max in self.regions:
+            lat_lo, lon_lo, grid_lat_lo, grid_lon_lo = grid.snap(lat_min, lon_min)
+            lat_hi, lon_hi, _, _ = grid.snap(lat_max, lon_max)
+            inside = lat_lo <= lat_idx <= lat_hi and lon_lo <= lon_idx <= lon_hi
+            if inside and (lat_hi - lat_lo + 1) * (lon_hi - lon_lo + 1) <= self.max_region_cells:
+                return (lat_lo, lat_hi + 1), (lon_lo, lon_hi + 1)
+
+        size = self.tile_cells
+        lat_start = lat_idx // size * size
+        lon_start = lon_idx // size * size
+        return (lat_start, min(lat_start + size, grid.lat_count)), (lon_start, min(lon_start + size, grid.lon_count))
+
+    def _tile_path(self, variable: str, block_lat: int, block_lon: int, day_index: int) -> str:
+        return os.path.join(
+            self.root_dir, variable, f"tiles-{self.tile_cells}", f"{block_lat}_{block_lon}", f"{day_index:03d}.npy"
+        )
+
+    def _load_tile(self, variable: str, block_lat: int, block_lon: int, day_index: int) -> Optional[np.ndarray]:
+        path = self._tile_path(variable, block_lat, block_lon, day_index)
+        try:
+            return np.load(path)
+        except FileNotFoundError:
+            if self.snapshot is not None:
+                return self.snapshot.get_tile(variable, self.tile_cells, block_lat, block_lon, day_index)
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Corrupt point tile {path}: {e}")
+            return None
+
+    def get_tile_values(
+        self,
+        variable: str,
+        lat_idx: int,
+        lon_idx: int,
+        day_index: int,
+        years: np.ndarray
+    ) -> np.ndarray:
+        """
+        Harvested values of one cell on one calendar day across years
+
+        Returns:
+            float32 array aligned with years, NaN where nothing is stored
+        """
+        values = np.full(len(years), np.nan, dtype=np.float32)
+        if self.tile_cells <= 0:
+            return values
+
+        size = self.tile_cells
+        tile = self._load_tile(variable, lat_idx // size, lon_idx // size, day_index)
+        if tile is None:
+            return values
+
+        positions = np.asarray(years, dtype=int) - TILE_FIRST_YEAR
+        stored = (positions >= 0) & (positions < tile.shape[0])
+        values[stored] = tile[positions[stored], lat_idx % size, lon_idx % size]
+        return values
+
+    def put_tile_values(
+        self,
+        variable: str,
+        day_index: int,
+        years: np.ndarray,
+        lat_start: int,
+        lon_start: int,
+        values: np.ndarray
+    ) -> None:
+        """
+        Merge harvested values of a rectangle of cells on one calendar day;
+        NaN entries do not overwrite stored values
+
+        Args:
+            variable: Variable name
+            day_index: Index of the calendar day (see day_of_year_index)
+            years: Years of the first axis of values
+            lat_start: Grid latitude index of the first row
+            lon_start: Grid longitude index of the first column
+            values: Array of shape (years, lat, lon); the rectangle may span several blocks
+        """
+        if self.tile_cells <= 0:
+            return
+
+        values = np.asarray(values, dtype=np.float32)
+        positions = np.asarray(years, dtype=int) - TILE_FIRST_YEAR
+        keep = positions >= 0
+        values, positions = values[keep], positions[keep]
+        if not len(positions):
+            return
+
+        size = self.tile_cells
+        lat_stop = lat_start + values.shape[1]
+        lon_stop = lon_start + values.shape[2]
+
+        with self._lock:
+            for block_lat in range(lat_start // size, (lat_stop - 1) // size + 1):
+                for block_lon in range(lon_start // size, (lon_stop - 1) // size + 1):
+                    # Rows and columns of the block covered by the rectangle
+                    rows = slice(max(lat_start, block_lat * size), min(lat_stop, (block_lat + 1) * size))
+                    cols = slice(max(lon_start, block_lon * size), min(lon_stop, (block_lon + 1) * size))
+                    new = values[:, rows.start - lat_start:rows.stop - lat_start,
+                                 cols.start - lon_start:cols.stop - lon_start]
+                    if np.isnan(new).all():
+                        continue
+
+                    path = self._tile_path(variable, block_lat, block_lon, day_index)
+                    tile = self._load_tile(variable, block_lat, block_lon, day_index)
+                    length = int(positions.max()) + 1
+                    if tile is None or tile.shape[0] < length:
+                        # Grow the year axis to the latest year written
+                        grown = np.full((length, size, size), np.nan, dtype=np.float32)
+                        if tile is not None:
+                            grown[:tile.shape[0]] = tile
+                        tile = grown
+
+                    target = (positions[:, None, None],
+                              np.arange(rows.start - block_lat * size, rows.stop - block_lat * size)[None, :, None],
+                              np.arange(cols.start - block_lon * size, cols.stop - block_lon * size)[None, None, :])
+                    tile[target] = np.where(np.isnan(new), tile[target], new)
+
+                    directory = os.path.dirname(path)
+                    os.makedirs(directory, exist_ok=True)
+                    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                    with os.fdopen(fd, "wb") as f:
+                        np.save(f, tile)
+                    os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=1)
+def get_point_store() -> PointStore:
+    """
+    Get singleton instance of PointStore.
+
+    The storage directory is configurable through POINT_STORE_DIR. Harvested
+    tiles are configured through POINT_HARVEST_TILE_CELLS (block side, 0 to
+    disable), POINT_HARVEST_REGIONS (JSON list of [lat_min, lat_max,
+    lon_min, lon_max] hot areas) and POINT_HARVEST_MAX_REGION_CELLS.
+    """
+    return PointStore(
+        os.getenv("POINT_STORE_DIR", os.path.join(tempfile.gettempdir(), "quadcode", "points")),
+        tile_cells=int(os.getenv("POINT_HARVEST_TILE_CELLS", "8")),
+        regions=json.loads(os.getenv("POINT_HARVEST_REGIONS", "[]")),
+        max_region_cells=int(os.getenv("POINT_HARVEST_MAX_REGION_CELLS", "16384")),
+        snapshot=get_snapshot()
+    )
@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+"""
+Weather query pipeline shared by the synchronous API and background jobs
+"""
+
+from calendar import month_abbr, month_name
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple, Union
+import logging
+import os
+
+import numpy as np
+
+from quadcode.app.models.weather import (
+    WeatherQueryRequest,
+    SeasonalQueryRequest,
+    WeatherQueryResponse,
+    QueryInfo,
+    VariableData,
+    EmpiricalDistribution,
+    ExtremeValueAnalysis,
+    Statistics,
+    TrendAnalysis,
+    ConfidenceInterval,
+    GridPoint,
+    DataSource,
+    Metadata
+)
+from quadcode.app.services.earthdata_service import EarthdataService
+from quadcode.app.core.cache import TTLCache, query_cache_key
+from quadcode.app.services.climatology import ClimatologyStore, year_layer
+from quadcode.app.core.grid import canonical_location, day_of_year_index
+from quadcode.app.core.http_cache import strong_etag
+from quadcode.app.core.registry import COLLECTIONS, VARIABLES, get_variable, resolve_variables
+from quadcode.app.core.series import YearSeries
+from quadcode.app.core.extremes import RETURN_PERIODS, compute_extremes_matrix
+from quadcode.app.core.utils import (
+    compute_statistics,
+    compute_probabilities_sorted,
+    compute_trend_analysis,
+    compute_bootstrap_intervals
+)
+
+logger = logging.getLogger(__name__)
+
+# Bootstrap resamples behind confidence intervals, and their confidence level
+BOOTSTRAP_RESAMPLES = int(os.getenv("BOOTSTRAP_RESAMPLES", "2000"))
+CONFIDENCE_LEVEL = float(os.getenv("CONFIDENCE_LEVEL", "0.95"))
+
+# Days after the end of a year until its data is final; MERRA-2 and the
+# IMERG Final Run are published within about three and a half months
+CLOSED_RANGE_LAG_DAYS = int(os.getenv("QUERY_CLOSED_RANGE_LAG_DAYS", "120"))
+
+# Revision of the query response layout, part of every entity tag; bump it
+# whenever the same query would serialize differently
+RESPONSE_REVISION = "3"
+
+
+def resolve_year_range(request: WeatherQueryRequest) -> Tuple[int, int]:
+    """
+    Apply smart year selection to a query.
+
+    Single variable queries use 5 years and multi-variable queries use 3 years
+    when the request uses the default start year or asks for a long range
+    ending in the current year.
+
+    Args:
+        request: Weather query request
+
+    Returns:
+        Tuple of (start_year, end_year) to analyze
+    """
+    start_year = request.historical_years.start_year
+    end_year = request.historical_years.end_year
+
+    current_year = datetime.now().year
+    num_variables = len(request.variables)
+
+    # Check if using default years (1980 is the model default) or requesting too many years
+    if start_year == 1980 or (current_year - end_year <= 1 and end_year - start_year + 1 > 5):
+        if num_variables == 1:
+            # Single variable: fetch 5 years of data
+            max_years = 5
+            end_year = current_year - 1
+            start_year = end_year - (max_years - 1)
+            logger.info(f"Smart year selection: Single variable, using {max_years} years ({start_year}-{end_year})")
+        else:
+            # Multiple variables: fetch 3 years of data for faster response
+            max_years = 3
+            end_year = current_year - 1
+            start_year = end_year - (max_years - 1)
+            logger.info(f"Smart year selection: {num_variables} variables, using {max_years} years ({start_year}-{end_year}) for faster performance")
+
+    return start_year, end_year
+
+
+def request_cache_key(request: WeatherQueryRequest, start_year: int, end_year: int) -> str:
+    """Build the query cache key for a request and its effective year range"""
+    return query_cache_key(
+        request.location.lat,
+        request.location.lon,
+        request.day_of_year.month,
+        request.day_of_year.day,
+        start_year,
+        end_year,
+        request.variables,
+        request.thresholds,
+        {
+            "include_distribution": request.include_distribution,
+            "confidence_intervals": request.confidence_intervals,
+            "extremes": request.extremes
+        }
+    )
+
+
+def request_distribution_key(request: WeatherQueryRequest, start_year: int, end_year: int) -> str:
+    """Build the distribution cache key, which does not depend on thresholds"""
+    return query_cache_key(
+        request.location.lat,
+        request.location.lon,
+        request.day_of_year.month,
+        request.day_of_year.day,
+        start_year,
+        end_year,
+        request.variables
+    )
+
+
+def seasonal_cache_key(request: SeasonalQueryRequest) -> str:
+    """Build the query cache key of a seasonal request"""
+    return query_cache_key(
+        request.location.lat,
+        request.location.lon,
+        0,
+        0,
+        request.historical_years.start_year,
+        request.historical_years.end_year,
+        request.variables,
+        request.thresholds,
+        {
+            "months": request.months,
+            "include_distribution": request.include_distribution,
+            "confidence_intervals": request.confidence_intervals,
+            "extremes": request.extremes
+        }
+    )
+
+
+def seasonal_distribution_key(request: SeasonalQueryRequest) -> str:
+    """Build the distribution cache key of a seasonal request, which does not depend on thresholds"""
+    return query_cache_key(
+        request.location.lat,
+        request.location.lon,
+        0,
+        0,
+        request.historical_years.start_year,
+        request.historical_years.end_year,
+        request.variables,
+        options={"months": request.months}
+    )
+
+
+def parse_thresholds(spec: Optional[str]) -> Optional[Dict[str, Dict[str, float]]]:
+    """
+    Parse thresholds given as comma-separated variable:label:value items,
+    e.g. "temperature:hot:35,precipitation:wet:5"
+
+    Raises:
+        ValueError: If an item is malformed
+    """
+    if not spec:
+        return None
+
+    thresholds: Dict[str, Dict[str, float]] = {}
+    for item in spec.split(","):
+        parts = item.split(":")
+        if len(parts) != 3:
+            raise ValueError(f"Invalid threshold {item!r}; expected variable:label:value")
+        variable, label, value = parts
+        thresholds.setdefault(variable, {})[label] = float(value)
+    return thresholds
+
+
+def format_coordinate(value: float) -> str:
+    """Shortest fixed-point form of a coordinate, at most 6 decimals"""
+    return f"{value + 0.0:.6f}".rstrip("0").rstrip(".")
+
+
+def canonical_query(request: WeatherQueryRequest, start_year: int, end_year: int) -> str:
+    """
+    Canonical query string of the GET form of /query.
+
+    The location is snapped to the grid cells it is read from (see
+    canonical_location) and the years are the effective range, so every
+    request with the same result shares one URL; variables and thresholds
+    are sorted and defaults left out.
+
+    Args:
+        request: Weather query request
+        start_year: Effective start year
+        end_year: Effective end year
+
+    Returns:
+        Query string without the leading "?"
+    """
+    variables = sorted({getattr(v, "value", v) for v in request.variables})
+    lat, lon = canonical_location(
+        (get_variable(variable).collection.grid for variable in variables),
+        request.location.lat,
+        request.location.lon
+    )
+
+    params = [
+        ("lat", format_coordinate(lat)),
+        ("lon", format_coordinate(lon)),
+        ("month", str(request.day_of_year.month)),
+        ("day", str(request.day_of_year.day)),
+        ("start_year", str(start_year)),
+        ("end_year", str(end_year)),
+        ("variables", ",".join(variables)),
+    ]
+    if request.thresholds:
+        params.append(("thresholds", ",".join(
+            f"{variable}:{label}:{float(value)!r}"
+            for variable, labels in sorted(request.thresholds.items())
+            for label, value in sorted(labels.items())
+        )))
+    if request.include_distribution:
+        params.append(("include_distribution", "true"))
+    if request.confidence_intervals:
+        params.append(("confidence_intervals", "true"))
+    if request.extremes:
+        params.append(("extremes", request.extremes.value))
+    return "&".join(f"{name}={value}" for name, value in params)
+
+
+def year_range_closed(end_year: int, today: Optional[date] = None) -> bool:
+    """Whether every year of a range ending in end_year has final data"""
+    today = today or date.today()
+    return today > date(end_year, 12, 31) + timedelta(days=CLOSED_RANGE_LAG_DAYS)
+
+
+def tile_versions(
+    request: WeatherQueryRequest,
+    climatology: Optional[ClimatologyStore],
+    start_year: int,
+    end_year: int
+) -> Dict[str, int]:
+    """Version of the climatology tile of each requested variable, 0 where none is precomputed"""
+    if climatology is None:
+        return {}
+    day_index = day_of_year_index(request.day_of_year.month, request.day_of_year.day)
+    return {
+        variable: climatology.tile_version(get_variable(variable).name, start_year, end_year, day_index)
+        for variable in sorted({getattr(v, "value", v) for v in request.variables})
+    }
+
+
+def query_etag(
+    request: WeatherQueryRequest,
+    canonical: str,
+    climatology: Optional[ClimatologyStore],
+    start_year: int,
+    end_year: int,
+    media_type: str,
+    encoding: Optional[str]
+) -> str:
+    """
+    Strong entity tag of a query response, known before it is computed
+
+    Derived from the canonical query, the versions of the collections read,
+    the climatology tiles that may answer it and the negotiated
+    representation, so a conditional request is answered without data I/O.
+    """
+    variables = sorted({getattr(v, "value", v) for v in request.variables})
+    datasets = sorted({
+        f"{spec.collection.short_name}.{spec.collection.version}" for spec in resolve_variables(variables)
+    })
+    tiles = tile_versions(request, climatology, start_year, end_year)
+    return strong_etag(RESPONSE_REVISION, canonical, datasets, tiles, media_type, encoding)
+
+
+def store_distributions(cache: TTLCache, response: WeatherQueryResponse) -> None:
+    """
+    Cache the sorted sample of every variable in a response under its
+    distribution key, so new thresholds can be evaluated without data I/O.
+    """
+    key = response.query_info.distribution_key
+    if key is None:
+        return
+
+    distributions = {}
+    for variable, data in response.historical_data.items():
+        arr = np.array(data.values, dtype=float)
+        distributions[getattr(variable, "value", variable)] = np.sort(arr[~np.isnan(arr)])
+    cache.set(key, distributions)
+
+
+def extreme_value_analysis(method: str, fitted: Dict, column: int = 0) -> ExtremeValueAnalysis:
+    """
+    Response model of one column of an extreme-value fit
+
+    Args:
+        method: "gev" or "pot"
+        fitted: Result of compute_extremes_matrix
+        column: Series of the fit to describe
+
+    Returns:
+        ExtremeValueAnalysis with NaN estimates as None
+    """
+    def number(values: np.ndarray) -> Optional[float]:
+        value = float(values[column])
+        return None if np.isnan(value) else value
+
+    parameters = fitted["parameters"]
+    return ExtremeValueAnalysis(
+        method=method,
+        **{name: number(values) for name, values in parameters.items() if name != "count"},
+        sample_size=int(parameters["count"][column]),
+        return_levels={
+            str(period): number(levels) for period, levels in zip(RETURN_PERIODS, fitted["return_levels"])
+        },
+        probabilities={label: number(values) for label, values in fitted["probabilities"].items()}
+    )
+
+
+def build_weather_response(
+    request: Union[WeatherQueryRequest, SeasonalQueryRequest],
+    fetched: Dict[str, YearSeries],
+    start_year: int,
+    end_year: int,
+    period: Optional[str] = None,
+    distribution_key: Optional[str] = None
+) -> WeatherQueryResponse:
+    """
+    Build the query response from fetched per-variable data.
+
+    Args:
+        request: Weather or seasonal query request
+        fetched: Mapping of variable to its YearSeries
+        start_year: Effective start year
+        end_year: Effective end year
+        period: Label of the analyzed period; defaults to the request's day of year
+        distribution_key: Distribution cache key; defaults to the day-of-year query key
+
+    Returns:
+        WeatherQueryResponse with historical data, statistics, and probabilities
+    """
+    if period is None:
+        period = f"{month_name[request.day_of_year.month]} {request.day_of_year.day}"
+    if distribution_key is None:
+        distribution_key = request_distribution_key(request, start_year, end_year)
+
+    historical_data = {}
+    actual_grid_points = {}
+    missing_data = {}
+    collections = {name: spec.collection for name, spec in VARIABLES.items()}
+
+    for variable in request.variables:
+        series = fetched.get(variable)
+        if series is None:
+            logger.warning(f"Unknown variable: {variable}")
+            continue
+
+        values = series.valid_values()
+        years = series.valid_years()
+        if len(values) == 0:
+            logger.warning(f"No {variable} data available")
+            continue
+
+        # Compute statistics
+        stats = compute_statistics(values)
+
+        # Compute trend analysis
+        trend_data = compute_trend_analysis(values, years)
+
+        # One sorted sample serves the probabilities and the distribution
+        sorted_values = np.sort(values)
+
+        # Compute probabilities if thresholds provided
+        probs = {}
+        thresholds = (request.thresholds or {}).get(variable)
+        if thresholds:
+            probs = compute_probabilities_sorted(sorted_values, thresholds)
+
+        probability_intervals = None
+        if request.confidence_intervals:
+            # Fixed seed: the same request always gets the same intervals
+            intervals = compute_bootstrap_intervals(
+                values, years, thresholds, BOOTSTRAP_RESAMPLES, CONFIDENCE_LEVEL, seed=0
+            )
+            probability_intervals = {
+                label: ConfidenceInterval(**bounds) for label, bounds in intervals["probabilities"].items()
+            }
+            if intervals["slope_low"] is not None:
+                trend_data["slope_interval"] = ConfidenceInterval(
+                    low=intervals["slope_low"], high=intervals["slope_high"]
+                )
+            trend_data["p_value"] = intervals["p_value"]
+        stats["trend"] = TrendAnalysis(**trend_data)
+
+        extremes = None
+        if request.extremes:
+            method = request.extremes.value
+            extremes = extreme_value_analysis(method, compute_extremes_matrix(values[:, None], method, thresholds))
+
+        distribution = None
+        if request.include_distribution:
+            distribution = EmpiricalDistribution(
+                sorted_values=sorted_values.tolist(),
+                count=len(sorted_values)
+            )
+
+        historical_data[variable] = VariableData(
+            values=values.tolist(),
+            years=years.tolist(),
+            statistics=Statistics(**stats),
+            probabilities=probs,
+            probability_intervals=probability_intervals,
+            distribution=distribution,
+            extremes=extremes
+        )
+
+        # Store grid point info, naming the product the values were read from
+        if series.collection in COLLECTIONS:
+            collections[get_variable(variable).name] = COLLECTIONS[series.collection]
+        if series.actual_lat is not None and series.actual_lon is not None:
+            actual_grid_points[variable] = GridPoint(
+                lat=series.actual_lat,
+                lon=series.actual_lon,
+                dataset=collections[get_variable(variable).name].label
+            )
+
+        # Store missing years
+        if series.missing.any():
+            missing_data[variable] = series.missing_years()
+
+    query_info = QueryInfo(
+        requested_location=request.location,
+        actual_grid_points=actual_grid_points,
+        day_of_year=period,
+        years_analyzed=end_year - start_year + 1,
+        data_period=f"{start_year}-{end_year}",
+        missing_data=missing_data if missing_data else None,
+        distribution_key=distribution_key
+    )
+
+    metadata = Metadata(
+        data_sources={
+            name: DataSource(name=collection.source_name, url=collection.source_url)
+            for name, collection in collections.items()
+        },
+        units={name: spec.units for name, spec in VARIABLES.items()}
+    )
+
+    return WeatherQueryResponse(
+        query_info=query_info,
+        historical_data=historical_data,
+        metadata=metadata
+    )
+
+
+def climatology_response(
+    request: WeatherQueryRequest,
+    store: Optional[ClimatologyStore],
+    start_year: int,
+    end_year: int
+) -> Optional[WeatherQueryResponse]:
+    """
+    Answer a query from precomputed climatology tiles, with one block read per variable.
+
+    Tiles hold the value of every year of each cell, so the response is
+    built from those series exactly as from the data (see
+    build_weather_response). Only possible when every variable has a tile
+    for the effective year range and day with a layer for each year; tiles
+    built before the per-year layers existed are answered from the data.
+
+    Args:
+        request: Weather query request
+        store: Climatology tile store, or None when disabled
+        start_year: Effective start year
+        end_year: Effective end year
+
+    Returns:
+        WeatherQueryResponse, or None if the query must be answered from the data
+    """
+    if store is None:
+        return None
+
+    lat = request.location.lat
+    lon = request.location.lon
+    day_index = day_of_year_index(request.day_of_year.month, request.day_of_year.day)
+    years = np.arange(start_year, end_year + 1)
+    layers = [year_layer(year) for year in years]
+
+    fetched = {}
+    for variable in request.variables:
+        spec = get_variable(variable)
+        lat_idx, lon_idx, grid_lat, grid_lon = spec.collection.grid.snap(lat, lon)
+        cell = store.get_cell(spec.name, start_year, end_year, day_index, lat_idx, lon_idx)
+        if cell is None or not cell["values"]["count"] or not all(layer in cell["values"] for layer in layers):
+            return None
+
+        fetched[spec.name] = YearSeries(
+            years=years,
+            values=[cell["values"][layer] for layer in layers],
+            actual_lat=grid_lat,
+            actual_lon=grid_lon,
+            collection=spec.collection.short_name
+        )
+
+    response = build_weather_response(request, fetched, start_year, end_year)
+    response.query_info.precomputed = True
+    return response
+
+
+async def run_weather_query(
+    request: WeatherQueryRequest,
+    service: EarthdataService,
+    start_year: int,
+    end_year: int
+) -> WeatherQueryResponse:
+    """
+    Fetch every requested variable and build the query response.
+    Variables sharing a collection are read from the same granules.
+
+    Args:
+        request: Weather query request
+        service: EarthdataService instance
+        start_year: Effective start year
+        end_year: Effective end year
+
+    Returns:
+        WeatherQueryResponse with historical data, statistics, and probabilities
+    """
+    lat = request.location.lat
+    lon = request.location.lon
+    month = request.day_of_year.month
+    day = request.day_of_year.day
+
+    logger.info(f"Fetching {[getattr(v, 'value', v) for v in request.variables]} data")
+    fetched = await service.fetch_variables_data(
+        request.variables, lat, lon, month, day, start_year, end_year
+    )
+
+    return build_weather_response(request, fetched, start_year, end_year)
+
+
+async def answer_query(
+    request: WeatherQueryRequest,
+    start_year: int,
+    end_year: int,
+    service: EarthdataService,
+    cache: TTLCache,
+    distributions: TTLCache,
+    climatology: Optional[ClimatologyStore]
+) -> WeatherQueryResponse:
+    """Answer a query from the query cache, the climatology tiles or the data, in that order"""
+    cache_key = request_cache_key(request, start_year, end_year)
+    # The entry records the tiles it was answered with, like query_etag: a response
+    # computed from the data before a tile appeared is not served under the new tag
+    tiles = tile_versions(request, climatology, start_year, end_year)
+    if any(tiles.values()):
+        cache_key += ":" + ",".join(f"{variable}={version}" for variable, version in tiles.items())
+    cached = cache.get(cache_key)
+    if cached is not None:
+        logger.info("Serving query from cache")
+        store_distributions(distributions, cached)
+        query_info = cached.query_info.model_copy(update={"requested_location": request.location})
+        return cached.model_copy(update={"query_info": query_info})
+
+    location = request.location
+    logger.info(f"Processing query for {location.name or f'({location.lat}, {location.lon})'} "
+                f"on {request.day_of_year.month}/{request.day_of_year.day}")
+
+    # Precomputed tiles answer without data I/O when they cover the query
+    response = climatology_response(request, climatology, start_year, end_year)
+    if response is None:
+        response = await run_weather_query(request, service, start_year, end_year)
+    cache.set(cache_key, response)
+    store_distributions(distributions, response)
+
+    logger.info(f"Successfully processed query")
+    return response
+
+
+async def run_seasonal_query(
+    request: SeasonalQueryRequest,
+    service: EarthdataService
+) -> WeatherQueryResponse:
+    """
+    Fetch the seasonal mean of every requested variable for each year and
+    build the query response
+
+    Args:
+        request: Seasonal query request
+        service: EarthdataService instance
+
+    Returns:
+        WeatherQueryResponse with one seasonal mean per year and variable
+    """
+    start_year = request.historical_years.start_year
+    end_year = request.historical_years.end_year
+
+    fetched = await service.fetch_variables_seasonal(
+        request.variables,
+        request.location.lat,
+        request.location.lon,
+        request.months,
+        start_year,
+        end_year
+    )
+
+    return build_weather_response(
+        request,
+        fetched,
+        start_year,
+        end_year,
+        period=", ".join(month_abbr[month] for month in request.months),
+        distribution_key=seasonal_distribution_key(request)
+    )
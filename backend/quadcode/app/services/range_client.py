@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Async HTTP range reads over pooled keep-alive connections, with a file-like adapter for xarray
+"""
+
+import asyncio
+import io
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+from urllib.parse import urljoin, urlsplit
+import logging
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+# Earthdata Login, where data hosts redirect unauthenticated requests
+EDL_HOST = "urs.earthdata.nasa.gov"
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class RangeClient:
+    """
+    HTTP byte-range reader sharing one authenticated session per process.
+
+    Connections are pooled per host (at most max_per_host each) and kept
+    alive between reads, and the session cookie jar keeps the cookies the
+    data hosts set after the Earthdata Login redirect dance, so only the
+    first read of a host pays for TLS handshakes and authentication.
+    Redirects are followed by hand so the bearer token is only ever sent
+    to the host first asked and to Earthdata Login.
+
+    The session lives on a private event loop thread: async callers await
+    reads from any loop, and blocking callers (h5py through RangeFile,
+    chunk readers in worker threads) wait on the same pool.
+    """
+
+    def __init__(
+        self,
+        headers: Callable[[], Dict[str, str]] = dict,
+        max_per_host: int = 8,
+        timeout_seconds: float = 60.0,
+        max_redirects: int = 10,
+        auth_hosts: Sequence[str] = (EDL_HOST,),
+    ):
+        """
+        Args:
+            headers: Returns the authentication headers; called when the
+                session is created and again after a 401
+            max_per_host: Open connections per host
+            timeout_seconds: Total time of one read, redirects included
+            max_redirects: Redirects followed per read
+            auth_hosts: Hosts besides the requested one trusted with the headers
+        """
+        if aiohttp is None:
+            raise RuntimeError("RangeClient requires aiohttp")
+        self._headers_factory = headers
+        self.max_per_host = max_per_host
+        self.timeout_seconds = timeout_seconds
+        self.max_redirects = max_redirects
+        self.auth_hosts = set(auth_hosts)
+
+        self._headers: Optional[Dict[str, str]] = None
+        self._authenticated: Dict[str, bool] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "bytes": 0, "redirects": 0, "connections_created": 0, "connections_reused": 0}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="quadcode-http", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _count(self, name: str, value: int = 1) -> None:
+        self._stats[name] += value
+
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None:
+            trace = aiohttp.TraceConfig()
+
+            async def created(session, context, params):
+                self._count("connections_created")
+
+            async def reused(session, context, params):
+                self._count("connections_reused")
+
+            trace.on_connection_create_end.append(created)
+            trace.on_connection_reuseconn.append(reused)
+            self._headers = dict(self._headers_factory())
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0, limit_per_host=self.max_per_host, keepalive_timeout=60),
+                cookie_jar=aiohttp.CookieJar(),
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+                trace_configs=[trace],
+            )
+        return self._session
+
+    async def _get(self, url: str, start: int, end: int, retry_auth: bool = True) -> Tuple[int, Mapping[str, str], bytes]:
+        """GET bytes [start, end) of a URL, following redirects; returns the status, headers and body"""
+        session = await self._get_session()
+        origin = urlsplit(url).hostname
+        target = url
+        for _ in range(self.max_redirects + 1):
+            headers = {"Range": f"bytes={start}-{end - 1}"}
+            if urlsplit(target).hostname in (origin, *self.auth_hosts):
+                headers.update(self._headers)
+            async with session.get(target, headers=headers, allow_redirects=False) as response:
+                self._count("requests")
+                if response.status in _REDIRECTS:
+                    self._count("redirects")
+                    target = urljoin(target, response.headers["Location"])
+                    continue
+                if response.status == 401 and retry_auth:
+                    # Expired token: fetch fresh headers once
+                    self._headers = dict(self._headers_factory())
+                    return await self._get(url, start, end, retry_auth=False)
+                response.raise_for_status()
+                data = await response.read()
+                self._count("bytes", len(data))
+                return response.status, response.headers.copy(), data
+        raise IOError(f"Too many redirects reading {url}")
+
+    async def _get_authenticated(self, url: str, start: int, end: int) -> Tuple[int, Mapping[str, str], bytes]:
+        """
+        GET through _get, letting only the first request of a host go through
+        the login redirects: the others wait for its cookies instead of all
+        redoing the same dance at once
+        """
+        host = urlsplit(url).hostname
+        if self._authenticated.get(host):
+            return await self._get(url, start, end)
+        async with self._host_locks.setdefault(host, asyncio.Lock()):
+            result = await self._get(url, start, end)
+            self._authenticated[host] = True
+            return result
+
+    async def _read(self, url: str, start: int, end: int) -> bytes:
+        status, _, data = await self._get_authenticated(url, start, end)
+        # 200 means the server ignored the range and sent everything
+        return data[start:end] if status == 200 else data
+
+    async def _size(self, url: str) -> int:
+        status, headers, data = await self._get_authenticated(url, 0, 1)
+        content_range = headers.get("Content-Range", "")
+        if status == 206 and "/" in content_range:
+            return int(content_range.rsplit("/", 1)[1])
+        return len(data)
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+
+    def read_range(self, url: str, start: int, end: int) -> bytes:
+        """Read bytes [start, end) of a URL, blocking the calling thread"""
+        return self._submit(self._read(url, start, end)).result()
+
+    def read_ranges(self, url: str, ranges: Sequence[Tuple[int, int]]) -> List[bytes]:
+        """Read several [start, end) ranges of a URL concurrently, blocking the calling thread"""
+        async def gather():
+            return await asyncio.gather(*[self._read(url, start, end) for start, end in ranges])
+
+        return self._submit(gather()).result()
+
+    async def aread_range(self, url: str, start: int, end: int) -> bytes:
+        """Read bytes [start, end) of a URL from any event loop"""
+        return await asyncio.wrap_future(self._submit(self._read(url, start, end)))
+
+    def size(self, url: str) -> int:
+        """Size in bytes of the resource at a URL"""
+        return self._submit(self._size(url)).result()
+
+    def open(self, url: str, block_size: int = 1024 ** 2, max_blocks: int = 32) -> "RangeFile":
+        """Open a URL as a read-only, seekable binary file (see RangeFile)"""
+        return RangeFile(self, url, block_size=block_size, max_blocks=max_blocks)
+
+    def metrics(self) -> Dict:
+        """Requests, redirects and bytes read, and connections opened versus reused"""
+        return dict(self._stats)
+
+    def close(self) -> None:
+        """Close the pooled connections and stop the loop thread"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+
+class RangeFile(io.RawIOBase):
+    """
+    Read-only file over HTTP range reads, for h5py/h5netcdf and xarray.
+
+    Reads are served from an LRU cache of aligned blocks; the blocks a read
+    misses are fetched concurrently, contiguous ones as a single range.
+    HDF5 reads its metadata in many small pieces, which mostly fall in the
+    same few blocks.
+    """
+
+    def __init__(self, client: RangeClient, url: str, block_size: int = 1024 ** 2, max_blocks: int = 32):
+        """
+        Args:
+            client: Range client to read through
+            url: Resource URL
+            block_size: Size of the cached blocks
+            max_blocks: Blocks kept in the cache
+        """
+        super().__init__()
+        self.client = client
+        self.url = url
+        self.name = url
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self._size = client.size(url)
+        self._position = 0
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            self._position = offset
+        elif whence == os.SEEK_CUR:
+            self._position += offset
+        elif whence == os.SEEK_END:
+            self._position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        return self._position
+
+    def _fetch_blocks(self, first: int, last: int) -> None:
+        missing = [index for index in range(first, last + 1) if index not in self._blocks]
+        runs = []
+        for index in missing:
+            if runs and runs[-1][1] == index - 1:
+                runs[-1][1] = index
+            else:
+                runs.append([index, index])
+        ranges = [(a * self.block_size, min((b + 1) * self.block_size, self._size)) for a, b in runs]
+        for (a, b), data in zip(runs, self.client.read_ranges(self.url, ranges) if ranges else []):
+            for index in range(a, b + 1):
+                offset = (index - a) * self.block_size
+                self._blocks[index] = data[offset:offset + self.block_size]
+        for index in range(first, last + 1):
+            self._blocks.move_to_end(index)
+        while len(self._blocks) > max(self.max_blocks, last - first + 1):
+            self._blocks.popitem(last=False)
+
+    def read(self, size: int = -1) -> bytes:
+        start = self._position
+        end = self._size if size is None or size < 0 else min(start + size, self._size)
+        if start >= end:
+            return b""
+        first, last = start // self.block_size, (end - 1) // self.block_size
+        self._fetch_blocks(first, last)
+        data = b"".join(self._blocks[index] for index in range(first, last + 1))
+        offset = first * self.block_size
+        self._position = end
+        return data[start - offset:end - offset]
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def _earthdata_headers() -> Dict[str, str]:
+    """Authorization header of the earthaccess session, once logged in"""
+    import earthaccess
+
+    try:
+        session = earthaccess.get_requests_https_session()
+    except Exception as e:
+        logger.warning(f"No Earthdata session for range reads, reading anonymously: {e}")
+        return {}
+    return {key: value for key, value in session.headers.items() if key.lower() == "authorization"}
+
+
+@lru_cache(maxsize=1)
+def get_range_client() -> Optional[RangeClient]:
+    """
+    Get singleton RangeClient, or None when RANGE_CLIENT_ENABLED is false or
+    aiohttp is missing (remote granules are then opened by earthaccess).
+    Configured through RANGE_CLIENT_MAX_PER_HOST and RANGE_CLIENT_TIMEOUT_SECONDS.
+    """
+    if os.getenv("RANGE_CLIENT_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    if aiohttp is None:
+        logger.warning("aiohttp is not installed; remote granules are read through earthaccess")
+        return None
+    return RangeClient(
+        headers=_earthdata_headers,
+        max_per_host=int(os.getenv("RANGE_CLIENT_MAX_PER_HOST", "8")),
+        timeout_seconds=float(os.getenv("RANGE_CLIENT_TIMEOUT_SECONDS", "60")),
+    )
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Local cache of granule search results for periods whose data is final
+"""
+
+import json
+import os
+import tempfile
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import List, Optional
+import logging
+
+from earthaccess.results import DataGranule
+
+from quadcode.app.services.snapshot import SEARCHES, SnapshotBundle, get_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class SearchCache:
+    """
+    Stores the granules a CMR search returned, one JSON file per
+    (collection, version, start date, end date).
+
+    Only searches of periods ending more than final_after_days ago are
+    cached: their granules will not change, while recent periods may still
+    gain granules. Searches missing on disk are restored from the
+    warm-cache snapshot, if any. Granules are earthaccess DataGranule
+    dicts (CMR meta and UMM records), rebuilt on load.
+    """
+
+    def __init__(self, root_dir: str, final_after_days: int = 120, snapshot: Optional[SnapshotBundle] = None):
+        """
+        Args:
+            root_dir: Directory holding the search results
+            final_after_days: Age of a period's end after which its granules are final
+            snapshot: Warm-cache bundle restoring searches missing on disk
+        """
+        self.root_dir = root_dir
+        self.final_after_days = final_after_days
+        self.snapshot = snapshot
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _relative_path(self, short_name: str, version: str, start_date: str, end_date: str) -> str:
+        return f"{short_name}.{version}/{start_date}_{end_date}.json"
+
+    def is_final(self, end_date: str, today: Optional[date] = None) -> bool:
+        """Whether a period ending on end_date (YYYY-MM-DD) has final granules"""
+        today = today or date.today()
+        return today > date.fromisoformat(end_date) + timedelta(days=self.final_after_days)
+
+    def get(self, short_name: str, version: str, start_date: str, end_date: str) -> Optional[List]:
+        """Return the cached granules of a search, or None if it is not cached"""
+        relative = self._relative_path(short_name, version, start_date, end_date)
+        path = os.path.join(self.root_dir, relative)
+        if self.snapshot is not None and not os.path.exists(path):
+            try:
+                self.snapshot.restore(SEARCHES, relative, path)
+            except OSError as e:
+                logger.error(f"Could not restore search {relative} from the snapshot: {e}")
+        try:
+            with open(path) as f:
+                records = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.error(f"Corrupt search cache file {path}: {e}")
+            return None
+
+        return [DataGranule(record["granule"], cloud_hosted=record["cloud_hosted"]) for record in records]
+
+    def put(self, short_name: str, version: str, start_date: str, end_date: str, granules: List) -> None:
+        """Atomically store the granules of a search of a final period; others are ignored"""
+        if not self.is_final(end_date) or not all(isinstance(granule, dict) for granule in granules):
+            return
+        records = [
+            {"granule": dict(granule), "cloud_hosted": bool(getattr(granule, "cloud_hosted", False))}
+            for granule in granules
+        ]
+        path = os.path.join(self.root_dir, self._relative_path(short_name, version, start_date, end_date))
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(records, f)
+        os.replace(tmp_path, path)
+
+
+@lru_cache(maxsize=1)
+def get_search_cache() -> Optional[SearchCache]:
+    """
+    Get singleton instance of SearchCache.
+    Configured through SEARCH_CACHE_DIR and SEARCH_CACHE_FINAL_AFTER_DAYS;
+    setting SEARCH_CACHE_ENABLED=false searches CMR every time. Searches
+    missing on disk are restored from the SNAPSHOT_PATH bundle, if any.
+    """
+    if os.getenv("SEARCH_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    return SearchCache(
+        os.getenv("SEARCH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "quadcode", "searches")),
+        final_after_days=int(os.getenv("SEARCH_CACHE_FINAL_AFTER_DAYS", "120")),
+        snapshot=get_snapshot()
+    )
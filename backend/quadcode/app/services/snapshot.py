@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Warm-cache snapshot bundles: the hottest cached state of an instance in one memory-mapped file
+
+An instance that restarts loses its local caches, so the first queries
+after a wake pay full Earthdata latency again. A snapshot bundles the most
+recently used extracted point series, harvested point tiles, precomputed
+climatology tiles and granule search results into one versioned file that
+can be baked into the image or mounted. It is opened with mmap at startup
+and nothing is decoded up front: point series and tiles are looked up by
+binary search over sorted key arrays and read straight from the mapping,
+and files (climatology tiles, search results) are restored into their
+store on first use.
+
+Bundle layout:
+    magic b"QCSB", format version (uint32), header length (uint32)
+    header: JSON with the creation time, the point store layout (days per
+        year, harvested tile side), the variable names, the
+        [offset, dtype, shape] of every array section and the
+        [offset, length, mtime_ns] of every file, offsets relative to the data
+    data: sections aligned to 64 bytes
+        points.keys   int64 (n,) sorted keys of (variable, lat, lon, year)
+        points.values float32 (n, 366) daily series
+        tiles.keys    int64 (m,) sorted keys of (variable, block lat, block lon, day)
+        tiles.starts  int64 (m,) first year row of each tile in tiles.values
+        tiles.years   int32 (m,) year rows of each tile
+        tiles.values  float32 (rows, side, side)
+        files         raw bytes of the bundled files
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from quadcode.app.core.grid import DAYS_PER_YEAR
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"QCSB"
+_VERSION = 1
+_PREAMBLE = struct.Struct("<4sII")
+_ALIGN = 64
+
+# Bits of the grid indices, years since _YEAR_BASE and day indices packed into keys
+_INDEX_BITS = 14
+_YEAR_BITS = 10
+_DAY_BITS = 9
+_YEAR_BASE = 1900
+
+# Namespaces of bundled files, relative to their store's directory
+CLIMATOLOGY = "climatology"
+SEARCHES = "searches"
+
+# Bundleable entry: (last use, size, kind, identity, mtime_ns of files, load)
+_Entry = Tuple[float, int, str, object, int, Callable]
+
+
+def _point_key(variable: int, lat_idx: int, lon_idx: int, year: int) -> int:
+    return (((variable << _INDEX_BITS | lat_idx) << _INDEX_BITS | lon_idx) << _YEAR_BITS) | (year - _YEAR_BASE)
+
+
+def _tile_key(variable: int, block_lat: int, block_lon: int, day_index: int) -> int:
+    return (((variable << _INDEX_BITS | block_lat) << _INDEX_BITS | block_lon) << _DAY_BITS) | day_index
+
+
+def _unpack(key: int, last_bits: int) -> Tuple[int, int, int, int]:
+    """Fields of a point or tile key; the last one relative to its base"""
+    last = key & ((1 << last_bits) - 1)
+    key >>= last_bits
+    second = key & ((1 << _INDEX_BITS) - 1)
+    key >>= _INDEX_BITS
+    first = key & ((1 << _INDEX_BITS) - 1)
+    return key >> _INDEX_BITS, first, second, last
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+class SnapshotBundle:
+    """
+    Read-only view of a snapshot bundle through a shared memory mapping.
+
+    Opening parses only the preamble and the JSON header; array sections
+    are numpy views of the mapping, so the OS pages in just what lookups
+    touch and processes mapping the same bundle share those pages.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Bundle file
+
+        Raises:
+            ValueError: If the file is not a bundle of this format version
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+        self.header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + length])
+        if self.header["days"] != DAYS_PER_YEAR:
+            raise ValueError(f"Snapshot {path} has {self.header['days']} days per year")
+
+        self._data_start = _aligned(_PREAMBLE.size + length)
+        self._variables = {name: i for i, name in enumerate(self.header["variables"])}
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._hits = {"points": 0, "tiles": 0, "files": 0}
+        self._lock = threading.Lock()
+
+    def _array(self, name: str) -> np.ndarray:
+        array = self._arrays.get(name)
+        if array is None:
+            offset, dtype, shape = self.header["sections"][name]
+            array = np.frombuffer(
+                self._mmap, dtype=dtype, count=int(np.prod(shape)), offset=self._data_start + offset
+            ).reshape(shape)
+            self._arrays[name] = array
+        return array
+
+    def _find(self, section: str, key: int) -> Optional[int]:
+        keys = self._array(section)
+        row = int(np.searchsorted(keys, key))
+        return row if row < len(keys) and keys[row] == key else None
+
+    def _count(self, kind: str) -> None:
+        with self._lock:
+            self._hits[kind] += 1
+
+    def get_year(self, variable: str, lat_idx: int, lon_idx: int, year: int) -> Optional[np.ndarray]:
+        """Bundled daily series of a cell and year (see PointStore.get_year), or None"""
+        index = self._variables.get(variable)
+        if index is None or not self.header["sections"].get("points.keys"):
+            return None
+        row = self._find("points.keys", _point_key(index, lat_idx, lon_idx, year))
+        if row is None:
+            return None
+        self._count("points")
+        return self._array("points.values")[row].copy()
+
+    def get_tile(self, variable: str, tile_cells: int, block_lat: int, block_lon: int,
+                 day_index: int) -> Optional[np.ndarray]:
+        """Bundled (year, lat, lon) harvested tile of a block and day, or None"""
+        index = self._variables.get(variable)
+        if index is None or tile_cells != self.header["tile_cells"] or not self.header["sections"].get("tiles.keys"):
+            return None
+        row = self._find("tiles.keys", _tile_key(index, block_lat, block_lon, day_index))
+        if row is None:
+            return None
+        self._count("tiles")
+        start = int(self._array("tiles.starts")[row])
+        return self._array("tiles.values")[start:start + int(self._array("tiles.years")[row])].copy()
+
+    def list_files(self, namespace: str, directory: str) -> List[str]:
+        """Names of the bundled files of a namespace directly inside a relative directory"""
+        prefix = f"{namespace}/{directory}/"
+        return sorted(
+            name[len(prefix):] for name in self.header["files"]
+            if name.startswith(prefix) and "/" not in name[len(prefix):]
+        )
+
+    def _file(self, offset: int, length: int) -> memoryview:
+        start = self._data_start + self.header["sections"]["files"][0] + offset
+        return memoryview(self._mmap)[start:start + length]
+
+    def entries(self) -> Iterator[Tuple[str, object, int, int, Callable]]:
+        """
+        Every bundled entry as (kind, identity, size, mtime_ns, load), for
+        carrying entries over into a new bundle (see write_snapshot)
+        """
+        variables = self.header["variables"]
+        sections = self.header["sections"]
+        if "points.keys" in sections:
+            values = self._array("points.values")
+            for row, key in enumerate(self._array("points.keys").tolist()):
+                variable, lat_idx, lon_idx, year = _unpack(key, _YEAR_BITS)
+                yield ("point", (variables[variable], lat_idx, lon_idx, year + _YEAR_BASE),
+                       values[row].nbytes, 0, partial(values.__getitem__, row))
+        if "tiles.keys" in sections:
+            starts, years, values = self._array("tiles.starts"), self._array("tiles.years"), self._array("tiles.values")
+            for row, key in enumerate(self._array("tiles.keys").tolist()):
+                variable, block_lat, block_lon, day_index = _unpack(key, _DAY_BITS)
+                rows = slice(int(starts[row]), int(starts[row] + years[row]))
+                yield ("tile", (variables[variable], block_lat, block_lon, day_index),
+                       values[rows].nbytes, 0, partial(values.__getitem__, rows))
+        for name, (offset, length, mtime_ns) in self.header["files"].items():
+            yield "file", name, length, mtime_ns, partial(self._file, offset, length)
+
+    def restore(self, namespace: str, relative_path: str, path: str) -> bool:
+        """
+        Write a bundled file to its store path, atomically and with its original modification time
+
+        Returns:
+            Whether the bundle holds the file
+        """
+        entry = self.header["files"].get(f"{namespace}/{relative_path}")
+        if entry is None:
+            return False
+        offset, length, mtime_ns = entry
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._file(offset, length))
+        os.utime(tmp_path, ns=(mtime_ns, mtime_ns))
+        os.replace(tmp_path, path)
+        self._count("files")
+        return True
+
+    def metrics(self) -> Dict:
+        """Bundle identity, entry counts and lookups served per kind"""
+        sections = self.header["sections"]
+        with self._lock:
+            hits = dict(self._hits)
+        return {
+            "path": self.path,
+            "created": self.header["created"],
+            "points": sections["points.keys"][2][0] if "points.keys" in sections else 0,
+            "tiles": sections["tiles.keys"][2][0] if "tiles.keys" in sections else 0,
+            "files": len(self.header["files"]),
+            "hits": hits,
+        }
+
+
+def _recency(stat: os.stat_result) -> float:
+    """Last use of a cache file: reads update atime (at least daily under relatime), writes mtime"""
+    return max(stat.st_atime, stat.st_mtime)
+
+
+def _scan(root: str) -> List[Tuple[str, os.stat_result]]:
+    """Relative paths and stats of the files under a directory, skipping in-flight temporaries"""
+    found = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                found.append((os.path.relpath(path, root).replace(os.sep, "/"), os.stat(path)))
+            except FileNotFoundError:
+                continue
+    return found
+
+
+def _reader(path: str) -> Callable[[], bytes]:
+    def read() -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+    return read
+
+
+def _candidates(points_dir: Optional[str], tile_cells: int, climatology_dir: Optional[str],
+                searches_dir: Optional[str]) -> List[_Entry]:
+    """Every bundleable entry of the stores on disk, with its last use"""
+    found = []
+    if points_dir and os.path.isdir(points_dir):
+        for relative, stat in _scan(points_dir):
+            parts = relative.split("/")
+            if not relative.endswith(".npy"):
+                continue
+            load = partial(np.load, os.path.join(points_dir, relative))
+            try:
+                if len(parts) == 3:
+                    lat_idx, lon_idx = map(int, parts[1].split("_"))
+                    identity = (parts[0], lat_idx, lon_idx, int(parts[2][:-4]))
+                    found.append((_recency(stat), stat.st_size, "point", identity, 0, load))
+                elif len(parts) == 4 and parts[1] == f"tiles-{tile_cells}":
+                    block_lat, block_lon = map(int, parts[2].split("_"))
+                    identity = (parts[0], block_lat, block_lon, int(parts[3][:-4]))
+                    found.append((_recency(stat), stat.st_size, "tile", identity, 0, load))
+            except ValueError:
+                continue
+    for namespace, root, suffix in ((CLIMATOLOGY, climatology_dir, ".qct"), (SEARCHES, searches_dir, ".json")):
+        if root and os.path.isdir(root):
+            for relative, stat in _scan(root):
+                if relative.endswith(suffix):
+                    found.append((_recency(stat), stat.st_size, "file", f"{namespace}/{relative}",
+                                  stat.st_mtime_ns, _reader(os.path.join(root, relative))))
+    return found
+
+
+def write_snapshot(
+    path: str,
+    points_dir: Optional[str] = None,
+    tile_cells: int = 0,
+    climatology_dir: Optional[str] = None,
+    searches_dir: Optional[str] = None,
+    base: Optional[SnapshotBundle] = None,
+    max_bytes: int = 256 * 1024 ** 2
+) -> Dict:
+    """
+    Bundle the most recently used cache entries into a snapshot, atomically
+
+    Entries of every kind compete for the size budget by last use, so a
+    bundle of an instance mostly answering point queries is mostly point
+    series, and one serving global climatologies mostly tiles. Entries of
+    a base bundle that are not on disk, such as those an instance started
+    from its snapshot served without rewriting, are carried over after them.
+
+    Args:
+        path: Bundle file to write
+        points_dir: Point store directory (series and harvested tiles)
+        tile_cells: Side of the harvested tiles to bundle
+        climatology_dir: Climatology tile directory
+        searches_dir: Granule search cache directory
+        base: Bundle whose entries fill the budget left
+        max_bytes: Size budget of the bundled entries
+
+    Returns:
+        Summary with the entries bundled per kind and the file size
+    """
+    found = _candidates(points_dir, tile_cells, climatology_dir, searches_dir)
+    if base is not None:
+        on_disk = {(kind, identity) for _, _, kind, identity, _, _ in found}
+        for kind, identity, size, mtime_ns, load in base.entries():
+            if (kind, identity) not in on_disk and (kind != "tile" or base.header["tile_cells"] == tile_cells):
+                found.append((-1.0, size, kind, identity, mtime_ns, load))
+
+    chosen: Dict[str, List[_Entry]] = {"point": [], "tile": [], "file": []}
+    total = 0
+    for entry in sorted(found, key=lambda entry: -entry[0]):
+        if total + entry[1] <= max_bytes:
+            chosen[entry[2]].append(entry)
+            total += entry[1]
+
+    variables = sorted({entry[3][0] for entry in chosen["point"] + chosen["tile"]})
+    index = {name: i for i, name in enumerate(variables)}
+    limit = 1 << _INDEX_BITS
+
+    points = []
+    for _, _, _, (variable, lat_idx, lon_idx, year), _, load in chosen["point"]:
+        if lat_idx >= limit or lon_idx >= limit or not 0 <= year - _YEAR_BASE < 1 << _YEAR_BITS:
+            continue
+        try:
+            values = np.asarray(load(), dtype=np.float32)
+        except (OSError, ValueError):
+            continue
+        if values.shape == (DAYS_PER_YEAR,):
+            points.append((_point_key(index[variable], lat_idx, lon_idx, year), values))
+    points.sort(key=lambda entry: entry[0])
+
+    tiles = []
+    for _, _, _, (variable, block_lat, block_lon, day_index), _, load in chosen["tile"]:
+        if block_lat >= limit or block_lon >= limit:
+            continue
+        try:
+            tile = np.asarray(load(), dtype=np.float32)
+        except (OSError, ValueError):
+            continue
+        if tile.ndim == 3 and tile.shape[1:] == (tile_cells, tile_cells):
+            tiles.append((_tile_key(index[variable], block_lat, block_lon, day_index), tile))
+    tiles.sort(key=lambda entry: entry[0])
+
+    arrays = {}
+    if points:
+        arrays["points.keys"] = np.array([key for key, _ in points], dtype=np.int64)
+        arrays["points.values"] = np.stack([values for _, values in points])
+    if tiles:
+        years = np.array([tile.shape[0] for _, tile in tiles], dtype=np.int32)
+        arrays["tiles.keys"] = np.array([key for key, _ in tiles], dtype=np.int64)
+        arrays["tiles.starts"] = np.concatenate([[0], np.cumsum(years)[:-1]]).astype(np.int64)
+        arrays["tiles.years"] = years
+        arrays["tiles.values"] = np.concatenate([tile for _, tile in tiles])
+
+    # Lay out the array sections, then the files one after the other
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = [offset, array.dtype.str, list(array.shape)]
+        offset = _aligned(offset + array.nbytes)
+    files = {}
+    file_offset = 0
+    for _, size, _, name, mtime_ns, _ in chosen["file"]:
+        files[name] = [file_offset, size, mtime_ns]
+        file_offset += size
+    sections["files"] = [offset, "|u1", [file_offset]]
+
+    header = json.dumps({
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "days": DAYS_PER_YEAR,
+        "tile_cells": tile_cells,
+        "variables": variables,
+        "sections": sections,
+        "files": files,
+    }).encode()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(_MAGIC, _VERSION, len(header)))
+            f.write(header)
+            data_start = _aligned(f.tell())
+            for name, array in arrays.items():
+                f.seek(data_start + sections[name][0])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.seek(data_start + sections["files"][0])
+            for _, size, _, name, _, load in chosen["file"]:
+                data = load()
+                if len(data) != size:
+                    raise IOError(f"{name} changed while bundling it")
+                f.write(data)
+            f.truncate()
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return {
+        "path": path,
+        "points": len(points),
+        "tiles": len(tiles),
+        "climatology_tiles": sum(1 for entry in chosen["file"] if entry[3].startswith(f"{CLIMATOLOGY}/")),
+        "searches": sum(1 for entry in chosen["file"] if entry[3].startswith(f"{SEARCHES}/")),
+        "bytes": os.path.getsize(path),
+    }
+
+
+def export_snapshot(path: str, max_bytes: int = 256 * 1024 ** 2) -> Dict:
+    """
+    Bundle the stores this process is configured with (point store,
+    climatology tiles, search cache), carrying over its own snapshot
+
+    Returns:
+        Summary of write_snapshot
+    """
+    # Imported here: the stores themselves read from snapshots
+    from quadcode.app.services.climatology import get_climatology_store
+    from quadcode.app.services.point_store import get_point_store
+    from quadcode.app.services.search_cache import get_search_cache
+
+    point_store = get_point_store()
+    climatology = get_climatology_store()
+    searches = get_search_cache()
+    return write_snapshot(
+        path,
+        points_dir=point_store.root_dir,
+        tile_cells=point_store.tile_cells,
+        climatology_dir=climatology.root_dir if climatology is not None else None,
+        searches_dir=searches.root_dir if searches is not None else None,
+        base=get_snapshot(),
+        max_bytes=max_bytes
+    )
+
+
+@lru_cache(maxsize=1)
+def get_snapshot() -> Optional[SnapshotBundle]:
+    """
+    Get the singleton SnapshotBundle mapped from SNAPSHOT_PATH, or None when
+    it is unset, missing or of another format version
+    """
+    path = os.getenv("SNAPSHOT_PATH")
+    if not path:
+        return None
+    try:
+        bundle = SnapshotBundle(path)
+    except FileNotFoundError:
+        logger.info(f"Snapshot {path} not found; starting cold")
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Unusable snapshot {path}, starting cold: {e}")
+        return None
+    logger.info(f"Mapped snapshot {path} created {bundle.header['created']}")
+    return bundle
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Continuous daily time series at one location: planning contiguous reads and streaming the days in order
+"""
+
+import os
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+import logging
+
+from quadcode.app.models.timeseries import TimeSeriesRequest
+from quadcode.app.models.weather import DayOfYear
+from quadcode.app.services.earthdata_service import EarthdataService
+from quadcode.app.services.export_service import ordered
+from quadcode.app.services.point_store import PointStore
+from quadcode.app.services.calendar_service import Run, missing_runs, read_runs
+from quadcode.app.services.query_service import CLOSED_RANGE_LAG_DAYS, format_coordinate
+from quadcode.app.core.export import ExportFormat, Schema
+from quadcode.app.core.grid import (
+    canonical_location,
+    day_from_index,
+    day_of_year_index,
+    day_of_year_indices
+)
+from quadcode.app.core.http_cache import strong_etag
+from quadcode.app.core.registry import get_variable, resolve_variables
+from quadcode.app.core.serialization import Columns
+
+logger = logging.getLogger(__name__)
+
+# Longest range served, in days
+TIMESERIES_MAX_DAYS = int(os.getenv("TIMESERIES_MAX_DAYS", "20000"))
+
+# Years read ahead of the one being sent
+TIMESERIES_READ_AHEAD = int(os.getenv("TIMESERIES_READ_AHEAD", "4"))
+
+# Revision of the time series layout, part of every entity tag
+TIMESERIES_REVISION = "1"
+
+
+@dataclass
+class TimeSeriesPlan:
+    """Requested days of a time series by year, their stored series and the reads left to do"""
+    variables: List[str]
+    days: Dict[int, np.ndarray]
+    rows: Dict[Tuple[str, int], Optional[np.ndarray]] = field(default_factory=dict)
+    runs: Dict[int, List[Run]] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        """Whether every expected day is in the point store, so nothing is read from Earthdata"""
+        return not any(self.runs.values())
+
+    @property
+    def day_count(self) -> int:
+        return sum(len(days) for days in self.days.values())
+
+
+def parse_window(spec: Optional[str]) -> Tuple[Optional[DayOfYear], Optional[DayOfYear]]:
+    """
+    Parse a calendar window given as MM-DD..MM-DD, e.g. "03-01..05-31"
+
+    Raises:
+        ValueError: If the window is malformed
+    """
+    if not spec:
+        return None, None
+    bounds = spec.split("..")
+    if len(bounds) != 2:
+        raise ValueError(f"Invalid window {spec!r}; expected MM-DD..MM-DD")
+    days = []
+    for bound in bounds:
+        month, _, day = bound.partition("-")
+        try:
+            days.append(DayOfYear(month=int(month), day=int(day)))
+        except ValueError:
+            raise ValueError(f"Invalid window {spec!r}; expected MM-DD..MM-DD")
+    return days[0], days[1]
+
+
+def requested_days(request: TimeSeriesRequest) -> Dict[int, np.ndarray]:
+    """
+    Days of a request grouped by year, as day indices (see day_of_year_index) in date order
+
+    Raises:
+        ValueError: If the range is longer than TIMESERIES_MAX_DAYS
+    """
+    count = (request.end_date - request.start_date).days + 1
+    if count > TIMESERIES_MAX_DAYS:
+        raise ValueError(f"Date range of {count} days exceeds the maximum of {TIMESERIES_MAX_DAYS}")
+
+    dates = np.arange(np.datetime64(request.start_date), np.datetime64(request.end_date) + 1)
+    months = dates.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]").astype(int) + 1970
+    indices = day_of_year_indices(months.astype(int) % 12 + 1, (dates - months).astype(int) + 1)
+
+    if request.window_start is not None:
+        first = day_of_year_index(request.window_start.month, request.window_start.day)
+        last = day_of_year_index(request.window_end.month, request.window_end.day)
+        keep = (indices >= first) & (indices <= last) if first <= last else (indices >= first) | (indices <= last)
+        years, indices = years[keep], indices[keep]
+
+    return {int(year): indices[years == year] for year in np.unique(years)}
+
+
+def _cell(variable: str, lat: float, lon: float) -> Tuple[int, int]:
+    lat_idx, lon_idx, _, _ = get_variable(variable).collection.grid.snap(lat, lon)
+    return lat_idx, lon_idx
+
+
+def plan_timeseries(request: TimeSeriesRequest, store: PointStore) -> TimeSeriesPlan:
+    """
+    Plan a time series: load what the point store holds and group the
+    missing days of each collection into contiguous date ranges, one read each
+
+    Raises:
+        ValueError: If the range is too long
+    """
+    lat, lon = request.location.lat, request.location.lon
+    plan = TimeSeriesPlan(
+        variables=[get_variable(variable).name for variable in request.variables],
+        days=requested_days(request)
+    )
+
+    for year, indices in plan.days.items():
+        rows = {variable: store.get_year(variable, *_cell(variable, lat, lon), year) for variable in plan.variables}
+        plan.rows.update({(variable, year): row for variable, row in rows.items()})
+        plan.runs[year] = missing_runs(rows, year, indices)
+    return plan
+
+
+def timeseries_schema(request: TimeSeriesRequest) -> Schema:
+    """Columns of a time series: the date, then a value and a missing flag per variable"""
+    schema: Schema = [("date", "string")]
+    for variable in request.variables:
+        schema += [(variable.value, "float"), (f"{variable.value}_missing", "bool")]
+    return schema
+
+
+async def timeseries_batches(
+    request: TimeSeriesRequest,
+    plan: TimeSeriesPlan,
+    service: EarthdataService,
+    store: PointStore
+) -> AsyncIterator[Columns]:
+    """
+    Days of a planned time series in date order, one row group per year.
+
+    The planned reads of up to TIMESERIES_READ_AHEAD years run at once,
+    each one search and its granules read concurrently under the fetch
+    scheduler, and what they return is merged into the point store, so
+    /query and later series find it there. A read that fails leaves its
+    days missing; an open circuit ends the series.
+    """
+    lat, lon = request.location.lat, request.location.lon
+    names = [variable.value for variable in request.variables]
+
+    async def load(year: int) -> Tuple[int, Dict[str, Optional[np.ndarray]]]:
+        rows = {variable: plan.rows.get((variable, year)) for variable in plan.variables}
+        runs = plan.runs.get(year)
+        if not runs:
+            return year, rows
+
+        await read_runs(service, store, runs, lat, lon, year)
+        for variable in plan.variables:
+            rows[variable] = store.get_year(variable, *_cell(variable, lat, lon), year)
+        return year, rows
+
+    async for year, rows in ordered(plan.days, load, TIMESERIES_READ_AHEAD):
+        indices = plan.days[year]
+        columns = {"date": [date(year, *day_from_index(index)).isoformat() for index in indices.tolist()]}
+        for name, variable in zip(names, plan.variables):
+            row = rows[variable]
+            values = np.full(len(indices), np.nan) if row is None else row[indices].astype(np.float64)
+            missing = np.isnan(values)
+            columns[name] = [None if gap else value for value, gap in zip(values.tolist(), missing.tolist())]
+            columns[f"{name}_missing"] = missing.tolist()
+        yield columns
+
+
+def canonical_timeseries(request: TimeSeriesRequest, fmt: ExportFormat) -> str:
+    """
+    Canonical query string of GET /timeseries: the location snapped to the
+    grid cells read (see canonical_location), the window zero-padded,
+    variables sorted and the default format left out
+
+    Returns:
+        Query string without the leading "?"
+    """
+    variables = sorted({variable.value for variable in request.variables})
+    lat, lon = canonical_location(
+        (get_variable(variable).collection.grid for variable in variables),
+        request.location.lat,
+        request.location.lon
+    )
+
+    params = [
+        ("lat", format_coordinate(lat)),
+        ("lon", format_coordinate(lon)),
+        ("start_date", request.start_date.isoformat()),
+        ("end_date", request.end_date.isoformat()),
+    ]
+    if request.window_start is not None:
+        params.append(("window", f"{request.window_start.month:02d}-{request.window_start.day:02d}.."
+                                 f"{request.window_end.month:02d}-{request.window_end.day:02d}"))
+    params.append(("variables", ",".join(variables)))
+    if fmt != ExportFormat.NDJSON:
+        params.append(("format", fmt.value))
+    return "&".join(f"{name}={value}" for name, value in params)
+
+
+def date_range_closed(end_date: date, today: Optional[date] = None) -> bool:
+    """Whether every day of a range ending on end_date has final data"""
+    today = today or date.today()
+    return today > end_date + timedelta(days=CLOSED_RANGE_LAG_DAYS)
+
+
+def timeseries_etag(request: TimeSeriesRequest, canonical: str) -> str:
+    """
+    Strong entity tag of a time series, known before it is read: the
+    canonical query (format included) and the versions of the collections read
+    """
+    datasets = sorted({
+        f"{spec.collection.short_name}.{spec.collection.version}"
+        for spec in resolve_variables([variable.value for variable in request.variables])
+    })
+    return strong_etag(TIMESERIES_REVISION, canonical, datasets)
@@ -3,26 +3,55 @@
 FastAPI application entry point for Weather Probability Dashboard
 """
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 import os
 
 from quadcode.app.api.v1.weather import router as weather_router
+from quadcode.app.api.v1.jobs import router as jobs_router
+from quadcode.app.api.v1.admin import router as admin_router
+from quadcode.app.api.v1.export import router as export_router
+from quadcode.app.core.profiling import ProfilingMiddleware
+from quadcode.app.core.logs import CorrelationIdMiddleware, configure_logging, shutdown_logging
+from quadcode.app.core.memory import MemoryReportMiddleware, current_rss
+from quadcode.app.services.job_service import get_job_manager
+from quadcode.app.services.fetch_policy import get_fetch_policy
+from quadcode.app.services.granule_budget import get_granule_budget
+from quadcode.app.services.fetch_scheduler import FetchContextMiddleware, get_fetch_scheduler
+from quadcode.app.services.range_client import get_range_client
+from quadcode.app.services.snapshot import get_snapshot
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: structured records written by a background thread
+configure_logging()
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Map the warm-cache snapshot and resume unfinished background jobs on
+    startup, and stop workers and connections on shutdown
+    """
+    get_snapshot()
+    job_manager = get_job_manager()
+    job_manager.resume()
+    yield
+    job_manager.shutdown()
+    range_client = get_range_client()
+    if range_client is not None:
+        range_client.close()
+    shutdown_logging()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Weather Probability Dashboard API",
     description="API for querying historical weather data and probabilities from NASA Earthdata",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for frontend
@@ -45,8 +74,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in profiling: X-Profile with X-Admin-Token, or a sampled share of requests
+app.add_middleware(
+    ProfilingMiddleware,
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    slow_seconds=float(os.getenv("PROFILE_SLOW_SECONDS", "5")),
+    interval_seconds=float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005")),
+)
+
+# Peak RSS of each query in X-Peak-RSS-Bytes
+app.add_middleware(MemoryReportMiddleware)
+
+# Fetch scheduler lane and client of each request
+app.add_middleware(FetchContextMiddleware)
+
+# Outermost, so every log line of a request carries its correlation ID
+app.add_middleware(CorrelationIdMiddleware)
+
 # Include routers
 app.include_router(weather_router, prefix="/api/v1/weather", tags=["weather"])
+app.include_router(jobs_router, prefix="/api/v1/jobs", tags=["jobs"])
+app.include_router(admin_router, prefix="/api/v1/admin", tags=["admin"])
+app.include_router(export_router, prefix="/api/v1/export", tags=["export"])
 
 
 @app.get("/")
@@ -65,6 +114,25 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/api/v1/metrics")
+async def metrics():
+    """
+    Fetch layer counters (calls, retries, hedges, timeouts, failures) and circuit
+    states per collection, fetch scheduler queues and waits per lane, range
+    client requests and connection reuse, warm-cache snapshot hits, process RSS
+    and the open-granule budget
+    """
+    range_client = get_range_client()
+    snapshot = get_snapshot()
+    return {
+        "fetch": get_fetch_policy().metrics(),
+        "scheduler": get_fetch_scheduler().metrics(),
+        "http": range_client.metrics() if range_client is not None else None,
+        "snapshot": snapshot.metrics() if snapshot is not None else None,
+        "memory": {"rss_bytes": current_rss(), "granules": get_granule_budget().metrics()}
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
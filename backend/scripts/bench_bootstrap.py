@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the latency bootstrap confidence intervals add to a query
+
+Usage (from backend/):
+    python -m scripts.bench_bootstrap [--variables 4] [--thresholds 2] [--repeat 50]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from quadcode.app.core.utils import compute_bootstrap_intervals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--variables", type=int, default=4)
+    parser.add_argument("--thresholds", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    thresholds = {f"t{i}": float(18 + i) for i in range(args.thresholds)}
+
+    print(f"{'years':>6}{'resamples':>11}{'ms/request':>12}")
+    for years in (5, 20, 40):
+        year_list = np.arange(2024 - years + 1, 2025)
+        series = [20 + 0.05 * (year_list - year_list[0]) + rng.normal(0, 2, years) for _ in range(args.variables)]
+        for resamples in (1000, 2000, 10000):
+            compute_bootstrap_intervals(series[0], year_list, thresholds, resamples, seed=0)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                for values in series:
+                    compute_bootstrap_intervals(values, year_list, thresholds, resamples, seed=0)
+            ms = (time.perf_counter() - start) / args.repeat * 1000
+            print(f"{years:>6}{resamples:>11}{ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
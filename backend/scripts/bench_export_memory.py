@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the peak memory of an export: streamed row groups versus one table built in memory
+
+Synthetic daily series (one row group per year, one column per variable)
+are encoded without any data I/O; each run uses a fresh process so its
+peak RSS is its own.
+
+Usage (from backend/):
+    python -m scripts.bench_export_memory [--years 400] [--variables 7] [--formats csv parquet arrow]
+"""
+
+import argparse
+import asyncio
+import io
+import multiprocessing
+import time
+from datetime import date, timedelta
+from typing import AsyncIterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+from quadcode.app.core.export import ExportFormat, stream_table
+from quadcode.app.core.memory import RssSampler
+from quadcode.app.core.serialization import Columns
+
+
+def year_columns(year: int, variables: int) -> Columns:
+    start = date(1000 + year, 1, 1)
+    rng = np.random.default_rng(year)
+    columns = {"date": [(start + timedelta(days=i)).isoformat() for i in range(365)]}
+    for k in range(variables):
+        columns[f"v{k}"] = rng.random(365).tolist()
+    return columns
+
+
+async def batches(years: int, variables: int) -> AsyncIterator[Columns]:
+    for year in range(years):
+        yield year_columns(year, variables)
+
+
+def run_streamed(years: int, variables: int, fmt: ExportFormat) -> int:
+    schema = [("date", "string")] + [(f"v{k}", "float") for k in range(variables)]
+
+    async def consume() -> int:
+        size = 0
+        async for chunk in stream_table(batches(years, variables), schema, fmt):
+            size += len(chunk)
+        return size
+
+    return asyncio.run(consume())
+
+
+def run_buffered(years: int, variables: int, fmt: ExportFormat) -> int:
+    frame = pd.concat([pd.DataFrame(year_columns(year, variables)) for year in range(years)], ignore_index=True)
+    buffer = io.BytesIO()
+    if fmt == ExportFormat.CSV:
+        buffer.write(frame.to_csv(index=False).encode())
+    elif fmt == ExportFormat.PARQUET:
+        frame.to_parquet(buffer, compression="zstd")
+    else:
+        import pyarrow as pa
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        with pa.ipc.new_stream(buffer, table.schema) as writer:
+            writer.write_table(table)
+    return len(buffer.getvalue())
+
+
+def run_mode(args: Tuple[str, int, int, str]) -> Tuple[float, int, int]:
+    mode, years, variables, fmt = args
+    sampler = RssSampler(0.005)
+    tracker = sampler.start()
+    start = time.perf_counter()
+    run = run_streamed if mode == "streamed" else run_buffered
+    size = run(years, variables, ExportFormat(fmt))
+    elapsed = time.perf_counter() - start
+    sampler.stop(tracker)
+    return elapsed, tracker.peak_rss - tracker.start_rss, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, default=400)
+    parser.add_argument("--variables", type=int, default=7)
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "arrow"])
+    args = parser.parse_args()
+
+    print(f"{args.years * 365} rows, {args.variables} variables")
+    print(f"{'format':>8}{'mode':>10}{'seconds':>10}{'+MiB':>8}{'MiB out':>10}")
+    context = multiprocessing.get_context("spawn")
+    for fmt in args.formats:
+        for mode in ("buffered", "streamed"):
+            with context.Pool(1) as pool:
+                elapsed, delta, size = pool.apply(run_mode, ((mode, args.years, args.variables, fmt),))
+            print(f"{fmt:>8}{mode:>10}{elapsed:>10.2f}{delta / 2 ** 20:>8.1f}{size / 2 ** 20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark of vectorized extreme-value fits over many series against fitting them one at a time
+
+Usage (from backend/):
+    python -m scripts.bench_extremes [--series 10000] [--looped 500] [--repeat 5]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from quadcode.app.core.extremes import compute_extremes_matrix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--series", type=int, default=10000)
+    parser.add_argument("--looped", type=int, default=500, help="Series fitted one at a time, to extrapolate from")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    thresholds = {"hot": 35.0, "cold": 5.0}
+
+    print(f"{'method':>7}{'years':>7}{'vectorized ms':>15}{'looped ms':>11}{'speedup':>9}")
+    for method in ("gev", "pot"):
+        for years in (5, 20, 40):
+            # GEV samples with shapes spread over typical values, 5% missing
+            shape = rng.uniform(-0.3, 0.3, args.series)
+            u = rng.random((years, args.series))
+            matrix = 25 + 3 / shape * ((-np.log(u)) ** -shape - 1)
+            matrix[rng.random(matrix.shape) < 0.05] = np.nan
+
+            compute_extremes_matrix(matrix, method, thresholds)
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                compute_extremes_matrix(matrix, method, thresholds)
+            vectorized = (time.perf_counter() - start) / args.repeat * 1000
+
+            looped = min(args.looped, args.series)
+            start = time.perf_counter()
+            for column in range(looped):
+                compute_extremes_matrix(matrix[:, column:column + 1], method, thresholds)
+            looped_ms = (time.perf_counter() - start) * 1000 * args.series / looped
+
+            print(f"{method:>7}{years:>7}{vectorized:>15.1f}{looped_ms:>11.0f}{looped_ms / vectorized:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark of interactive query latency under mixed load: one FIFO queue versus the fair-share fetch scheduler
+
+Fetches are simulated with a fixed service time, so only queueing is
+measured. A batch client queues a long backfill, a prefetch worker warms
+tiles, and interactive users issue small queries (a few fetches each,
+gathered like a query over years) at random intervals.
+
+Usage (from backend/):
+    python -m scripts.bench_fetch_scheduler [--slots 8] [--fetch-ms 20] [--batch-fetches 4000] \\
+        [--users 6] [--queries 20]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from quadcode.app.services.fetch_scheduler import FetchLane, FetchScheduler, fetch_context
+
+
+async def fetch(scheduler: FetchScheduler, seconds: float) -> None:
+    async with scheduler.slot():
+        await asyncio.sleep(seconds)
+
+
+async def batch_client(scheduler: FetchScheduler, count: int, seconds: float, lane: FetchLane, client: str) -> float:
+    with fetch_context(lane, client):
+        start = time.perf_counter()
+        await asyncio.gather(*[fetch(scheduler, seconds) for _ in range(count)])
+        return time.perf_counter() - start
+
+
+async def interactive_user(scheduler: FetchScheduler, user: int, queries: int, fanout: int,
+                           seconds: float, lane: FetchLane, fifo: bool) -> List[float]:
+    rng = random.Random(user)
+    latencies = []
+    with fetch_context(lane, "fifo" if fifo else f"user-{user}"):
+        for _ in range(queries):
+            await asyncio.sleep(rng.uniform(0.05, 0.3))
+            start = time.perf_counter()
+            await asyncio.gather(*[fetch(scheduler, seconds) for _ in range(fanout)])
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run(mode: str, args: argparse.Namespace) -> Tuple[np.ndarray, float]:
+    seconds = args.fetch_ms / 1000
+    fifo = mode == "fifo"
+    if fifo:
+        # Everything in one lane under one client: plain arrival order
+        scheduler = FetchScheduler(args.slots, {})
+        lanes = (FetchLane.INTERACTIVE,) * 3
+        clients = ("fifo", "fifo")
+    else:
+        scheduler = FetchScheduler(args.slots, {FetchLane.BATCH: args.slots - 1, FetchLane.PREFETCH: 2})
+        lanes = (FetchLane.INTERACTIVE, FetchLane.BATCH, FetchLane.PREFETCH)
+        clients = ("backfill", "warm-up")
+
+    batch = asyncio.ensure_future(batch_client(scheduler, args.batch_fetches, seconds, lanes[1], clients[0]))
+    prefetch = asyncio.ensure_future(batch_client(scheduler, args.batch_fetches // 4, seconds, lanes[2], clients[1]))
+    await asyncio.sleep(0.05)
+    users = await asyncio.gather(*[
+        interactive_user(scheduler, user, args.queries, args.fanout, seconds, lanes[0], fifo)
+        for user in range(args.users)
+    ])
+    batch_seconds = await batch
+    await prefetch
+    return np.concatenate(users), batch_seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--slots", type=int, default=8)
+    parser.add_argument("--fetch-ms", type=float, default=20)
+    parser.add_argument("--batch-fetches", type=int, default=4000)
+    parser.add_argument("--users", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--fanout", type=int, default=5, help="Fetches per interactive query")
+    args = parser.parse_args()
+
+    print(f"{'mode':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'batch s':>10}")
+    for mode in ("fifo", "scheduler"):
+        latencies, batch_seconds = asyncio.run(run(mode, args))
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        print(f"{mode:>10}{p50:>10.0f}{p95:>10.0f}{latencies.max() * 1000:>10.0f}{batch_seconds:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the peak memory of a point read over many granules: one multi-file dataset versus budgeted streaming
+
+Synthetic MERRA-2-sized daily granules are written to a temporary
+directory; each mode runs in a fresh process so its peak RSS is its own.
+
+Usage (from backend/):
+    python -m scripts.bench_granule_memory [--granules 120] [--fields 6] [--max-open 1 4 16]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from quadcode.app.core.grid import MERRA2_GRID
+from quadcode.app.core.memory import RssSampler
+from quadcode.app.services.granule_budget import GranuleBudget
+from quadcode.app.services.granule_cache import read_granule_point
+
+LAT, LON = -1.3, 36.8
+LAT_IDX, LON_IDX, _, _ = MERRA2_GRID.snap(LAT, LON)
+
+
+def write_granules(root: str, count: int, fields: int) -> List[str]:
+    lat = MERRA2_GRID.lat_origin + MERRA2_GRID.lat_step * np.arange(MERRA2_GRID.lat_count)
+    lon = MERRA2_GRID.lon_origin + MERRA2_GRID.lon_step * np.arange(MERRA2_GRID.lon_count)
+    names = [f"F{i}" for i in range(fields)]
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(count):
+        day = pd.Timestamp("2020-01-01") + pd.Timedelta(days=i)
+        data = rng.random((1, lat.size, lon.size), dtype=np.float32)
+        ds = xr.Dataset(
+            {name: (("time", "lat", "lon"), data + k) for k, name in enumerate(names)},
+            coords={"time": [day + pd.Timedelta(hours=12)], "lat": lat, "lon": lon}
+        )
+        path = os.path.join(root, f"granule-{i:04d}.nc4")
+        ds.to_netcdf(path, engine="h5netcdf", encoding={
+            name: {"zlib": True, "chunksizes": (1, 91, 144)} for name in names
+        })
+        paths.append(path)
+    return paths
+
+
+def read_mfdataset(paths: List[str], field: str) -> np.ndarray:
+    with xr.open_mfdataset(paths, combine="by_coords", coords="minimal", compat="override") as ds:
+        return ds[field].isel(lat=LAT_IDX, lon=LON_IDX).load().values
+
+
+def read_streaming(paths: List[str], field: str, max_open: int) -> np.ndarray:
+    budget = GranuleBudget(max_open=max_open, max_bytes=2 ** 40, granule_bytes=1)
+    loop = asyncio.new_event_loop()
+
+    def read(path: str) -> np.ndarray:
+        return read_granule_point(path, [field], LAT_IDX, LON_IDX)[field].values
+
+    async def read_one(path: str) -> np.ndarray:
+        async with budget.slot():
+            return await loop.run_in_executor(None, read, path)
+
+    async def read_all() -> List[np.ndarray]:
+        return await asyncio.gather(*[read_one(path) for path in paths])
+
+    try:
+        return np.concatenate(loop.run_until_complete(read_all()))
+    finally:
+        loop.close()
+
+
+def run_mode(args: Tuple[str, List[str], str, int]) -> Tuple[float, int, int]:
+    mode, paths, field, max_open = args
+    sampler = RssSampler(0.005)
+    tracker = sampler.start()
+    start = time.perf_counter()
+    if mode == "mfdataset":
+        values = read_mfdataset(paths, field)
+    else:
+        values = read_streaming(paths, field, max_open)
+    elapsed = time.perf_counter() - start
+    sampler.stop(tracker)
+    assert len(values) == len(paths)
+    return elapsed, tracker.peak_rss - tracker.start_rss, tracker.peak_rss
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--granules", type=int, default=120)
+    parser.add_argument("--fields", type=int, default=6)
+    parser.add_argument("--max-open", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="quadcode-bench-")
+    try:
+        paths = write_granules(root, args.granules, args.fields)
+        modes = [("mfdataset", 0)] + [("streaming", n) for n in args.max_open]
+
+        print(f"{'mode':>12}{'max_open':>10}{'seconds':>10}{'peak MiB':>10}{'+MiB':>8}")
+        context = multiprocessing.get_context("spawn")
+        for mode, max_open in modes:
+            with context.Pool(1) as pool:
+                elapsed, delta, peak = pool.apply(run_mode, ((mode, paths, "F0", max_open),))
+            print(f"{mode:>12}{max_open or '-':>10}{elapsed:>10.2f}{peak / 2 ** 20:>10.1f}{delta / 2 ** 20:>8.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the caller-side cost of per-year logging under the old and the queued pipelines
+
+Writes go to a stand-in for a log pipe or collector that takes
+--write-latency-us per write; with 0 they go straight to /dev/null.
+
+Usage (from backend/):
+    python -m scripts.bench_logging [--variables 4] [--years 40] [--requests 50] [--write-latency-us 50]
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from quadcode.app.core import logs
+
+
+class SlowSink:
+    """Stream whose writes block for a fixed time, like a full pipe to a log collector"""
+
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.devnull = open(os.devnull, "w")
+
+    def write(self, text: str) -> int:
+        time.sleep(self.latency_seconds)
+        return self.devnull.write(text)
+
+    def flush(self) -> None:
+        self.devnull.flush()
+
+
+def simulate_request(logger: logging.Logger, variables: int, years: int, lazy: bool) -> None:
+    """The log calls of one uncached query: a fetch line per variable and year"""
+    for v in range(variables):
+        for year in range(2024 - years + 1, 2025):
+            if lazy:
+                logger.info("Fetching %s %s for %s", "M2SDNXSLV", ["T2MMAX"], f"{year}-06-01", extra=logs.PER_YEAR)
+            else:
+                logger.info(f"Fetching M2SDNXSLV ['T2MMAX'] for {year}-06-01")
+
+
+def run(label: str, variables: int, years: int, requests: int, lazy: bool) -> None:
+    logger = logging.getLogger("bench")
+    start = time.perf_counter()
+    for _ in range(requests):
+        simulate_request(logger, variables, years, lazy)
+    elapsed = time.perf_counter() - start
+    calls = variables * years * requests
+    print(f"{label:<36}{elapsed / requests * 1000:>14.3f}{elapsed / calls * 1e6:>14.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--variables", type=int, default=4)
+    parser.add_argument("--years", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--write-latency-us", type=float, default=50)
+    args = parser.parse_args()
+
+    sink = SlowSink(args.write_latency_us / 1e6) if args.write_latency_us > 0 else open(os.devnull, "w")
+    print(f"{'pipeline':<36}{'ms/request':>14}{'us/call':>14}")
+
+    # Previous setup: formatting and a write to the stream on the request path
+    root = logging.getLogger()
+    root.handlers = [logging.StreamHandler(sink)]
+    root.handlers[0].setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    root.setLevel(logging.INFO)
+    run("basicConfig, f-strings", args.variables, args.years, args.requests, lazy=False)
+
+    # Queued JSON pipeline, unsampled and with sampling and rate limits
+    for sample, limit in (("1", "0"), ("1", "20"), ("10", "20")):
+        root.handlers = []
+        os.environ.update(LOG_FORMAT="json", LOG_PER_YEAR_SAMPLE=sample, LOG_PER_YEAR_MAX_PER_SECOND=limit)
+        logs.configure_logging(sink)
+        run(f"queue+json, 1/{sample}, {limit if limit != '0' else 'no'} limit/s", args.variables, args.years, args.requests, lazy=True)
+        logs.shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark of remote granule reads: a fresh session per granule versus the pooled range client
+
+A local stand-in for an Earthdata data host serves synthetic granules with
+range support, injected latency per request, an extra delay on the first
+request of each connection (TCP and TLS setup), and an Earthdata Login
+style redirect round trip for requests without its session cookie. The
+xarray adapter is checked against a local read of the same granule.
+
+Usage (from backend/):
+    python -m scripts.bench_range_client [--granules 16] [--ranges 16] [--range-kib 256] \\
+        [--latency-ms 30] [--handshake-ms 100] [--workers 8]
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+from aiohttp import web
+
+from quadcode.app.services.granule_cache import read_granule_point
+from quadcode.app.services.range_client import RangeClient
+from scripts.bench_granule_memory import LAT_IDX, LON_IDX, write_granules
+
+COOKIE = "edl-session"
+
+
+def serve(root: str, port: int, latency: float, handshake: float) -> None:
+    """Data host stand-in; runs in its own process"""
+    seen = set()
+
+    async def delay(request: web.Request) -> None:
+        transport = id(request.transport)
+        if transport not in seen:
+            seen.add(transport)
+            await asyncio.sleep(handshake)
+        await asyncio.sleep(latency)
+
+    async def login(request: web.Request) -> web.StreamResponse:
+        await delay(request)
+        response = web.HTTPFound(request.query["next"])
+        response.set_cookie(COOKIE, "ok")
+        raise response
+
+    async def granule(request: web.Request) -> web.StreamResponse:
+        await delay(request)
+        if request.cookies.get(COOKIE) != "ok":
+            raise web.HTTPFound(f"/login?next={request.path}")
+        return web.FileResponse(os.path.join(root, request.match_info["name"]))
+
+    app = web.Application()
+    app.router.add_get("/login", login)
+    app.router.add_get("/data/{name}", granule)
+    web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, server: multiprocessing.Process, timeout: float = 30.0) -> None:
+    """Block until the server accepts connections on port"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1.0):
+                return
+        except OSError:
+            if not server.is_alive():
+                raise RuntimeError(f"Server exited with code {server.exitcode} before listening on {port}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Server not listening on {port} after {timeout:.0f}s")
+            time.sleep(0.05)
+
+
+def plan(size: int, count: int, length: int) -> List[Tuple[int, int]]:
+    starts = np.linspace(0, max(size - length, 0), count).astype(int)
+    return [(int(start), int(min(start + length, size))) for start in starts]
+
+
+def read_granule(client: RangeClient, url: str, count: int, length: int) -> int:
+    ranges = plan(client.size(url), count, length)
+    return sum(len(data) for data in client.read_ranges(url, ranges))
+
+
+def run_mode(mode: str, urls: List[str], args: argparse.Namespace) -> Tuple[float, int, Dict]:
+    totals: Dict[str, int] = {}
+    start = time.perf_counter()
+    if mode == "per-open":
+        # What a new session per granule open costs: redirects and handshakes every time
+        size = 0
+        for url in urls:
+            client = RangeClient()
+            size += read_granule(client, url, args.ranges, args.range_kib * 1024)
+            for name, value in client.metrics().items():
+                totals[name] = totals.get(name, 0) + value
+            client.close()
+    else:
+        client = RangeClient(max_per_host=args.workers)
+        workers = 1 if mode == "pooled" else args.workers
+        with ThreadPoolExecutor(workers) as pool:
+            size = sum(pool.map(lambda url: read_granule(client, url, args.ranges, args.range_kib * 1024), urls))
+        totals = client.metrics()
+        client.close()
+    return time.perf_counter() - start, size, totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--granules", type=int, default=16)
+    parser.add_argument("--ranges", type=int, default=16, help="Range reads per granule")
+    parser.add_argument("--range-kib", type=int, default=256)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--handshake-ms", type=float, default=100)
+    parser.add_argument("--workers", type=int, default=8, help="Granules read at once in pooled-concurrent mode")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="quadcode-bench-")
+    port = free_port()
+    server = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(root, port, args.latency_ms / 1000, args.handshake_ms / 1000), daemon=True
+    )
+    try:
+        paths = write_granules(root, args.granules, 2)
+        server.start()
+        wait_for_port(port, server)
+        urls = [f"http://localhost:{port}/data/{os.path.basename(path)}" for path in paths]
+
+        # The file-like adapter must read exactly what a local open reads
+        client = RangeClient()
+        with client.open(urls[0]) as remote:
+            values = read_granule_point(remote, ["F0"], LAT_IDX, LON_IDX)["F0"].values
+        assert np.array_equal(values, read_granule_point(paths[0], ["F0"], LAT_IDX, LON_IDX)["F0"].values)
+        client.close()
+        print("xarray adapter: values match a local read")
+
+        print(f"{'mode':>18}{'seconds':>9}{'MiB/s':>8}{'requests':>10}{'redirects':>10}{'new conns':>10}{'reused':>8}")
+        for mode in ("per-open", "pooled", "pooled-concurrent"):
+            elapsed, size, stats = run_mode(mode, urls, args)
+            print(f"{mode:>18}{elapsed:>9.2f}{size / 2 ** 20 / elapsed:>8.1f}{stats['requests']:>10}"
+                  f"{stats['redirects']:>10}{stats['connections_created']:>10}{stats['connections_reused']:>8}")
+    finally:
+        server.terminate()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
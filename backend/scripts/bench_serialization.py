@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark of response serialization paths for large query and calendar payloads
+
+Usage (from backend/):
+    python -m scripts.bench_serialization [--years 40] [--repeat 20]
+"""
+
+import argparse
+import json
+import time
+from typing import Callable
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from quadcode.app.core import serialization
+from quadcode.app.core.utils import compute_statistics_matrix
+from quadcode.app.core.grid import DAYS_PER_YEAR, day_from_index
+from quadcode.app.core.registry import VARIABLES
+from quadcode.app.models.weather import (
+    WeatherQueryResponse,
+    QueryInfo,
+    VariableData,
+    EmpiricalDistribution,
+    Statistics,
+    GridPoint,
+    Location,
+    Metadata,
+    CalendarResponse,
+    CalendarVariableData,
+    CalendarDay
+)
+
+
+def build_query_response(years: int) -> WeatherQueryResponse:
+    """Synthetic query response with every variable, its distribution and probabilities"""
+    rng = np.random.default_rng(0)
+    year_list = list(range(2024 - years + 1, 2025))
+    historical_data = {}
+    for name in VARIABLES:
+        values = rng.normal(20, 5, years).tolist()
+        historical_data[name] = VariableData(
+            values=values,
+            years=year_list,
+            statistics=Statistics(
+                mean=20.0, median=20.0, std=5.0, min=5.0, max=35.0,
+                percentile_10=14.0, percentile_25=17.0, percentile_75=23.0, percentile_90=26.0,
+                count=years
+            ),
+            probabilities={"above_30.0": 0.1, "below_10.0": 0.05},
+            distribution=EmpiricalDistribution(sorted_values=sorted(values), count=years)
+        )
+    return WeatherQueryResponse(
+        query_info=QueryInfo(
+            requested_location=Location(lat=-0.42, lon=36.95),
+            actual_grid_points={name: GridPoint(lat=-0.5, lon=36.875, dataset="MERRA-2") for name in VARIABLES},
+            day_of_year="June 1",
+            years_analyzed=years,
+            data_period=f"{year_list[0]}-{year_list[-1]}"
+        ),
+        historical_data=historical_data,
+        metadata=Metadata(data_sources={}, units={name: spec.units for name, spec in VARIABLES.items()})
+    )
+
+
+def build_calendar_response(years: int) -> CalendarResponse:
+    """Synthetic full-year calendar for every variable"""
+    rng = np.random.default_rng(0)
+    stats = compute_statistics_matrix(rng.normal(20, 5, (years, DAYS_PER_YEAR)).astype(np.float32))
+    calendar = {}
+    for name in VARIABLES:
+        days = []
+        for index in range(DAYS_PER_YEAR):
+            month, day = day_from_index(index)
+            days.append(CalendarDay(
+                month=month,
+                day=day,
+                statistics=Statistics(
+                    count=int(stats["count"][index]),
+                    **{k: float(v[index]) for k, v in stats.items() if k != "count"}
+                ),
+                probabilities={"above_30.0": 0.1}
+            ))
+        calendar[name] = CalendarVariableData(days=days, years=list(range(years)))
+    return CalendarResponse(
+        requested_location=Location(lat=-0.42, lon=36.95),
+        actual_grid_points={},
+        years_analyzed=years,
+        data_period="",
+        calendar=calendar,
+        units={}
+    )
+
+
+def standard_path(model) -> bytes:
+    """What FastAPI does with a returned model and response_model: re-validate, jsonable_encoder, json.dumps"""
+    validated = type(model).model_validate(model.model_dump())
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def timed(fn: Callable[[], bytes], repeat: int) -> tuple:
+    """Median wall time in ms and output size of fn"""
+    times = []
+    body = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times)), len(body)
+
+
+def run(name: str, model, columns, repeat: int) -> None:
+    paths = {
+        "standard (validate + json)": lambda: standard_path(model),
+        "json (orjson)" if serialization.orjson else "json": lambda: serialization.encode(
+            model.model_dump(mode="json"), serialization.JSON),
+    }
+    if serialization.msgpack is not None:
+        paths["msgpack"] = lambda: serialization.encode(model.model_dump(mode="json"), serialization.MSGPACK)
+    if serialization.pa is not None:
+        paths["arrow ipc"] = lambda: serialization.encode(
+            model.model_dump(mode="json"), serialization.ARROW, columns)
+
+    print(f"\n{name}")
+    print(f"{'path':<28}{'median ms':>12}{'bytes':>12}{'gzip':>12}{'br':>12}")
+    for label, fn in paths.items():
+        ms, size = timed(fn, repeat)
+        body = fn()
+        gz = len(serialization.compress(body, "gzip"))
+        br = len(serialization.compress(body, "br")) if serialization.brotli else float("nan")
+        print(f"{label:<28}{ms:>12.2f}{size:>12}{gz:>12}{br:>12}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, default=40, help="Years per variable")
+    parser.add_argument("--repeat", type=int, default=20, help="Repetitions per path")
+    args = parser.parse_args()
+
+    query = build_query_response(args.years)
+    run("query response", query, serialization.weather_columns, args.repeat)
+
+    calendar = build_calendar_response(args.years)
+    run("calendar response", calendar, serialization.calendar_columns, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Bundle the hottest local cache entries into a warm-cache snapshot
+
+Reads the stores configured through the usual variables (POINT_STORE_DIR,
+CLIMATOLOGY_DIR, SEARCH_CACHE_DIR), carries over the entries of the
+SNAPSHOT_PATH bundle, if any, and writes a bundle to bake into the image
+or mount as SNAPSHOT_PATH. A running instance serves the same export at
+GET /api/v1/admin/snapshot.
+
+Usage (from backend/):
+    python -m scripts.build_snapshot --output snapshot/warm-cache.qcs [--max-mib 256] [--check]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from quadcode.app.services.snapshot import SnapshotBundle, export_snapshot
+
+
+def check(path: str) -> None:
+    """Map the bundle and time a lookup of every point series and tile it holds"""
+    start = time.perf_counter()
+    bundle = SnapshotBundle(path)
+    opened = time.perf_counter() - start
+
+    lookups = 0
+    start = time.perf_counter()
+    for kind, identity, _, _, load in bundle.entries():
+        if kind == "point":
+            found = bundle.get_year(*identity)
+        elif kind == "tile":
+            found = bundle.get_tile(identity[0], bundle.header["tile_cells"], *identity[1:])
+        else:
+            continue
+        assert found is not None and np.array_equal(found, load(), equal_nan=True), identity
+        lookups += 1
+    elapsed = time.perf_counter() - start
+    print(f"opened in {opened * 1000:.2f} ms; {lookups} lookups, "
+          f"{elapsed / max(lookups, 1) * 1e6:.1f} us each")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--max-mib", type=int, default=256, help="Size budget of the bundled entries")
+    parser.add_argument("--check", action="store_true", help="Verify every lookup of the written bundle")
+    args = parser.parse_args()
+
+    summary = export_snapshot(args.output, args.max_mib * 1024 ** 2)
+    print(json.dumps(summary, indent=2))
+    if args.check:
+        check(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Precompute global day-of-year climatology tiles for /query
+
+Resumable: rerunning the same command builds only the days without a tile.
+Tiles are written under CLIMATOLOGY_DIR, which the API must share.
+
+Usage (from backend/):
+    python -m scripts.precompute_climatology --variables temperature precipitation \\
+        --start-year 1991 --end-year 2020 [--days 152-243] [--workers 4] \\
+        [--thresholds '{"temperature": {"hot": 35, "cold": 5}}'] [--restart]
+"""
+
+import argparse
+import json
+from typing import List
+
+from quadcode.app.core.logs import configure_logging, shutdown_logging
+from quadcode.app.services.climatology import get_climatology_store, run_precompute
+
+
+def parse_days(spec: str) -> List[int]:
+    """Parse 1-based day-of-year ranges such as "1-31,60" into day indices"""
+    days = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        days.extend(range(int(first) - 1, int(last or first)))
+    return days
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--variables", nargs="+", required=True)
+    parser.add_argument("--start-year", type=int, required=True)
+    parser.add_argument("--end-year", type=int, required=True)
+    parser.add_argument("--days", type=parse_days, default=None, help="1-based days of a 366-day year, e.g. 1-31,60")
+    parser.add_argument("--thresholds", type=json.loads, default=None, help="JSON thresholds per variable")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--block", type=int, default=32, help="Side of the compressed blocks of cells")
+    parser.add_argument("--restart", action="store_true", help="Rebuild existing tiles")
+    args = parser.parse_args()
+
+    store = get_climatology_store()
+    if store is None:
+        parser.error("CLIMATOLOGY_ENABLED is false")
+
+    configure_logging()
+    try:
+        summary = run_precompute(
+            store, args.variables, args.start_year, args.end_year,
+            days=args.days, thresholds=args.thresholds,
+            workers=args.workers, block=args.block, restart=args.restart
+        )
+    finally:
+        shutdown_logging()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()